@@ -2,34 +2,95 @@ from fastapi import FastAPI
 from contextlib import asynccontextmanager
 from src.api.routes import router
 from src.ml.embeddings import embedding_model
+from src.api.services.search import inference_executor
+from src.api.services.retrieval import get_retrieval_backend
+from src.api.services.result_cache import result_cache
+from src.api.services.itunes import itunes_proxy
+from src.db.session import get_engine, dispose_async_engine
+from src.monitoring.metrics import API_METRICS, PIPELINE_METRICS_FILE, render, read_textfile
+import time
+import asyncio
 import logging
 import httpx
+from sqlalchemy import text
+from fastapi.responses import PlainTextResponse, JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 import os
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger('api')
 
-@asynccontextmanager
-async def lifespan(app: FastAPI):
+#flipped by the background warm-up, /ready reports it while /health only says the process is up
+readiness = {"ready": False, "failed": False, "error": None, "attempts": 0, "warmup_s": None}
+
+#a failed warm-up (database not up yet, slow volume mount ...) is retried with exponential backoff,
+#WARMUP_MAX_ATTEMPTS > 0 gives up after that many attempts & fails liveness, so the orchestrator restarts the container
+WARMUP_BACKOFF_S = float(os.getenv("WARMUP_BACKOFF_S", 1))
+WARMUP_MAX_BACKOFF_S = float(os.getenv("WARMUP_MAX_BACKOFF_S", 60))
+WARMUP_MAX_ATTEMPTS = int(os.getenv("WARMUP_MAX_ATTEMPTS", 0)) #0 = retry forever
+
+def warm_up():
     """
-    Handles startup & shutdown events
-    crucial for loading heavy ML models into RAM before traffic hits 
+    loads the model weights (pre-baked local cache, see MODEL_CACHE_DIR), runs one dummy inference to get them
+    into mps/cuda memory, resolves the retrieval backend & checks out a pooled connection.
+    """
+    t0 = time.perf_counter()
+
+    logger.info(f'API Starting Loading MODEL: {embedding_model.MODEL_ID}')
+    embedding_model.load()
+    embedding_model.generate([{"title": "warm-up", "artist":"warm-up","lyrics":"warm-up"}])
+
+    logger.info("Model succesfully loaded & ready on device.")
+
+    #resolve the retrieval backend up front, a missing/mismatched numpy index should keep the instance out of rotation
+    logger.info(f'Retrieval backend: {get_retrieval_backend().name}')
 
+    with get_engine().connect() as conn:
+        conn.execute(text("SELECT 1"))
+
+    return time.perf_counter() - t0
+
+async def _warm_up_in_background():
     """
+    runs warm_up until it succeeds, every step of it is safe to repeat (weights, backend & engine are built once).
+    """
+    t0 = time.perf_counter()
+
+    while True:
+        readiness["attempts"] += 1
+
+        try:
+            await asyncio.get_running_loop().run_in_executor(None, warm_up)
+
+        except Exception as e:
+            readiness["error"] = str(e)
+
+            if WARMUP_MAX_ATTEMPTS and readiness["attempts"] >= WARMUP_MAX_ATTEMPTS:
+                readiness["failed"] = True
+                logger.error(f'CRITICAL: WARM-UP FAILED {readiness["attempts"]} TIMES, GIVING UP: {e}')
+                return
+
+            delay = min(WARMUP_MAX_BACKOFF_S, WARMUP_BACKOFF_S * 2 ** (readiness["attempts"] - 1))
+            logger.error(f'warm-up attempt {readiness["attempts"]} failed ({e}), retrying in {delay:.1f}s')
+            await asyncio.sleep(delay)
+            continue
 
-    #warm-up: dummy inferance, to get weights occupied into mps/cuda
+        readiness["warmup_s"] = round(time.perf_counter() - t0, 3)
+        readiness["error"] = None
+        readiness["ready"] = True
+        logger.info(f'API ready after {readiness["warmup_s"]}s warm-up ({readiness["attempts"]} attempts)')
+        return
 
-    try:
-        logger.info(f'API Starting Loading MODEL: {embedding_model.MODEL_ID}')
-        embedding_model.generate([{"title": "warm-up", "artist":"warm-up","lyrics":"warm-up"}])
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Handles startup & shutdown events
+    the heavy warm-up runs in the background, the server accepts connections right away (/health answers),
+    & /ready flips once the model & the database are usable, so traffic is only routed to a warm instance.
 
-        logger.info("Model succesfully loaded & ready on device.")
-        
+    """
 
-    except Exception as e:
-        logger.error(f'CRITICAL: MODEL FAILED TO LOAD {e}')
-        raise
+    warm_up_task = asyncio.create_task(_warm_up_in_background())
 
     #shared http client
     app.state.http_client = httpx.AsyncClient(timeout=httpx.Timeout(5.0,connect=2.0, read=3.0)) #fail fast in case of failure
@@ -43,8 +104,13 @@ async def lifespan(app: FastAPI):
     logger.info("API shutting down.")
 
     #cleanup http client
+    warm_up_task.cancel()
     await app.state.http_client.aclose()
 
+    #release the async search resources (no-op pool when ASYNC_SEARCH is off)
+    inference_executor.shutdown(wait=False)
+    await dispose_async_engine()
+
    
 
 app = FastAPI(
@@ -74,11 +140,42 @@ app.include_router(router, prefix="/api/v1")
 @app.get("/api/v1/health")
 def health_check():
     """
-    kubernetes/Docker health check point
+    kubernetes/Docker health check point (liveness), answers as soon as the process is up.
+    503 once the warm-up gave up (WARMUP_MAX_ATTEMPTS), a restart is the only way out of it
 
     """
+    if readiness["failed"]:
+        return JSONResponse(status_code=503, content={"status": "unhealthy", **readiness})
+
     return {
         "status":"healthy",
+        "ready": readiness["ready"],
         "model": embedding_model.MODEL_ID,
-        "device": embedding_model.device
+        "device": embedding_model.device,
+        "query_cache": embedding_model.query_cache.stats(),
+        "result_cache": result_cache.stats() if result_cache else None,
+        "itunes_proxy": itunes_proxy.stats()
     }
+
+@app.get("/api/v1/ready")
+def ready_check():
+    """
+    readiness probe: 200 once the warm-up finished, 503 while it runs (or retries, with the last error) or after it gave up
+
+    """
+    if not readiness["ready"]:
+        return JSONResponse(status_code=503, content={"status": "failed" if readiness["failed"] else "warming_up", **readiness})
+
+    return {"status": "ready", **readiness}
+
+@app.get("/api/v1/metrics", response_class=PlainTextResponse)
+def metrics():
+    """
+    prometheus scrape endpoint: per-stage search latency histograms, model lock wait & inference time,
+    plus the embedding pipeline counters it last wrote to PIPELINE_METRICS_FILE (it runs as a separate job).
+
+    """
+    return PlainTextResponse(
+        render(API_METRICS) + read_textfile(PIPELINE_METRICS_FILE),
+        media_type="text/plain; version=0.0.4"
+    )
@@ -1,18 +1,30 @@
 import time
 import logging
 from sqlalchemy.orm import Session
-from src.db.session import get_db
+from src.db.session import get_db, get_async_db, ASYNC_SEARCH
 from src.ml.embeddings import embedding_model
-from src.api.schemas import SearchRequest, SearchResponse
-from src.api.services.search import SearchService
-from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from src.api.schemas import SearchRequest, SearchResponse, BatchSearchRequest, BatchSearchResponse, BatchSearchItem, StageLatency
+from src.api.services.search import SearchService, AsyncSearchService, resolve_ef_search
+from src.api.services.itunes import itunes_proxy, UpstreamError
+from src.monitoring.metrics import SEARCH_REQUEST_SECONDS
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from pydantic import BaseModel
 import httpx
 
+if ASYNC_SEARCH:
+    from sqlalchemy.ext.asyncio import AsyncSession
+
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
-@router.post('/search', response_model=SearchResponse)
+def _json_response(model: BaseModel) -> Response:
+    """
+    one-pass serialization (pydantic-core, in rust). returning a Response skips FastAPI's response_model
+    round-trip (dump -> re-validate -> dump), response_model stays on the route for the OpenAPI schema.
+    """
+    return Response(content=model.model_dump_json(), media_type="application/json")
+
 def search_tracks(request: SearchRequest, db: Session = Depends(get_db)):
     """
     Semantic Search end-point.
@@ -20,28 +32,133 @@ def search_tracks(request: SearchRequest, db: Session = Depends(get_db)):
 
     """
 
-    t0 = time.time()
+    t0 = time.perf_counter()
 
     try:
 
         service = SearchService(db)
 
-        results = service.search(query = request.query, limit=request.limit)
-
-        latency = (time.time() - t0 )* 1000
-
-        return SearchResponse(results=results, latency_ms=round(latency,2),model_version=embedding_model.MODEL_ID)
+        results, next_cursor, cached = service.search_page(
+            query = request.query,
+            limit=request.limit,
+            filters=request.filters,
+            ef_search=resolve_ef_search(request.quality, request.ef_search),
+            cursor=request.cursor,
+            mode=request.mode,
+            include_preview=request.include_preview
+        )
+
+        latency = (time.perf_counter() - t0 )* 1000
+        SEARCH_REQUEST_SECONDS.observe(latency / 1000, "search")
+
+        return _json_response(SearchResponse.model_construct(
+            results=results, latency_ms=round(latency,2),model_version=embedding_model.MODEL_ID, cached=cached, next_cursor=next_cursor
+        ))
     
     except ValueError as e:
         #catch known logic errors (eg: bad math, invalid input)
         logger.warning(f'Bad Request Logic: {e}')
         raise HTTPException(status_code=400, detail=str(e))
     
-    except Exception as e:
+    except Exception:
 
         logger.exception("Unexpected error during search execution.")
-        raise HTTPException(status_code=500, detail=f'Internal search error.')
+        raise HTTPException(status_code=500, detail='Internal search error.')
+
+async def search_tracks_async(request: SearchRequest, db: "AsyncSession" = Depends(get_async_db)):
+    """
+    Async Semantic Search end-point (ASYNC_SEARCH=true).
+    same contract as search_tracks, but holds no threadpool worker while waiting on inference or postgres.
+
+    """
+
+    t0 = time.perf_counter()
+
+    try:
+
+        service = AsyncSearchService(db)
+
+        results, next_cursor, cached = await service.search_page(
+            query = request.query,
+            limit=request.limit,
+            filters=request.filters,
+            ef_search=resolve_ef_search(request.quality, request.ef_search),
+            cursor=request.cursor,
+            mode=request.mode,
+            include_preview=request.include_preview
+        )
+
+        latency = (time.perf_counter() - t0 )* 1000
+        SEARCH_REQUEST_SECONDS.observe(latency / 1000, "search")
+
+        return _json_response(SearchResponse.model_construct(
+            results=results, latency_ms=round(latency,2),model_version=embedding_model.MODEL_ID, cached=cached, next_cursor=next_cursor
+        ))
+
+    except ValueError as e:
+        logger.warning(f'Bad Request Logic: {e}')
+        raise HTTPException(status_code=400, detail=str(e))
+
+    except Exception:
+
+        logger.exception("Unexpected error during search execution.")
+        raise HTTPException(status_code=500, detail='Internal search error.')
+
+#the search path is selected via config, both variants serve the same route & contract
+router.add_api_route(
+    '/search',
+    search_tracks_async if ASYNC_SEARCH else search_tracks,
+    methods=["POST"],
+    response_model=SearchResponse
+)
     
+@router.post('/search/batch', response_model=BatchSearchResponse)
+def search_tracks_batch(request: BatchSearchRequest, db: Session = Depends(get_db)):
+    """
+    Bulk Semantic Search end-point, for offline jobs (playlist generation, evaluation sets).
+    Orchestration: one embedding call for all queries -> one LATERAL SQL round-trip -> per-query results
+
+    """
+
+    t0 = time.perf_counter()
+
+    try:
+
+        service = SearchService(db)
+
+        grouped, next_cursors, stages = service.search_batch(
+            queries=[q.query for q in request.queries],
+            limits=[q.limit for q in request.queries],
+            filters=[q.filters for q in request.queries],
+            modes=[q.mode for q in request.queries],
+            cursors=[q.cursor for q in request.queries],
+            include_previews=[q.include_preview for q in request.queries],
+            #one transaction for the whole batch, so the most demanding recall setting applies to all
+            ef_search=max((resolve_ef_search(q.quality, q.ef_search) or 0 for q in request.queries), default=0) or None
+        )
+
+        latency = (time.perf_counter() - t0 )* 1000
+        SEARCH_REQUEST_SECONDS.observe(latency / 1000, "search_batch")
+
+        return _json_response(BatchSearchResponse.model_construct(
+            responses=[
+                BatchSearchItem.model_construct(query=q.query, results=r, next_cursor=c)
+                for q, r, c in zip(request.queries, grouped, next_cursors)
+            ],
+            latency_ms=round(latency,2),
+            stages=StageLatency(**stages),
+            model_version=embedding_model.MODEL_ID
+        ))
+
+    except ValueError as e:
+        logger.warning(f'Bad Request Logic: {e}')
+        raise HTTPException(status_code=400, detail=str(e))
+
+    except Exception:
+
+        logger.exception("Unexpected error during batch search execution.")
+        raise HTTPException(status_code=500, detail='Internal search error.')
+
 #new proxy route
 @router.get('/proxy/itunes')
 async def proxy_itunes(
@@ -52,6 +169,7 @@ async def proxy_itunes(
 
     """
     Proxy end point to fetch audio previews from itunes (chose itunes, due to easier implementation compared to spotify)
+    served through a TTL/LRU cache with negative caching & single-flight coalescing, see services/itunes.py
 
     """
     
@@ -61,40 +179,16 @@ async def proxy_itunes(
     In a production environment, this should be protected by:
     1. Rate Limiting (e.g. 10 req/min per IP) via Redis/SlowAPI.
     2. Origin Validation (CORS is configured in app.py).
-    3. Caching (e.g. HTTP headers or server-side cache) to reduce upstream calls.
     
     """
     #input guardrails & safe limit to prevent request abuse
     if not term.strip():
         raise HTTPException(status_code=400,detail="seach term cannot be empty")
-    
-    safe_limit = min(limit, 5)
-    itunes_url = "https://itunes.apple.com/search"
-
-    #params expected by apple.com
-    params = {
-        "term": term,
-        "media": "music",
-        "entity":"song",
-        "limit":safe_limit
-    }
-
-    # async with httpx.AsyncClient() as client:
-    client: httpx.AsyncClient = request.app.state.http_client
-
-    try: 
-            logger.debug(f'Proxying request to iTunes for term: {term}')
-            response = await client.get(itunes_url, params=params,timeout=5.0)
-            response.raise_for_status()
 
-            return response.json()
-        
-    except httpx.HTTPStatusError as e:
-            logger.error(f'itunes api error: {e.response.status_code} - {e.response.text}')
-            raise HTTPException(status_code=e.response.status_code, detail="upstream provide error")
-        
-    except Exception as e:
-            logger.error(f'itunes proxy failed : {e}')
-            raise HTTPException(status_code=500, detail='failed to fetch preview')
+    client: httpx.AsyncClient = request.app.state.http_client
 
+    try:
+        return await itunes_proxy.search(client, term, limit)
 
+    except UpstreamError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
@@ -1,15 +1,34 @@
 from pydantic import BaseModel, Field
 from uuid import UUID
-from typing import List, Optional
+from typing import List, Optional, Literal
 
 # REQUESTS - INPUT rules & contracts
 
+class SearchFilters(BaseModel):
+    artist: Optional[str] = Field(None, min_length=1, description="Exact artist name, case-insensitive")
+    genre: Optional[str] = Field(None, min_length=1, description="Exact genre, case-insensitive")
+    year_from: Optional[int] = Field(None, ge=1800, le=2100, description="Released in or after this year")
+    year_to: Optional[int] = Field(None, ge=1800, le=2100, description="Released in or before this year")
+
+    @property
+    def active(self) -> bool:
+        return any(v is not None for v in (self.artist, self.genre, self.year_from, self.year_to))
+
 class SearchRequest(BaseModel):
     query: str = Field(...,min_length=3, description="The search text (eg: Kendrick Lamar track about being better than everyone..)")
     limit: int = Field(10, ge=1, le=50, description="Max results to return")
+    filters: Optional[SearchFilters] = Field(None, description="Restrict results by artist, genre or release year")
+    quality: Optional[Literal["fast", "balanced", "high"]] = Field(None, description="Recall/latency preset, fast for interactive clients, high for batch consumers")
+    ef_search: Optional[int] = Field(None, ge=1, le=1000, description="Explicit HNSW ef_search, overrides quality")
+    cursor: Optional[str] = Field(None, description="next_cursor of the previous page")
+    mode: Literal["semantic", "hybrid"] = Field("semantic", description="hybrid fuses full-text (title/artist/lyrics) & vector rankings, best for exact titles & names")
+    include_preview: bool = Field(False, description="Return stored preview/artwork URLs inline, no per-result /proxy/itunes round-trip")
 
     # ... -> parameter is to ensure no blank inputs are accepted.
 
+class BatchSearchRequest(BaseModel):
+    queries: List[SearchRequest] = Field(..., min_length=1, max_length=256, description="Searches resolved together in one embedding call & one SQL round-trip")
+
 # RESPONSE - Metadata
 
 class TrackMetadata(BaseModel):
@@ -17,13 +36,33 @@ class TrackMetadata(BaseModel):
     artist: str
     album: Optional[str] = None
     release_year: Optional[str] = None
+    preview_url: Optional[str] = Field(None, description="30s audio preview (include_preview), null if not enriched yet: fall back to /proxy/itunes")
+    artwork_url: Optional[str] = Field(None, description="Cover art (include_preview)")
 
 class SearchResult(BaseModel):
     id: UUID
-    score: float = Field(..., description="Cosine Similiarity [0,1], higher the better")
+    score: float = Field(..., description="Cosine Similiarity [0,1] (semantic) or reciprocal rank fusion score (hybrid), higher the better")
     metadata: TrackMetadata
 
 class SearchResponse(BaseModel):
     results: List[SearchResult]
     latency_ms: float
-    model_version: str = Field(..., description="Embedding Model used")
\ No newline at end of file
+    model_version: str = Field(..., description="Embedding Model used")
+    cached: bool = Field(False, description="Served from the search result cache")
+    next_cursor: Optional[str] = Field(None, description="Pass as `cursor` to fetch the next page, null on the last page")
+
+class StageLatency(BaseModel):
+    embed_ms: float
+    db_ms: float
+    format_ms: float
+
+class BatchSearchItem(BaseModel):
+    query: str
+    results: List[SearchResult]
+    next_cursor: Optional[str] = Field(None, description="Pass as this query's `cursor` in the next batch, null on the last page")
+
+class BatchSearchResponse(BaseModel):
+    responses: List[BatchSearchItem] = Field(..., description="One entry per request, in request order")
+    latency_ms: float
+    stages: StageLatency = Field(..., description="Per-stage latency breakdown for the whole batch")
+    model_version: str = Field(..., description="Embedding Model used")
@@ -0,0 +1,133 @@
+import os
+import re
+import asyncio
+import logging
+from typing import Any, Dict
+import httpx
+from src.ml.cache import cache_from_env
+from src.monitoring.metrics import ITUNES_LOOKUPS
+
+logger = logging.getLogger(__name__)
+
+#overridable so tests & local dev can point the proxy at a stand-in server (see test_itunes.py)
+ITUNES_BASE_URL = os.getenv("ITUNES_BASE_URL", "https://itunes.apple.com")
+ITUNES_MAX_LIMIT = 5
+
+class UpstreamError(Exception):
+
+    """
+    iTunes failed or answered with an error status. cached like a miss (as its (status_code, detail)),
+    so an outage isn't hammered per request. every caller gets its own instance, tracebacks never pile up on a shared one.
+    """
+
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+class ItunesProxy:
+
+    """
+    server-side cache in front of the iTunes search API, keyed on the normalized (term, limit).
+    - hits: TTL/LRU cache of upstream payloads (ITUNES_CACHE_SIZE / ITUNES_CACHE_TTL)
+    - misses (no results) & upstream errors: cached too, on a shorter TTL (ITUNES_NEGATIVE_CACHE_SIZE / _TTL)
+    - single-flight: concurrent lookups of the same key share ONE upstream request
+    so upstream calls drop to roughly one per distinct term per TTL, however many result rows ask for it.
+    """
+
+    def __init__(self, base_url: str = ITUNES_BASE_URL, cache=None, negative_cache=None, timeout: float = 5.0):
+        self.search_url = f'{base_url.rstrip("/")}/search'
+        self.timeout = timeout
+
+        self.cache = cache if cache is not None else cache_from_env("ITUNES_CACHE", default_size=4096, default_ttl=3600)
+        self.negative_cache = negative_cache if negative_cache is not None else cache_from_env("ITUNES_NEGATIVE_CACHE", default_size=4096, default_ttl=60)
+
+        #key -> in-flight upstream task, only touched from the event loop thread
+        self._inflight: Dict[tuple, asyncio.Task] = {}
+
+        self.upstream_calls = 0
+        self.coalesced = 0
+
+    @staticmethod
+    def key(term: str, limit: int) -> tuple:
+        return (re.sub(r"\s+", " ", term).strip().lower(), min(limit, ITUNES_MAX_LIMIT))
+
+    async def search(self, client: httpx.AsyncClient, term: str, limit: int = 1) -> Dict[str, Any]:
+        """
+        iTunes search payload ({"resultCount": n, "results": [...]}) for a song term, raises UpstreamError.
+        """
+        key = self.key(term, limit)
+
+        cached = self.cache.get(key)
+        if cached is not None:
+            ITUNES_LOOKUPS.inc("hit")
+            return cached
+
+        negative = self.negative_cache.get(key)
+        if negative is not None:
+            ITUNES_LOOKUPS.inc("negative_hit")
+            if isinstance(negative, tuple):
+                raise UpstreamError(*negative)
+            return negative
+
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.create_task(self._fetch(client, key))
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._done(key, t))
+        else:
+            self.coalesced += 1
+            ITUNES_LOOKUPS.inc("coalesced")
+
+        #shielded: one caller disconnecting must not cancel the request the others are waiting on
+        try:
+            return await asyncio.shield(task)
+        except UpstreamError as e:
+            raise UpstreamError(e.status_code, e.detail) from None
+
+    def _done(self, key: tuple, task: asyncio.Task):
+        self._inflight.pop(key, None)
+
+        #marks the error as retrieved, every waiter may have gone away before it was raised
+        if not task.cancelled():
+            task.exception()
+
+    async def _fetch(self, client: httpx.AsyncClient, key: tuple) -> Dict[str, Any]:
+        term, limit = key
+        params = {"term": term, "media": "music", "entity": "song", "limit": limit} #params expected by apple.com
+
+        self.upstream_calls += 1
+        ITUNES_LOOKUPS.inc("upstream")
+        logger.debug(f'Proxying request to iTunes for term: {term}')
+
+        try:
+            response = await client.get(self.search_url, params=params, timeout=self.timeout)
+            response.raise_for_status()
+            payload = response.json()
+
+        except httpx.HTTPStatusError as e:
+            logger.error(f'itunes api error: {e.response.status_code} - {e.response.text}')
+            self.negative_cache.set(key, (e.response.status_code, "upstream provide error"))
+            raise UpstreamError(e.response.status_code, "upstream provide error")
+
+        except Exception as e:
+            logger.error(f'itunes proxy failed : {e}')
+            self.negative_cache.set(key, (500, "failed to fetch preview"))
+            raise UpstreamError(500, "failed to fetch preview")
+
+        if payload.get("resultCount", 0) == 0:
+            self.negative_cache.set(key, payload)
+        else:
+            self.cache.set(key, payload)
+
+        return payload
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "upstream_calls": self.upstream_calls,
+            "coalesced": self.coalesced,
+            "cache": self.cache.stats(),
+            "negative_cache": self.negative_cache.stats(),
+        }
+
+itunes_proxy = ItunesProxy()
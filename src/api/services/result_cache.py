@@ -0,0 +1,174 @@
+import os
+import re
+import json
+import time
+import logging
+import threading
+from abc import ABC, abstractmethod
+from typing import Any, Dict, List, Optional
+from src.ml.cache import LRUCache
+from src.db.generation import generation_stmt
+
+logger = logging.getLogger(__name__)
+
+class ResultCacheBackend(ABC):
+
+    """
+    storage for cached search pages. values are plain JSON-able lists (SearchResult.model_dump(mode="json")),
+    so the same contract works in-process & over the network.
+    """
+
+    name = "base"
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[List[Dict[str, Any]]]:
+        ...
+
+    @abstractmethod
+    def set(self, key: str, value: List[Dict[str, Any]]) -> None:
+        ...
+
+class LocalResultCache(ResultCacheBackend):
+
+    """
+    in-process TTL/LRU store, the default. also the local stand-in for the shared backend in tests.
+    """
+
+    name = "local"
+
+    def __init__(self, max_size: int = 4096, ttl_seconds: float = 600):
+        self.cache = LRUCache(max_size=max_size, ttl_seconds=ttl_seconds)
+
+    def get(self, key: str) -> Optional[List[Dict[str, Any]]]:
+        return self.cache.get(key)
+
+    def set(self, key: str, value: List[Dict[str, Any]]) -> None:
+        self.cache.set(key, value)
+
+class RedisResultCache(ResultCacheBackend):
+
+    """
+    shared store, so every API worker/replica benefits from each other's misses.
+    optional dependency (pip install redis), only imported when RESULT_CACHE_BACKEND=redis.
+    """
+
+    name = "redis"
+
+    def __init__(self, url: str, ttl_seconds: float = 600):
+        try:
+            import redis
+        except ImportError as e:
+            raise RuntimeError("RESULT_CACHE_BACKEND=redis requires the redis package") from e
+
+        self.client = redis.Redis.from_url(url, socket_timeout=0.05) #a slow cache must never be slower than a miss
+        self.ttl_seconds = int(ttl_seconds)
+
+    def get(self, key: str) -> Optional[List[Dict[str, Any]]]:
+        try:
+            raw = self.client.get(key)
+        except Exception as e:
+            logger.warning(f'result cache get failed, treating as miss: {e}')
+            return None
+
+        return json.loads(raw) if raw is not None else None
+
+    def set(self, key: str, value: List[Dict[str, Any]]) -> None:
+        try:
+            self.client.set(key, json.dumps(value), ex=self.ttl_seconds or None)
+        except Exception as e:
+            logger.warning(f'result cache set failed: {e}')
+
+class SearchResultCache:
+
+    """
+    cache in front of SearchService.search, keyed on (query, limit, filters, ef_search, mode, model_version, backend, generation).
+    the generation counter lives in postgres & is bumped by the embedding pipeline in the same commit as new vectors,
+    so entries are invalidated by key change instead of explicit deletes. the generation itself is re-read at most
+    every `generation_ttl` seconds, bounding staleness without adding a round-trip to every request.
+    """
+
+    def __init__(self, backend: ResultCacheBackend, generation_ttl: float = 1.0):
+        self.backend = backend
+        self.generation_ttl = generation_ttl
+
+        self._generation = 0
+        self._generation_read_at = float("-inf")
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+
+    def generation_is_fresh(self) -> bool:
+        #False when the next generation() call goes to the database
+        return time.monotonic() - self._generation_read_at < self.generation_ttl
+
+    def _store_generation(self, value: Optional[int]) -> int:
+        with self._lock:
+            self._generation = value or 0
+            self._generation_read_at = time.monotonic()
+            return self._generation
+
+    def generation(self, db) -> int:
+        if self.generation_is_fresh():
+            return self._generation
+
+        return self._store_generation(db.execute(generation_stmt).scalar())
+
+    async def generation_async(self, db) -> int:
+        if self.generation_is_fresh():
+            return self._generation
+
+        return self._store_generation((await db.execute(generation_stmt)).scalar())
+
+    def key(self, query: str, limit: int, model_version: str, backend_name: str, generation: int, filters=None, ef_search=None,
+            mode: str = "semantic") -> str:
+        normalized = re.sub(r"\s+", " ", query).strip().lower()
+        filter_part = filters.model_dump_json(exclude_none=True) if filters is not None and filters.active else ""
+
+        return f'search:{model_version}:{backend_name}:{generation}:{mode}:{limit}:{ef_search or ""}:{filter_part}:{normalized}'
+
+    def get(self, key: str) -> Optional[List[Dict[str, Any]]]:
+        value = self.backend.get(key)
+
+        #counted here rather than in the backend, so hit rates are comparable across backends
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+
+        return value
+
+    def set(self, key: str, value: List[Dict[str, Any]]) -> None:
+        self.backend.set(key, value)
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+
+        return {
+            "backend": self.backend.name,
+            "generation": self._generation,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+        }
+
+def result_cache_from_env() -> Optional[SearchResultCache]:
+    """
+    RESULT_CACHE_BACKEND = local (default) | redis | off
+    """
+    name = os.getenv("RESULT_CACHE_BACKEND", "local").lower()
+    ttl = float(os.getenv("RESULT_CACHE_TTL", 600))
+
+    if name == "off":
+        return None
+
+    if name == "local":
+        backend = LocalResultCache(max_size=int(os.getenv("RESULT_CACHE_SIZE", 4096)), ttl_seconds=ttl)
+    elif name == "redis":
+        backend = RedisResultCache(os.getenv("REDIS_URL", "redis://localhost:6379/0"), ttl_seconds=ttl)
+    else:
+        raise RuntimeError(f'unknown RESULT_CACHE_BACKEND: {name}')
+
+    return SearchResultCache(backend, generation_ttl=float(os.getenv("RESULT_CACHE_GENERATION_TTL", 1.0)))
+
+result_cache = result_cache_from_env()
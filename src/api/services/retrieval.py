@@ -0,0 +1,545 @@
+import os
+import asyncio
+import logging
+import threading
+from abc import ABC, abstractmethod
+from uuid import UUID
+from typing import List, NamedTuple, Optional
+import numpy as np
+from sqlalchemy.orm import Session
+from sqlalchemy import select, Float, text, func, literal, literal_column
+from src.db.models import Track, TrackEmbedding
+from src.db.create_index import version_literal
+
+logger = logging.getLogger(__name__)
+
+class Hit(NamedTuple):
+    """
+    one retrieved track, backend agnostic. score is the similarity (higher the better).
+    """
+    id: UUID
+    title: str
+    artist: str
+    album: Optional[str]
+    release_year: Optional[int]
+    score: float
+    #stored by the preview enrichment job (src/ml/enrich_previews.py), None until a track is enriched
+    preview_url: Optional[str] = None
+    artwork_url: Optional[str] = None
+
+class RetrievalBackend(ABC):
+
+    """
+    pluggable top-k retrieval. SearchService embeds, the backend turns query vectors into per-query hit lists.
+    a backend missing retrieve or retrieve_hybrid fails when it is constructed, not mid-request.
+    """
+
+    name = "base"
+    max_depth = 1000 #deepest result rank the backend can return, bounds pagination
+
+    @abstractmethod
+    def retrieve(self, db: Session, vectors: np.ndarray, limits: List[int], filters=None, ef_search: Optional[int] = None) -> List[List[Hit]]:
+        ...
+
+    async def retrieve_async(self, db, vectors: np.ndarray, limits: List[int], filters=None, ef_search: Optional[int] = None) -> List[List[Hit]]:
+        #generic fallback: drive the sync implementation through the AsyncSession's greenlet bridge
+        return await db.run_sync(self.retrieve, vectors, limits, filters, ef_search)
+
+    @abstractmethod
+    def retrieve_hybrid(self, db: Session, vector: np.ndarray, query: str, limit: int, ef_search: Optional[int] = None) -> List[Hit]:
+        """
+        lexical (full-text) + semantic retrieval fused with reciprocal rank fusion. Hit.score is the fused score.
+        """
+
+    async def retrieve_hybrid_async(self, db, vector: np.ndarray, query: str, limit: int, ef_search: Optional[int] = None) -> List[Hit]:
+        return await db.run_sync(self.retrieve_hybrid, vector, query, limit, ef_search)
+
+#hybrid search: each side contributes its top HYBRID_CANDIDATES, fused as sum(1 / (RRF_K + rank))
+#RRF only needs ranks, so cosine similarity & ts_rank never have to be put on the same scale.
+HYBRID_CANDIDATES = int(os.getenv("HYBRID_CANDIDATES", 50))
+RRF_K = int(os.getenv("RRF_K", 60))
+
+#lexical candidates via the GIN-indexed stored tsvector. websearch syntax, so quotes & -exclusions work as users expect.
+_LEXICAL_SQL = """
+    SELECT t.id AS track_id, row_number() OVER (ORDER BY ts_rank_cd(t.search_vector, q.query) DESC) AS rank
+    FROM tracks t, websearch_to_tsquery('simple', :query) AS q(query)
+    WHERE t.search_vector @@ q.query
+    ORDER BY rank
+    LIMIT :candidates
+"""
+
+#both candidate lists & the fusion in ONE statement/round-trip
+_HYBRID_SEARCH_SQL = f"""
+    WITH semantic AS (
+        SELECT s.track_id, row_number() OVER (ORDER BY s.distance) AS rank
+        FROM (
+            SELECT te.track_id, te.embedding <#> CAST(:vec AS vector) AS distance
+            FROM track_embeddings te
+            WHERE te.model_version = {{version}}
+            ORDER BY distance
+            LIMIT :candidates
+        ) AS s
+    ),
+    lexical AS ({_LEXICAL_SQL}),
+    fused AS (
+        SELECT track_id, SUM(1.0 / (:rrf_k + rank)) AS score
+        FROM (SELECT * FROM semantic UNION ALL SELECT * FROM lexical) AS ranked
+        GROUP BY track_id
+    )
+    SELECT t.id, t.title, t.artist, t.album, t.release_year, f.score, t.preview_url, t.artwork_url
+    FROM fused f
+    JOIN tracks t ON t.id = f.track_id
+    ORDER BY f.score DESC
+    LIMIT :limit
+"""
+
+def reciprocal_rank_fusion(ranked_lists: List[List[UUID]], k: int = RRF_K) -> List[tuple]:
+    """
+    python twin of the SQL fusion, for backends that rank outside postgres. returns [(track_id, score)] best first.
+    """
+    scores = {}
+
+    for ranked in ranked_lists:
+        for rank, track_id in enumerate(ranked, start=1):
+            scores[track_id] = scores.get(track_id, 0.0) + 1.0 / (k + rank)
+
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
+
+#filtered search: below PREFILTER_MAX_ROWS matching tracks an exact scan over the (b-tree filtered) subset is cheaper
+#& exact, above it the ANN index is over-fetched iteratively until the page is full
+PREFILTER_MAX_ROWS = int(os.getenv("PREFILTER_MAX_ROWS", 5000))
+FILTER_OVERFETCH = int(os.getenv("FILTER_OVERFETCH", 10))
+DEFAULT_EF_SEARCH = 40 #pgvector default
+MAX_EF_SEARCH = 1000 #pgvector hard limit
+
+def _filter_clauses(filters) -> list:
+    clauses = []
+
+    if filters.artist:
+        clauses.append(func.lower(Track.artist) == filters.artist.lower())
+    if filters.genre:
+        clauses.append(func.lower(Track.genre) == filters.genre.lower())
+    if filters.year_from is not None:
+        clauses.append(Track.release_year >= filters.year_from)
+    if filters.year_to is not None:
+        clauses.append(Track.release_year <= filters.year_to)
+
+    return clauses
+
+def _estimate_matches(db: Session, clauses: list, cap: int) -> int:
+    """
+    selectivity estimate: counts matching tracks but stops at cap + 1, so a broad filter costs no more than a narrow one
+    """
+    capped = select(literal(1)).select_from(Track).where(*clauses).limit(cap + 1).subquery()
+
+    return db.execute(select(func.count()).select_from(capped)).scalar()
+
+def _version_clause(version: str):
+    return TrackEmbedding.model_version == literal_column(version)
+
+#lean projection: only what a Hit needs, read as plain rows. selecting the Track entity would hydrate ORM objects
+#into the identity map & drag the lyrics TOAST (several KB per track) off disk for every hit, unused by the response
+_HIT_COLUMNS = (Track.id, Track.title, Track.artist, Track.album, Track.release_year)
+_PREVIEW_COLUMNS = (Track.preview_url, Track.artwork_url)
+
+def _build_search_stmt(vector, limit: int, version: str):
+    """
+    inner product ANN query for a single vector, over the vectors of one model version
+    """
+    distance_col = TrackEmbedding.embedding.op('<#>')(vector).cast(Float).label('distance') # <#> postgress negative inner product
+
+    return (
+        select(*_HIT_COLUMNS, distance_col, *_PREVIEW_COLUMNS)
+        .join(TrackEmbedding, Track.id == TrackEmbedding.track_id)
+        .where(_version_clause(version))
+        .order_by(distance_col.asc())
+        .limit(limit)
+    )
+
+#top-k for every query in ONE round-trip: unnest the query vectors & run the ANN query per vector via LATERAL
+#each lateral subquery is an ORDER BY <#> LIMIT k, so the HNSW index still serves every query.
+_BATCH_SEARCH_SQL = """
+    SELECT q.idx, t.id, t.title, t.artist, t.album, t.release_year, hit.distance, t.preview_url, t.artwork_url
+    FROM unnest(CAST(:idxs AS int[]), CAST(:vecs AS text[]), CAST(:limits AS int[])) AS q(idx, vec, k)
+    CROSS JOIN LATERAL (
+        SELECT te.track_id, te.embedding <#> CAST(q.vec AS vector) AS distance
+        FROM track_embeddings te
+        WHERE te.model_version = {version}
+        ORDER BY distance
+        LIMIT q.k
+    ) AS hit
+    JOIN tracks t ON t.id = hit.track_id
+    ORDER BY q.idx, hit.distance
+"""
+
+EMBEDDING_DIM = 384 #matches TrackEmbedding.embedding = Vector(384)
+
+#compact candidate orderings, must match the expression indexes built by src/db/create_index.py exactly
+#halfvec: 2 bytes/dim (half the index), binary: 1 bit/dim (1/32 of the index) compared by hamming distance
+_CANDIDATE_ORDER = {
+    "halfvec": f"te.embedding::halfvec({EMBEDDING_DIM}) <#> CAST(q.vec AS halfvec({EMBEDDING_DIM}))",
+    "binary": f"binary_quantize(te.embedding)::bit({EMBEDDING_DIM}) <~> binary_quantize(CAST(q.vec AS vector))",
+}
+
+#two-stage search: over-fetch candidates from the compact index, rerank them exactly on the full precision vectors
+_RERANK_SEARCH_SQL = """
+    SELECT q.idx, t.id, t.title, t.artist, t.album, t.release_year, hit.distance, t.preview_url, t.artwork_url
+    FROM unnest(CAST(:idxs AS int[]), CAST(:vecs AS text[]), CAST(:limits AS int[]), CAST(:candidates AS int[])) AS q(idx, vec, k, n)
+    CROSS JOIN LATERAL (
+        SELECT c.track_id, c.embedding <#> CAST(q.vec AS vector) AS distance
+        FROM (
+            SELECT te.track_id, te.embedding
+            FROM track_embeddings te
+            WHERE te.model_version = {version}
+            ORDER BY {order}
+            LIMIT q.n
+        ) AS c
+        ORDER BY distance
+        LIMIT q.k
+    ) AS hit
+    JOIN tracks t ON t.id = hit.track_id
+    ORDER BY q.idx, hit.distance
+"""
+
+#hnsw returns at most ef_search rows per scan, it has to cover the over-fetched candidate pool
+_SET_EF_SEARCH_SQL = text("SELECT set_config('hnsw.ef_search', :ef_search, true)")
+
+def _ef_search_value(limits: List[int], ef_search: Optional[int] = None) -> Optional[str]:
+    """
+    per-transaction hnsw.ef_search: the requested recall knob, raised to cover the deepest page asked for
+    (hnsw never returns more than ef_search rows). None keeps the server default & saves the round-trip.
+    """
+    wanted = max(limits)
+
+    if ef_search is None and wanted <= DEFAULT_EF_SEARCH:
+        return None
+
+    return str(min(max(ef_search or DEFAULT_EF_SEARCH, wanted), MAX_EF_SEARCH))
+
+def _build_prefilter_stmt(vector, limit: int, clauses: list, version: str):
+    """
+    exact search over the filtered subset. ordering by `distance + 0` keeps the planner off the HNSW index,
+    so the filter runs first (b-tree) & only the matching vectors are scored.
+    """
+    distance_col = TrackEmbedding.embedding.op('<#>')(vector).cast(Float)
+
+    return (
+        select(*_HIT_COLUMNS, distance_col.label('distance'), *_PREVIEW_COLUMNS)
+        .join(TrackEmbedding, Track.id == TrackEmbedding.track_id)
+        .where(_version_clause(version), *clauses)
+        .order_by((distance_col + 0).asc())
+        .limit(limit)
+    )
+
+def _build_overfetch_stmt(vector, limit: int, candidates: int, clauses: list, version: str):
+    """
+    ANN over-fetch: the inner query walks the HNSW index for `candidates` rows, the filter applies to those.
+    """
+    pool = (
+        select(TrackEmbedding.track_id, TrackEmbedding.embedding)
+        .where(_version_clause(version))
+        .order_by(TrackEmbedding.embedding.op('<#>')(vector))
+        .limit(candidates)
+        .subquery()
+    )
+    distance_col = pool.c.embedding.op('<#>')(vector).cast(Float).label('distance')
+
+    return (
+        select(*_HIT_COLUMNS, distance_col, *_PREVIEW_COLUMNS)
+        .join(pool, Track.id == pool.c.track_id)
+        .where(*clauses)
+        .order_by(distance_col.asc())
+        .limit(limit)
+    )
+
+def _to_pg_vector(vector) -> str:
+    return "[" + ",".join(map(repr, vector.tolist())) + "]"
+
+class PgvectorBackend(RetrievalBackend):
+
+    """
+    default backend: HNSW search inside postgres via the <#> operator.
+    with quantization = halfvec | binary, candidates come from the compact index (limit * overfetch) & are reranked exactly.
+    every query is pinned to one model_version (the serving model by default), vectors of other versions are never scanned.
+    """
+
+    name = "pgvector"
+
+    def __init__(self, quantization: str = "none", overfetch: int = 4, model_version: Optional[str] = None):
+        if quantization not in ("none", *_CANDIDATE_ORDER):
+            raise RuntimeError(f'unknown PGVECTOR_QUANTIZATION: {quantization}')
+
+        if model_version is None:
+            from src.ml.embeddings import EmbeddingModel
+            model_version = EmbeddingModel.MODEL_ID
+
+        self.quantization = quantization
+        self.overfetch = overfetch
+        self.model_version = model_version
+
+        self._version = version_literal(model_version)
+        self._batch_sql = text(_BATCH_SEARCH_SQL.format(version=self._version))
+        self._hybrid_sql = text(_HYBRID_SEARCH_SQL.format(version=self._version))
+
+        if quantization != "none":
+            self.name = f'pgvector-{quantization}'
+            self._rerank_sql = text(_RERANK_SEARCH_SQL.format(order=_CANDIDATE_ORDER[quantization], version=self._version))
+
+    def _single_hits(self, rows) -> List[List[Hit]]:
+        return [[
+            Hit(track_id, title, artist, album, release_year, -1 * neg_dot_prod, preview_url, artwork_url)
+            for track_id, title, artist, album, release_year, neg_dot_prod, preview_url, artwork_url in rows
+        ]]
+
+    def _batch_params(self, vectors: np.ndarray, limits: List[int]) -> dict:
+        return {
+            "idxs": list(range(len(vectors))),
+            "vecs": [_to_pg_vector(v) for v in vectors],
+            "limits": limits
+        }
+
+    def _rerank_params(self, vectors: np.ndarray, limits: List[int], ef_search: Optional[int] = None) -> dict:
+        params = self._batch_params(vectors, limits)
+        params["candidates"] = [limit * self.overfetch for limit in limits]
+        params["ef_search"] = _ef_search_value(params["candidates"], ef_search) or str(DEFAULT_EF_SEARCH)
+
+        return params
+
+    def _batch_hits(self, rows, n: int) -> List[List[Hit]]:
+        grouped: List[List[Hit]] = [[] for _ in range(n)]
+
+        for idx, track_id, title, artist, album, release_year, distance, preview_url, artwork_url in rows:
+            grouped[idx].append(Hit(track_id, title, artist, album, release_year, -1 * distance, preview_url, artwork_url))
+
+        return grouped
+
+    def _filtered(self, db: Session, vector, limit: int, filters, ef_search: Optional[int] = None) -> List[Hit]:
+        """
+        picks the strategy from the estimated selectivity. filtered queries always use full precision vectors.
+        """
+        clauses = _filter_clauses(filters)
+
+        if _estimate_matches(db, clauses, PREFILTER_MAX_ROWS) <= PREFILTER_MAX_ROWS:
+            return self._single_hits(db.execute(_build_prefilter_stmt(vector, limit, clauses, self._version)).all())[0]
+
+        candidates = max(limit * FILTER_OVERFETCH, ef_search or 0)
+
+        while True:
+            candidates = min(candidates, MAX_EF_SEARCH)
+            db.execute(_SET_EF_SEARCH_SQL, {"ef_search": str(max(candidates, 40))})
+
+            hits = self._single_hits(db.execute(_build_overfetch_stmt(vector, limit, candidates, clauses, self._version)).all())[0]
+
+            if len(hits) >= limit or candidates >= MAX_EF_SEARCH:
+                break
+            candidates *= 4
+
+        if len(hits) < limit:
+            #broad estimate but the matches sit far from the query, the exact scan guarantees a full page
+            hits = self._single_hits(db.execute(_build_prefilter_stmt(vector, limit, clauses, self._version)).all())[0]
+
+        return hits
+
+    def retrieve(self, db: Session, vectors: np.ndarray, limits: List[int], filters=None, ef_search: Optional[int] = None) -> List[List[Hit]]:
+        if filters is not None and filters.active:
+            return [self._filtered(db, vector, limit, filters, ef_search) for vector, limit in zip(vectors, limits)]
+
+        if self.quantization != "none":
+            params = self._rerank_params(vectors, limits, ef_search)
+            db.execute(_SET_EF_SEARCH_SQL, params)
+            return self._batch_hits(db.execute(self._rerank_sql, params).all(), len(vectors))
+
+        ef_value = _ef_search_value(limits, ef_search)
+        if ef_value is not None:
+            db.execute(_SET_EF_SEARCH_SQL, {"ef_search": ef_value})
+
+        if len(vectors) == 1:
+            return self._single_hits(db.execute(_build_search_stmt(vectors[0], limits[0], self._version)).all())
+
+        rows = db.execute(self._batch_sql, self._batch_params(vectors, limits)).all()
+        return self._batch_hits(rows, len(vectors))
+
+    async def retrieve_async(self, db, vectors: np.ndarray, limits: List[int], filters=None, ef_search: Optional[int] = None) -> List[List[Hit]]:
+        if filters is not None and filters.active:
+            return await super().retrieve_async(db, vectors, limits, filters, ef_search)
+
+        if self.quantization != "none":
+            params = self._rerank_params(vectors, limits, ef_search)
+            await db.execute(_SET_EF_SEARCH_SQL, params)
+            return self._batch_hits((await db.execute(self._rerank_sql, params)).all(), len(vectors))
+
+        ef_value = _ef_search_value(limits, ef_search)
+        if ef_value is not None:
+            await db.execute(_SET_EF_SEARCH_SQL, {"ef_search": ef_value})
+
+        if len(vectors) == 1:
+            return self._single_hits((await db.execute(_build_search_stmt(vectors[0], limits[0], self._version))).all())
+
+        rows = (await db.execute(self._batch_sql, self._batch_params(vectors, limits))).all()
+        return self._batch_hits(rows, len(vectors))
+
+    def _hybrid_params(self, vector: np.ndarray, query: str, limit: int) -> dict:
+        return {
+            "vec": _to_pg_vector(vector),
+            "query": query,
+            "candidates": max(HYBRID_CANDIDATES, limit),
+            "rrf_k": RRF_K,
+            "limit": limit
+        }
+
+    def _hybrid_hits(self, rows) -> List[Hit]:
+        return [
+            Hit(track_id, title, artist, album, release_year, float(score), preview_url, artwork_url)
+            for track_id, title, artist, album, release_year, score, preview_url, artwork_url in rows
+        ]
+
+    def retrieve_hybrid(self, db: Session, vector: np.ndarray, query: str, limit: int, ef_search: Optional[int] = None) -> List[Hit]:
+        params = self._hybrid_params(vector, query, limit)
+
+        ef_value = _ef_search_value([params["candidates"]], ef_search)
+        if ef_value is not None:
+            db.execute(_SET_EF_SEARCH_SQL, {"ef_search": ef_value})
+
+        return self._hybrid_hits(db.execute(self._hybrid_sql, params).all())
+
+    async def retrieve_hybrid_async(self, db, vector: np.ndarray, query: str, limit: int, ef_search: Optional[int] = None) -> List[Hit]:
+        params = self._hybrid_params(vector, query, limit)
+
+        ef_value = _ef_search_value([params["candidates"]], ef_search)
+        if ef_value is not None:
+            await db.execute(_SET_EF_SEARCH_SQL, {"ef_search": ef_value})
+
+        return self._hybrid_hits((await db.execute(self._hybrid_sql, params)).all())
+
+class NumpyBackend(RetrievalBackend):
+
+    """
+    exact top-k from an in-process memory-mapped matrix (see src/ml/vector_index.py), one GEMM per batch.
+    postgres is only hit once, for the metadata of the winning ids.
+    """
+
+    name = "numpy"
+
+    def __init__(self, index):
+        self.index = index
+        self.max_depth = index.count #exact search, any depth
+
+    def _metadata_stmt(self, top, clauses: Optional[list] = None):
+        ids = {track_id for hits in top for track_id, _ in hits}
+
+        return (
+            select(*_HIT_COLUMNS, *_PREVIEW_COLUMNS)
+            .where(Track.id.in_(ids), *(clauses or []))
+        )
+
+    def _merge(self, top, rows) -> List[List[Hit]]:
+        meta = {row.id: row for row in rows}
+
+        #ids missing from postgres (track deleted after the export) are dropped
+        return [
+            [Hit(track_id, meta[track_id].title, meta[track_id].artist, meta[track_id].album, meta[track_id].release_year, score,
+                 meta[track_id].preview_url, meta[track_id].artwork_url)
+             for track_id, score in hits if track_id in meta]
+            for hits in top
+        ]
+
+    def _filtered(self, db: Session, vector, limit: int, filters) -> List[Hit]:
+        clauses = _filter_clauses(filters)
+
+        if _estimate_matches(db, clauses, PREFILTER_MAX_ROWS) <= PREFILTER_MAX_ROWS:
+            #score only the matching rows of the matrix
+            track_ids = db.execute(select(Track.id).where(*clauses)).scalars().all()
+            top = [self.index.top_k_subset(vector, track_ids, limit)]
+
+            return self._merge(top, db.execute(self._metadata_stmt(top)).all())[0] if top[0] else []
+
+        candidates = limit * FILTER_OVERFETCH
+
+        while True:
+            candidates = min(candidates, self.index.count)
+            top = self.index.top_k(vector[None, :], [candidates])
+
+            #the metadata lookup applies the filter, non matching ids are dropped by _merge
+            hits = self._merge(top, db.execute(self._metadata_stmt(top, clauses)).all())[0]
+
+            if len(hits) >= limit or candidates >= self.index.count:
+                return hits[:limit]
+            candidates *= 4
+
+    def retrieve(self, db: Session, vectors: np.ndarray, limits: List[int], filters=None, ef_search: Optional[int] = None) -> List[List[Hit]]:
+        #ef_search is an HNSW knob, the numpy index is always exact
+        if filters is not None and filters.active:
+            return [self._filtered(db, vector, limit, filters) for vector, limit in zip(vectors, limits)]
+
+        top = self.index.top_k(vectors, limits)
+
+        if not any(top):
+            return top
+
+        return self._merge(top, db.execute(self._metadata_stmt(top)).all())
+
+    def retrieve_hybrid(self, db: Session, vector: np.ndarray, query: str, limit: int, ef_search: Optional[int] = None) -> List[Hit]:
+        candidates = max(HYBRID_CANDIDATES, limit)
+
+        semantic = [track_id for track_id, _ in self.index.top_k(vector[None, :], [candidates])[0]]
+        lexical = db.execute(text(_LEXICAL_SQL), {"query": query, "candidates": candidates}).scalars().all()
+
+        top = [reciprocal_rank_fusion([semantic, lexical])[:limit]]
+
+        return self._merge(top, db.execute(self._metadata_stmt(top)).all())[0]
+
+    async def retrieve_async(self, db, vectors: np.ndarray, limits: List[int], filters=None, ef_search: Optional[int] = None) -> List[List[Hit]]:
+        if filters is not None and filters.active:
+            return await super().retrieve_async(db, vectors, limits, filters, ef_search)
+
+        #the matmul is CPU bound, keep it off the event loop
+        top = await asyncio.to_thread(self.index.top_k, vectors, limits)
+
+        if not any(top):
+            return top
+
+        return self._merge(top, (await db.execute(self._metadata_stmt(top))).all())
+
+_backend: Optional[RetrievalBackend] = None
+_backend_lock = threading.Lock()
+
+def get_retrieval_backend() -> RetrievalBackend:
+    """
+    process-wide backend picked by SEARCH_BACKEND (pgvector | numpy), built once on first use.
+    the numpy index is read from NUMPY_INDEX_DIR, exported with `python -m src.ml.vector_index`.
+    """
+    global _backend
+
+    if _backend is not None:
+        return _backend
+
+    with _backend_lock:
+        if _backend is None:
+            name = os.getenv("SEARCH_BACKEND", "pgvector").lower()
+
+            if name == "numpy":
+                from src.ml.vector_index import NumpyVectorIndex
+                from src.ml.embeddings import embedding_model
+
+                index = NumpyVectorIndex(os.getenv("NUMPY_INDEX_DIR", "data/index"))
+
+                if index.model_version != embedding_model.MODEL_ID:
+                    raise RuntimeError(f'numpy index was exported for {index.model_version}, serving model is {embedding_model.MODEL_ID}')
+
+                _backend = NumpyBackend(index)
+
+            elif name == "pgvector":
+                from src.ml.embeddings import embedding_model
+
+                _backend = PgvectorBackend(
+                    quantization=os.getenv("PGVECTOR_QUANTIZATION", "none").lower(),
+                    overfetch=int(os.getenv("RERANK_OVERFETCH", 4)),
+                    model_version=embedding_model.MODEL_ID #query vectors come from this model, only its vectors are comparable
+                )
+
+            else:
+                raise RuntimeError(f'unknown SEARCH_BACKEND: {name}')
+
+            logger.info(f'retrieval backend: {_backend.name}')
+
+    return _backend
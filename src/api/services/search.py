@@ -1,53 +1,341 @@
+import os
+import json
+import time
+import base64
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 from sqlalchemy.orm import Session
-from typing import List
-from src.api.schemas import TrackMetadata, SearchResult
+from typing import List, Tuple, Dict, Optional, TYPE_CHECKING
+from src.api.schemas import TrackMetadata, SearchResult, SearchFilters
 from src.ml.embeddings import embedding_model
-from sqlalchemy import select, Float
-from src.db.models import Track, TrackEmbedding
+from src.api.services.retrieval import Hit, RetrievalBackend, get_retrieval_backend
+from src.api.services.result_cache import SearchResultCache, result_cache as default_result_cache
+from src.api.services.shadow import ShadowSearch, shadow_search as default_shadow
+from src.monitoring.metrics import SEARCH_STAGE_SECONDS, SEARCH_CACHE_HITS
+
+if TYPE_CHECKING:
+    from sqlalchemy.ext.asyncio import AsyncSession
+
+#dedicated pool for model inference on the async path, keeps the event loop free & off the starlette threadpool
+inference_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv("INFERENCE_WORKERS", 4)),
+    thread_name_prefix="inference"
+)
+
+#recall/latency presets, mapped onto hnsw.ef_search (pgvector default 40)
+QUALITY_EF_SEARCH = {"fast": 20, "balanced": 40, "high": 200}
+
+def resolve_ef_search(quality: Optional[str], ef_search: Optional[int]) -> Optional[int]:
+    """
+    explicit ef_search wins over the quality preset, None keeps the server default
+    """
+    if ef_search is not None:
+        return ef_search
+
+    return QUALITY_EF_SEARCH.get(quality) if quality else None
+
+def encode_cursor(offset: int) -> str:
+    return base64.urlsafe_b64encode(json.dumps({"offset": offset}).encode()).decode()
+
+def decode_cursor(cursor: Optional[str]) -> int:
+    if not cursor:
+        return 0
+
+    try:
+        offset = int(json.loads(base64.urlsafe_b64decode(cursor.encode()))["offset"])
+    except Exception:
+        raise ValueError("invalid pagination cursor")
+
+    if offset < 0:
+        raise ValueError("invalid pagination cursor")
+
+    return offset
+
+def _page_window(offset: int, limit: int, max_depth: int) -> int:
+    """
+    pages are sliced out of cached result windows of limit * 2^j ranks, so the first page costs exactly what it
+    did before paging existed, & walking n pages re-runs the ANN query only O(log n) times.
+    """
+    if offset > 0 and offset >= max_depth:
+        raise ValueError(f'pagination is limited to the top {max_depth} results')
+
+    if max_depth == 0:
+        return limit #empty index, the first page is simply empty
+
+    window = limit
+    while window < offset + limit:
+        window *= 2
+
+    return min(window, max_depth)
+
+def _slice_page(results: List[SearchResult], offset: int, limit: int, window: int, max_depth: int) -> Tuple[List[SearchResult], Optional[str]]:
+    page = results[offset:offset + limit]
+
+    #a full window means there may be more beyond it
+    has_more = offset + limit < len(results) or (len(results) == window and window < max_depth)
+
+    return page, encode_cursor(offset + limit) if page and has_more else None
+
+def _check_mode(mode: str, filters: Optional[SearchFilters]):
+    if mode == "hybrid" and filters is not None and filters.active:
+        raise ValueError("filters are not supported in hybrid mode")
+
+def _checkout(db):
+    #the first statement of a request checks a pooled connection out, timed on its own so pool waits show up separately
+    if not db.in_transaction():
+        with SEARCH_STAGE_SECONDS.time("db_checkout"):
+            db.connection()
+
+async def _checkout_async(db):
+    if not db.in_transaction():
+        with SEARCH_STAGE_SECONDS.time("db_checkout"):
+            await db.connection()
+
+def _format_results(hits: List[Hit]) -> List[SearchResult]:
+    #hits come straight from our own rows, model_construct skips re-validating every field of every result
+    return [
+        SearchResult.model_construct(
+            id=hit.id,
+            score=round(hit.score, 4),
+            metadata=TrackMetadata.model_construct(
+                title=hit.title,
+                artist=hit.artist,
+                album=hit.album,
+                release_year=None if hit.release_year is None else str(hit.release_year), #integer column, string in the contract
+                preview_url=hit.preview_url,
+                artwork_url=hit.artwork_url
+            ))
+        for hit in hits
+    ]
+
+def _strip_previews(page: List[SearchResult]) -> List[SearchResult]:
+    #cached pages always carry the preview fields, callers that didn't ask for them get the pre-enrichment contract
+    return [r.model_copy(update={"metadata": r.metadata.model_copy(update={"preview_url": None, "artwork_url": None})}) for r in page]
 
 class SearchService:
 
-    def __init__(self, db: Session):
+    def __init__(self, db: Session, backend: Optional[RetrievalBackend] = None, cache: Optional[SearchResultCache] = default_result_cache,
+                 shadow: Optional[ShadowSearch] = default_shadow):
         self.db = db
+        self.backend = backend or get_retrieval_backend() #pgvector by default, see SEARCH_BACKEND
+        self.cache = cache
+        self.shadow = shadow #candidate model version evaluated in the background, see SHADOW_MODEL_VERSION
 
-    def search(self, query: str, limit: int = 10) -> List[SearchResult]:
+    def search(self, query: str, limit: int = 10, filters: Optional[SearchFilters] = None, ef_search: Optional[int] = None,
+               mode: str = "semantic") -> List[SearchResult]:
 
         """
         1. uses the embedding model to embed the query
-        2. use inner product for ANN needed for HNSW search
+        2. top-k retrieval via the configured backend (pgvector HNSW or in-process numpy index), over the serving model version
+           filtered queries pick pre-filtering or iterative ANN over-fetching from the estimated selectivity
+           hybrid mode fuses full-text & vector rankings (reciprocal rank fusion)
         3. format result as per metadata contract
-        4. retrieval post ANN compute & search 
+        4. in shadow mode, hand the query & live result to the candidate version's background comparison
+
+        """
+
+        _check_mode(mode, filters)
+        t0 = time.perf_counter()
+
+        with SEARCH_STAGE_SECONDS.time("embed"):
+            vector = embedding_model.embed_query(query)
+
+        _checkout(self.db)
+
+        with SEARCH_STAGE_SECONDS.time("ann"):
+            if mode == "hybrid":
+                hits = self.backend.retrieve_hybrid(self.db, vector, query, limit, ef_search)
+            else:
+                hits = self.backend.retrieve(self.db, vector[None, :], [limit], filters, ef_search)[0]
+
+        if self.shadow is not None:
+            self.shadow.submit(query, limit, filters, ef_search, mode, [hit.id for hit in hits], (time.perf_counter() - t0) * 1000)
+
+        with SEARCH_STAGE_SECONDS.time("serialize"):
+            return _format_results(hits)
+
+    def search_cached(self, query: str, limit: int = 10, filters: Optional[SearchFilters] = None, ef_search: Optional[int] = None,
+                      mode: str = "semantic") -> Tuple[List[SearchResult], bool]:
+
+        """
+        search() behind the result cache, returns (results, cache_hit).
+        pages are deterministic per (query, limit, filters, ef_search, mode, model, backend) until the pipeline bumps the generation.
 
         """
 
-        vector = embedding_model.embed_query(query)
+        if self.cache is None:
+            return self.search(query, limit, filters, ef_search, mode), False
+
+        #the generation read, when due, is the request's first statement: the pool checkout is timed there
+        if not self.cache.generation_is_fresh():
+            _checkout(self.db)
+
+        key = self.cache.key(query, limit, embedding_model.MODEL_ID, self.backend.name, self.cache.generation(self.db), filters, ef_search, mode)
+
+        cached = self.cache.get(key)
+        if cached is not None:
+            SEARCH_CACHE_HITS.inc()
+            return [SearchResult.model_validate(item) for item in cached], True
+
+        results = self.search(query, limit, filters, ef_search, mode)
+        self.cache.set(key, [r.model_dump(mode="json") for r in results])
+
+        return results, False
+
+    def search_page(self, query: str, limit: int = 10, filters: Optional[SearchFilters] = None, ef_search: Optional[int] = None,
+                    cursor: Optional[str] = None, mode: str = "semantic", include_preview: bool = False) -> Tuple[List[SearchResult], Optional[str], bool]:
+
+        """
+        cursor-paginated search, returns (page, next_cursor, cache_hit). see _page_window for how windows are reused.
+        include_preview returns the stored preview/artwork URLs (src/ml/enrich_previews.py), null until a track is enriched.
+
+        """
+
+        offset = decode_cursor(cursor)
+        window = _page_window(offset, limit, self.backend.max_depth)
+
+        results, cached = self.search_cached(query, window, filters, ef_search, mode)
+        page, next_cursor = _slice_page(results, offset, limit, window, self.backend.max_depth)
+
+        if not include_preview:
+            page = _strip_previews(page)
+
+        return page, next_cursor, cached
+
+    def search_batch(self, queries: List[str], limits: List[int], filters: Optional[List[Optional[SearchFilters]]] = None,
+                     ef_search: Optional[int] = None, modes: Optional[List[str]] = None,
+                     cursors: Optional[List[Optional[str]]] = None,
+                     include_previews: Optional[List[bool]] = None) -> Tuple[List[List[SearchResult]], List[Optional[str]], Dict[str, float]]:
+
+        """
+        bulk search for offline jobs: one embedding call for all queries, one retrieval round-trip for all top-k lists.
+        each query is paged like search_page (its own cursor, same result windows, previews only if it asked for them).
+        returns per-query pages & next cursors (request order) & a per-stage latency breakdown in ms.
+
+        """
+
+        filters = filters or [None] * len(queries)
+        modes = modes or ["semantic"] * len(queries)
+        offsets = [decode_cursor(c) for c in (cursors or [None] * len(queries))]
+
+        #a bad request is rejected before it pays for the embedding call
+        for mode, f in zip(modes, filters):
+            _check_mode(mode, f)
+
+        windows = [_page_window(offset, limit, self.backend.max_depth) for offset, limit in zip(offsets, limits)]
+
+        t0 = time.perf_counter()
+        vectors = embedding_model.embed_queries(queries)
+        t1 = time.perf_counter()
+
+        _checkout(self.db)
+
+        hybrid = [i for i, mode in enumerate(modes) if mode == "hybrid"]
+        filtered = [i for i, f in enumerate(filters) if f is not None and f.active]
+        plain = [i for i in range(len(queries)) if i not in set(filtered) | set(hybrid)]
+
+        grouped_hits: List[List[Hit]] = [[] for _ in queries]
+
+        #plain queries share one round-trip, filtered & hybrid ones need their own strategy each
+        if plain:
+            for i, hits in zip(plain, self.backend.retrieve(self.db, vectors[plain], [windows[i] for i in plain], None, ef_search)):
+                grouped_hits[i] = hits
+
+        for i in filtered:
+            grouped_hits[i] = self.backend.retrieve(self.db, vectors[i][None, :], [windows[i]], filters[i], ef_search)[0]
+
+        for i in hybrid:
+            grouped_hits[i] = self.backend.retrieve_hybrid(self.db, vectors[i], queries[i], windows[i], ef_search)
+        t2 = time.perf_counter()
+
+        pages = [
+            _slice_page(_format_results(hits), offset, limit, window, self.backend.max_depth)
+            for hits, offset, limit, window in zip(grouped_hits, offsets, limits, windows)
+        ]
+        results = [
+            page if include_preview else _strip_previews(page)
+            for (page, _), include_preview in zip(pages, include_previews or [False] * len(queries))
+        ]
+        t3 = time.perf_counter()
+
+        stages = {
+            "embed_ms": round((t1 - t0) * 1000, 2),
+            "db_ms": round((t2 - t1) * 1000, 2),
+            "format_ms": round((t3 - t2) * 1000, 2)
+        }
+
+        return results, [next_cursor for _, next_cursor in pages], stages
+
+class AsyncSearchService:
+
+    """
+    async variant of SearchService (ASYNC_SEARCH=true), same retrieval backends & contract.
+    inference runs on the dedicated executor, the postgres round-trip awaits on asyncpg, so the loop is never blocked.
+    """
+
+    def __init__(self, db: "AsyncSession", backend: Optional[RetrievalBackend] = None, cache: Optional[SearchResultCache] = default_result_cache,
+                 shadow: Optional[ShadowSearch] = default_shadow):
+        self.db = db
+        self.backend = backend or get_retrieval_backend()
+        self.cache = cache
+        self.shadow = shadow
+
+    async def search(self, query: str, limit: int = 10, filters: Optional[SearchFilters] = None, ef_search: Optional[int] = None,
+                     mode: str = "semantic") -> List[SearchResult]:
+
+        _check_mode(mode, filters)
+        t0 = time.perf_counter()
+
+        loop = asyncio.get_running_loop()
+        with SEARCH_STAGE_SECONDS.time("embed"):
+            vector = await loop.run_in_executor(inference_executor, embedding_model.embed_query, query)
+
+        await _checkout_async(self.db)
+
+        with SEARCH_STAGE_SECONDS.time("ann"):
+            if mode == "hybrid":
+                hits = await self.backend.retrieve_hybrid_async(self.db, vector, query, limit, ef_search)
+            else:
+                hits = (await self.backend.retrieve_async(self.db, vector[None, :], [limit], filters, ef_search))[0]
+
+        if self.shadow is not None:
+            self.shadow.submit(query, limit, filters, ef_search, mode, [hit.id for hit in hits], (time.perf_counter() - t0) * 1000)
+
+        with SEARCH_STAGE_SECONDS.time("serialize"):
+            return _format_results(hits)
+
+    async def search_cached(self, query: str, limit: int = 10, filters: Optional[SearchFilters] = None, ef_search: Optional[int] = None,
+                            mode: str = "semantic") -> Tuple[List[SearchResult], bool]:
+
+        if self.cache is None:
+            return await self.search(query, limit, filters, ef_search, mode), False
+
+        if not self.cache.generation_is_fresh():
+            await _checkout_async(self.db)
 
-        distance_col = TrackEmbedding.embedding.op('<#>')(vector).cast(Float).label('distance') # <#> postgress negative inner product
+        generation = await self.cache.generation_async(self.db)
+        key = self.cache.key(query, limit, embedding_model.MODEL_ID, self.backend.name, generation, filters, ef_search, mode)
 
-        stmt= select(Track, distance_col).join(TrackEmbedding, Track.id == TrackEmbedding.track_id).order_by(distance_col.asc()).limit(limit)
+        cached = self.cache.get(key)
+        if cached is not None:
+            SEARCH_CACHE_HITS.inc()
+            return [SearchResult.model_validate(item) for item in cached], True
 
-        result = self.db.execute(stmt).all()
+        results = await self.search(query, limit, filters, ef_search, mode)
+        self.cache.set(key, [r.model_dump(mode="json") for r in results])
 
-        # 5. Formating results
-        response_items=[]
+        return results, False
 
-        for row in result:
-            track = row[0] #Track ORM object
-            neg_dot_prod = row[1] #row operator result
-            similarity = -1* neg_dot_prod
+    async def search_page(self, query: str, limit: int = 10, filters: Optional[SearchFilters] = None, ef_search: Optional[int] = None,
+                          cursor: Optional[str] = None, mode: str = "semantic", include_preview: bool = False) -> Tuple[List[SearchResult], Optional[str], bool]:
 
-            response_items.append(SearchResult(
-                id=track.id,
-                score = round(similarity,4), 
-                metadata=TrackMetadata(
-                    title=track.title,
-                    artist=track.artist,
-                    album=track.album,
-                    release_year=track.release_year
-                )))
-            
-        return response_items
+        offset = decode_cursor(cursor)
+        window = _page_window(offset, limit, self.backend.max_depth)
 
+        results, cached = await self.search_cached(query, window, filters, ef_search, mode)
+        page, next_cursor = _slice_page(results, offset, limit, window, self.backend.max_depth)
 
+        if not include_preview:
+            page = _strip_previews(page)
 
-        
+        return page, next_cursor, cached
@@ -0,0 +1,144 @@
+import os
+import json
+import time
+import random
+import logging
+import threading
+from uuid import UUID
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+from src.db.session import SessionLocal
+from src.api.services.retrieval import PgvectorBackend
+from src.monitoring.metrics import SHADOW_OVERLAP, SHADOW_SECONDS, SHADOW_DROPPED
+
+logger = logging.getLogger(__name__)
+
+def overlap_at_k(live: List[UUID], candidate: List[UUID]) -> float:
+    """
+    share of the live top-k the candidate also returned, order ignored. 1.0 for two empty pages.
+    """
+    if not live:
+        return 1.0 if not candidate else 0.0
+
+    return len(set(live) & set(candidate)) / len(live)
+
+class ShadowSearch:
+
+    """
+    re-runs a sample of live searches against a candidate model version, off the request path: the candidate model
+    embeds the query, its own partial HNSW index answers, & overlap/latency versus the live result are logged & exported.
+    pending work is bounded, when the candidate can't keep up queries are dropped (counted), never queued behind each other,
+    so evaluating a new model can't add latency to production requests.
+    """
+
+    def __init__(self, model_version: str, sample_rate: float = 1.0, max_pending: int = 32, workers: int = 1,
+                 encoder=None, backend=None):
+        self.model_version = model_version
+        self.sample_rate = sample_rate
+
+        #loaded on the first shadowed query, the candidate model is only paid for when shadowing is on
+        self._encoder = encoder
+        self._backend = backend
+        self._init_lock = threading.Lock()
+
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="shadow")
+
+    def _components(self):
+        if self._encoder is None:
+            with self._init_lock:
+                if self._encoder is None:
+                    from src.ml.embeddings import EmbeddingModel
+
+                    self._backend = self._backend or PgvectorBackend(model_version=self.model_version)
+                    #torch: the onnx export in ONNX_MODEL_DIR is the live model's
+                    self._encoder = EmbeddingModel(backend="torch", model_id=self.model_version)
+
+        return self._encoder, self._backend
+
+    def submit(self, query: str, limit: int, filters, ef_search: Optional[int], mode: str, live_ids: List[UUID], live_ms: float) -> bool:
+        """
+        non-blocking, returns whether the query was handed to the shadow worker.
+        """
+        if random.random() >= self.sample_rate:
+            return False
+
+        if not self._slots.acquire(blocking=False):
+            SHADOW_DROPPED.inc(self.model_version)
+            return False
+
+        try:
+            self.executor.submit(self._run, query, limit, filters, ef_search, mode, live_ids, live_ms)
+        except RuntimeError: #executor shut down
+            self._slots.release()
+            return False
+
+        return True
+
+    def _run(self, *args):
+        try:
+            self.compare(*args)
+        except Exception as e:
+            logger.warning(f'shadow search failed for {self.model_version}: {e}')
+        finally:
+            self._slots.release()
+
+    def compare(self, query: str, limit: int, filters, ef_search: Optional[int], mode: str, live_ids: List[UUID], live_ms: float) -> Dict[str, Any]:
+        encoder, backend = self._components()
+        db = SessionLocal()
+
+        try:
+            t0 = time.perf_counter()
+            vector = encoder.embed_query(query)
+
+            if mode == "hybrid":
+                hits = backend.retrieve_hybrid(db, vector, query, limit, ef_search)
+            else:
+                hits = backend.retrieve(db, vector[None, :], [limit], filters, ef_search)[0]
+            shadow_ms = (time.perf_counter() - t0) * 1000
+
+        finally:
+            db.close()
+
+        candidate_ids = [hit.id for hit in hits]
+        overlap = overlap_at_k(live_ids, candidate_ids)
+
+        SHADOW_OVERLAP.observe(overlap, self.model_version)
+        SHADOW_SECONDS.observe(shadow_ms / 1000, self.model_version)
+
+        record = {
+            "candidate": self.model_version,
+            "query": query,
+            "mode": mode,
+            "k": limit,
+            "overlap": round(overlap, 4),
+            "top1_match": bool(live_ids and candidate_ids and live_ids[0] == candidate_ids[0]),
+            "live_ms": round(live_ms, 2),
+            "shadow_ms": round(shadow_ms, 2),
+        }
+        logger.info(f'shadow {json.dumps(record)}')
+
+        return record
+
+def shadow_from_env() -> Optional[ShadowSearch]:
+    """
+    SHADOW_MODEL_VERSION = candidate model version to evaluate (unset = shadow mode off)
+    """
+    version = os.getenv("SHADOW_MODEL_VERSION")
+
+    if not version:
+        return None
+
+    from src.ml.embeddings import EmbeddingModel
+
+    if version == EmbeddingModel.MODEL_ID:
+        raise RuntimeError(f'SHADOW_MODEL_VERSION is the serving model version ({version})')
+
+    return ShadowSearch(
+        version,
+        sample_rate=float(os.getenv("SHADOW_SAMPLE_RATE", 1.0)),
+        max_pending=int(os.getenv("SHADOW_MAX_PENDING", 32)),
+        workers=int(os.getenv("SHADOW_WORKERS", 1)),
+    )
+
+shadow_search = shadow_from_env()
@@ -0,0 +1,108 @@
+import json
+import time
+import asyncio
+import threading
+from urllib.parse import urlparse, parse_qs
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import httpx
+from src.ml.cache import LRUCache
+from src.api.services.itunes import ItunesProxy, UpstreamError
+
+class FakeItunes(BaseHTTPRequestHandler):
+    """
+    local stand-in for itunes.apple.com/search: "missing" has no results, "broken" answers 503, anything else one song.
+    every request is counted & slowed down a little, so concurrent lookups overlap.
+    """
+    calls = []
+
+    def do_GET(self):
+        term = parse_qs(urlparse(self.path).query)["term"][0]
+        FakeItunes.calls.append(term)
+        time.sleep(0.05)
+
+        if term == "broken":
+            self.send_response(503)
+            self.end_headers()
+            return
+
+        results = [] if term == "missing" else [{"trackName": term, "previewUrl": f'https://audio.example/{term}.m4a'}]
+        body = json.dumps({"resultCount": len(results), "results": results}).encode()
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+def _serve():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeItunes)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def _proxy(server) -> ItunesProxy:
+    return ItunesProxy(
+        base_url=f'http://127.0.0.1:{server.server_port}',
+        cache=LRUCache(max_size=100, ttl_seconds=60),
+        negative_cache=LRUCache(max_size=100, ttl_seconds=60)
+    )
+
+def test_concurrent_lookups_are_coalesced_and_cached():
+    print("starting itunes proxy test.....")
+
+    server = _serve()
+    FakeItunes.calls = []
+    proxy = _proxy(server)
+
+    async def run():
+        async with httpx.AsyncClient() as client:
+            #20 result rows of the same search asking for the same preview at once
+            first = await asyncio.gather(*[proxy.search(client, "Purple Rain", 1) for _ in range(20)])
+            again = await proxy.search(client, "  purple   rain ", 1) #normalized to the same key
+            return first, again
+
+    try:
+        first, again = asyncio.run(run())
+    finally:
+        server.shutdown()
+
+    assert FakeItunes.calls == ["purple rain"], f'expected one upstream call, got {FakeItunes.calls}'
+    assert all(r["resultCount"] == 1 for r in first) and again == first[0]
+    assert proxy.stats()["coalesced"] == 19
+
+    print("itunes proxy passed coalescing check!")
+
+def test_misses_and_errors_are_negatively_cached():
+    server = _serve()
+    FakeItunes.calls = []
+    proxy = _proxy(server)
+
+    async def run():
+        async with httpx.AsyncClient() as client:
+            misses = [await proxy.search(client, "missing", 1) for _ in range(3)]
+
+            #2 coalesced waiters on the upstream request, then 2 negative cache hits
+            errors = list(await asyncio.gather(*[proxy.search(client, "broken", 1) for _ in range(2)], return_exceptions=True))
+            for _ in range(2):
+                try:
+                    await proxy.search(client, "broken", 1)
+                except UpstreamError as e:
+                    errors.append(e)
+
+            return misses, errors
+
+    try:
+        misses, errors = asyncio.run(run())
+    finally:
+        server.shutdown()
+
+    assert all(m["resultCount"] == 0 for m in misses)
+    assert all(isinstance(e, UpstreamError) and e.status_code == 503 for e in errors)
+    assert len({id(e) for e in errors}) == 4, "each caller should get its own exception, not a shared cached one"
+    assert sorted(FakeItunes.calls) == ["broken", "missing"], f'misses & errors should hit upstream once each, got {FakeItunes.calls}'
+
+if __name__ == "__main__":
+    test_concurrent_lookups_are_coalesced_and_cached()
+    test_misses_and_errors_are_negatively_cached()
@@ -0,0 +1,49 @@
+from src.api.services.result_cache import SearchResultCache, LocalResultCache
+
+class FakeGenerationDB:
+    """
+    stands in for the session, only answers the generation lookup
+    """
+    def __init__(self):
+        self.generation = 0
+        self.reads = 0
+
+    def execute(self, stmt):
+        self.reads += 1
+        return self
+
+    def scalar(self):
+        return self.generation
+
+def test_pipeline_generation_invalidates_entries():
+    print("starting result cache test.....")
+
+    db = FakeGenerationDB()
+    cache = SearchResultCache(LocalResultCache(), generation_ttl=0) #always re-read the generation
+
+    key = cache.key("Songs about  Rain", 10, "v1", "pgvector", cache.generation(db))
+    assert cache.get(key) is None
+    cache.set(key, [{"id": "x"}])
+
+    #same query, different spacing & casing -> same entry
+    assert cache.get(cache.key("songs about rain", 10, "v1", "pgvector", cache.generation(db))) == [{"id": "x"}]
+
+    db.generation += 1 #pipeline wrote new embeddings
+    assert cache.get(cache.key("songs about rain", 10, "v1", "pgvector", cache.generation(db))) is None
+
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 2
+
+    print("result cache passed invalidation check!")
+
+def test_generation_reads_are_throttled():
+    db = FakeGenerationDB()
+    cache = SearchResultCache(LocalResultCache(), generation_ttl=60)
+
+    for _ in range(5):
+        cache.generation(db)
+
+    assert db.reads == 1, "generation should be re-read at most once per ttl"
+
+if __name__ == "__main__":
+    test_pipeline_generation_invalidates_entries()
+    test_generation_reads_are_throttled()
@@ -0,0 +1,38 @@
+import uuid
+from src.api.services.retrieval import reciprocal_rank_fusion
+
+A, B, C, D = (uuid.UUID(int=i) for i in range(4))
+
+def test_rrf_single_list_keeps_order():
+    print("starting reciprocal rank fusion test.....")
+
+    fused = reciprocal_rank_fusion([[A, B, C]], k=60)
+
+    assert [track_id for track_id, _ in fused] == [A, B, C]
+    assert fused[0][1] == 1 / 61 and fused[2][1] == 1 / 63
+
+    print("reciprocal rank fusion passed!")
+
+def test_rrf_overlap_outranks_single_list_hits():
+    #B & C are found by both sides, A & D only by one (even at rank 1)
+    fused = dict(reciprocal_rank_fusion([[A, B, C], [B, C, D]], k=60))
+
+    assert fused[B] == 1 / 62 + 1 / 61
+    assert fused[C] == 1 / 63 + 1 / 62
+    assert sorted(fused, key=fused.get, reverse=True)[:2] == [B, C]
+    assert fused[A] > fused[D]
+
+def test_rrf_ties_keep_first_seen_order():
+    #same ranks mirrored across the two lists: equal scores, stable sort keeps first-seen order
+    fused = reciprocal_rank_fusion([[A, B], [B, A]], k=60)
+
+    assert fused[0][1] == fused[1][1]
+    assert [track_id for track_id, _ in fused] == [A, B]
+
+    assert reciprocal_rank_fusion([]) == []
+    assert reciprocal_rank_fusion([[], []]) == []
+
+if __name__ == "__main__":
+    test_rrf_single_list_keeps_order()
+    test_rrf_overlap_outranks_single_list_hits()
+    test_rrf_ties_keep_first_seen_order()
@@ -0,0 +1,153 @@
+import uuid
+import numpy as np
+from src.api.schemas import SearchFilters
+from src.api.services.retrieval import Hit, RetrievalBackend
+from src.api.services.search import SearchService
+from src.api.services.result_cache import SearchResultCache, LocalResultCache
+from src.monitoring.metrics import SEARCH_STAGE_SECONDS
+from src.ml.embeddings import embedding_model
+
+class FakeDB:
+    """
+    stands in for the session: a transaction opens on the first connection() checkout
+    """
+    def __init__(self):
+        self.checkouts = 0
+        self.statements = []
+
+    def in_transaction(self):
+        return self.checkouts > 0
+
+    def connection(self):
+        self.checkouts += 1
+
+    def execute(self, stmt):
+        #autobegins like a real session, without going through connection()
+        self.statements.append((stmt, self.checkouts))
+        self.checkouts = max(self.checkouts, 1)
+        return type("Result", (), {"scalar": lambda _: 7})()
+
+class FakeBackend(RetrievalBackend):
+    """
+    ranks a fixed catalog of n tracks, whatever the query, & records every retrieve call
+    """
+    name = "fake"
+
+    def __init__(self, n: int = 25):
+        self.max_depth = n
+        self.hits = [Hit(uuid.UUID(int=i), f'song {i}', "artist", None, None, 1.0 - i / 100, f'https://audio.example/{i}.m4a', None) for i in range(n)]
+        self.calls = []
+
+    def retrieve(self, db, vectors, limits, filters=None, ef_search=None):
+        self.calls.append(list(limits))
+        return [self.hits[:limit] for limit in limits]
+
+    def retrieve_hybrid(self, db, vector, query, limit, ef_search=None):
+        self.calls.append([limit])
+        return self.hits[:limit]
+
+def _fake_embeddings(calls):
+    def embed_queries(queries):
+        calls.append(list(queries))
+        return np.ones((len(queries), embedding_model.EXPECTED_DIM), dtype=np.float32)
+    return embed_queries
+
+def _with_fake_embeddings(fn):
+    calls = []
+    original = embedding_model.embed_queries, embedding_model.embed_query
+    embedding_model.embed_queries = _fake_embeddings(calls)
+    embedding_model.embed_query = lambda query: embedding_model.embed_queries([query])[0]
+
+    try:
+        return fn(), calls
+    finally:
+        embedding_model.embed_queries, embedding_model.embed_query = original
+
+def test_batch_rejects_bad_queries_before_embedding():
+    print("starting batch search validation test.....")
+
+    service = SearchService(FakeDB(), backend=FakeBackend(), cache=None, shadow=None)
+
+    def run():
+        try:
+            service.search_batch(["rain", "sun"], [5, 5], filters=[None, SearchFilters(artist="prince")], modes=["semantic", "hybrid"])
+            assert False, "filters in hybrid mode should be rejected"
+        except ValueError:
+            pass
+
+    _, calls = _with_fake_embeddings(run)
+    assert calls == [], "a rejected batch should never reach the model"
+    assert service.backend.calls == []
+
+    print("batch search validation passed!")
+
+def test_batch_pages_each_query_with_its_cursor():
+    backend = FakeBackend(n=25)
+    service = SearchService(FakeDB(), backend=backend, cache=None, shadow=None)
+
+    def walk():
+        #query "a" pages through the whole catalog, "b" stays on its first page
+        seen, cursor = [], None
+        while True:
+            pages, cursors, _ = service.search_batch(["a", "b"], [10, 3], cursors=[cursor, None])
+            seen += [r.id for r in pages[0]]
+            assert [r.id for r in pages[1]] == [h.id for h in backend.hits[:3]]
+            assert cursors[1] is not None
+
+            if cursors[0] is None:
+                return seen
+            cursor = cursors[0]
+
+    seen, _ = _with_fake_embeddings(walk)
+    assert seen == [h.id for h in backend.hits], "pages should cover the catalog once, in rank order"
+
+    def bad_cursor():
+        try:
+            service.search_batch(["a"], [10], cursors=["not-a-cursor"])
+            assert False, "an invalid cursor should be rejected"
+        except ValueError:
+            pass
+
+    _, calls = _with_fake_embeddings(bad_cursor)
+    assert calls == []
+
+def test_batch_strips_previews_unless_asked():
+    service = SearchService(FakeDB(), backend=FakeBackend(), cache=None, shadow=None)
+
+    (plain, with_preview), _, _ = _with_fake_embeddings(
+        lambda: service.search_batch(["a", "b"], [5, 5], include_previews=[False, True])
+    )[0]
+
+    assert all(r.metadata.preview_url is None and r.metadata.artwork_url is None for r in plain), "pre-enrichment contract"
+    assert [r.metadata.preview_url for r in with_preview] == [f'https://audio.example/{i}.m4a' for i in range(5)]
+
+def _checkouts_timed() -> int:
+    series = SEARCH_STAGE_SECONDS._series.get(("db_checkout",))
+    return series[2] if series else 0
+
+def test_checkout_is_timed_before_the_first_statement():
+    print("starting db checkout timing test.....")
+
+    db = FakeDB()
+    cache = SearchResultCache(LocalResultCache(), generation_ttl=60)
+    service = SearchService(db, backend=FakeBackend(), cache=cache, shadow=None)
+
+    before = _checkouts_timed()
+    _with_fake_embeddings(lambda: service.search_page("rain", 5))
+
+    assert len(db.statements) == 1 and db.statements[0][1] == 1, "the generation read should run on the timed checkout"
+    assert _checkouts_timed() == before + 1
+
+    #batch search has no generation read, its checkout is timed ahead of retrieval
+    db = FakeDB()
+    service = SearchService(db, backend=FakeBackend(), cache=None, shadow=None)
+    _with_fake_embeddings(lambda: service.search_batch(["a", "b"], [5, 5]))
+    assert db.checkouts == 1 and _checkouts_timed() == before + 2
+
+    print("db checkout timing passed!")
+
+if __name__ == "__main__":
+    test_batch_rejects_bad_queries_before_embedding()
+    test_batch_pages_each_query_with_its_cursor()
+    test_batch_strips_previews_unless_asked()
+    test_checkout_is_timed_before_the_first_statement()
@@ -0,0 +1,54 @@
+import threading
+import numpy as np
+from src.api.services.retrieval import Hit
+from src.api.services.shadow import ShadowSearch, overlap_at_k
+
+class FakeEncoder:
+    def embed_query(self, query):
+        return np.zeros(384, dtype=np.float32)
+
+class FakeBackend:
+    """
+    candidate version returns ids 1..3, optionally blocking until released
+    """
+    def __init__(self, gate=None):
+        self.gate = gate
+
+    def retrieve(self, db, vectors, limits, filters=None, ef_search=None):
+        if self.gate is not None:
+            self.gate.wait()
+        return [[Hit(i, "t", "a", None, None, 1.0) for i in (1, 2, 3)]]
+
+def test_overlap_at_k():
+    assert overlap_at_k([1, 2, 3, 4], [4, 3, 9, 8]) == 0.5
+    assert overlap_at_k([], []) == 1.0
+    assert overlap_at_k([1], []) == 0.0
+
+def test_shadow_compare_reports_overlap():
+    print("starting shadow search test.....")
+
+    shadow = ShadowSearch("candidate-v2", encoder=FakeEncoder(), backend=FakeBackend())
+    record = shadow.compare("rainy day songs", 3, None, None, "semantic", [1, 2, 5], live_ms=4.0)
+
+    assert record["overlap"] == round(2 / 3, 4)
+    assert record["top1_match"] is True
+    assert record["candidate"] == "candidate-v2"
+
+    print("shadow search passed overlap check!")
+
+def test_shadow_drops_when_saturated():
+    gate = threading.Event()
+    shadow = ShadowSearch("candidate-v2", max_pending=1, encoder=FakeEncoder(), backend=FakeBackend(gate))
+
+    assert shadow.submit("q", 3, None, None, "semantic", [1], 1.0) #takes the only slot, blocks in the backend
+    assert not shadow.submit("q", 3, None, None, "semantic", [1], 1.0), "a full shadow queue must drop, never wait"
+
+    gate.set()
+    shadow.executor.shutdown(wait=True)
+
+    assert shadow._slots.acquire(blocking=False), "slot should be released after the shadow query finished"
+
+if __name__ == "__main__":
+    test_overlap_at_k()
+    test_shadow_compare_reports_overlap()
+    test_shadow_drops_when_saturated()
@@ -0,0 +1,46 @@
+import asyncio
+from src.api import app as api
+
+def _run_warm_up(failures: int, max_attempts: int):
+    """
+    background warm-up against a warm_up() that raises `failures` times before it succeeds.
+    """
+    calls = []
+
+    def flaky_warm_up():
+        calls.append(1)
+        if len(calls) <= failures:
+            raise RuntimeError("connection refused")
+
+    original = (api.warm_up, api.WARMUP_BACKOFF_S, api.WARMUP_MAX_ATTEMPTS)
+    api.warm_up, api.WARMUP_BACKOFF_S, api.WARMUP_MAX_ATTEMPTS = flaky_warm_up, 0.001, max_attempts
+    api.readiness.update({"ready": False, "failed": False, "error": None, "attempts": 0, "warmup_s": None})
+
+    try:
+        asyncio.run(api._warm_up_in_background())
+    finally:
+        api.warm_up, api.WARMUP_BACKOFF_S, api.WARMUP_MAX_ATTEMPTS = original
+
+    return len(calls)
+
+def test_warm_up_retries_until_ready():
+    print("starting warm-up retry test.....")
+
+    assert _run_warm_up(failures=3, max_attempts=0) == 4
+    assert api.readiness["ready"] and api.readiness["error"] is None and api.readiness["attempts"] == 4
+    assert api.ready_check()["status"] == "ready"
+    assert api.health_check()["status"] == "healthy"
+
+    print("warm-up retry passed!")
+
+def test_warm_up_gives_up_and_fails_liveness():
+    assert _run_warm_up(failures=10, max_attempts=3) == 3
+    assert not api.readiness["ready"] and api.readiness["failed"]
+    assert api.readiness["error"] == "connection refused"
+
+    assert api.ready_check().status_code == 503
+    assert api.health_check().status_code == 503, "a warm-up that gave up should get the container restarted"
+
+if __name__ == "__main__":
+    test_warm_up_retries_until_ready()
+    test_warm_up_gives_up_and_fails_liveness()
@@ -0,0 +1,63 @@
+"""
+embedding write throughput: multi-row INSERT .. VALUES (vectors as python float lists) vs binary COPY + merge.
+rows go in under a throwaway model_version & every batch is rolled back, so the database is left untouched.
+
+usage: python -m src.benchmarks.bulk_write [n_rows] [batch_size]
+prints one JSON line per write mode, diffable between runs.
+"""
+import sys
+import json
+import time
+import numpy as np
+from sqlalchemy import text
+from sqlalchemy.dialects.postgresql import insert
+from src.db.session import SessionLocal
+from src.db.models import TrackEmbedding
+from src.db.bulk import copy_embeddings
+
+BENCH_MODEL_VERSION = "bench-bulk-write"
+
+def write_insert(db, track_ids, vectors) -> int:
+    stmt = insert(TrackEmbedding).values([
+        {"track_id": t, "embedding": vectors[i].tolist(), "model_version": BENCH_MODEL_VERSION} for i, t in enumerate(track_ids)
+    ])
+    return db.execute(stmt.on_conflict_do_nothing(index_elements=['track_id', 'model_version'])).rowcount
+
+def write_copy(db, track_ids, vectors) -> int:
+    return copy_embeddings(db, track_ids, vectors, BENCH_MODEL_VERSION)
+
+def run_mode(db, name: str, write, track_ids, vectors, batch_size: int) -> dict:
+    latencies = []
+    written = 0
+
+    for start in range(0, len(track_ids), batch_size):
+        t0 = time.perf_counter()
+        written += write(db, track_ids[start:start + batch_size], vectors[start:start + batch_size])
+        latencies.append((time.perf_counter() - t0) * 1000)
+        db.rollback()
+
+    return {
+        "mode": name,
+        "rows": written,
+        "batch_size": batch_size,
+        "p50_batch_ms": round(float(np.percentile(latencies, 50)), 2),
+        "rows_per_s": round(written / (sum(latencies) / 1000), 1),
+    }
+
+def main(n_rows: int = 10000, batch_size: int = 200):
+    db = SessionLocal()
+
+    try:
+        track_ids = [r[0] for r in db.execute(text("SELECT id FROM tracks LIMIT :n"), {"n": n_rows})]
+
+        vectors = np.random.default_rng(0).standard_normal((len(track_ids), 384)).astype(np.float32)
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+
+        for name, write in (("insert", write_insert), ("copy", write_copy)):
+            print(json.dumps(run_mode(db, name, write, track_ids, vectors, batch_size)))
+
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    main(*[int(a) for a in sys.argv[1:3]])
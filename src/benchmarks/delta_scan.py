@@ -0,0 +1,71 @@
+"""
+per-batch latency of the embedding delta scan over the whole catalog: the old NOT IN + LIMIT query vs the
+keyset-paginated NOT EXISTS anti-join. each fetched batch is marked as embedded (placeholder rows under a
+throwaway model_version, rolled back at the end), which is what makes NOT IN slow down as a backfill progresses.
+
+usage: python -m src.benchmarks.delta_scan [batch_size]
+prints one JSON line per strategy with mean batch latency per tenth of the catalog, flat is good.
+"""
+import sys
+import json
+import time
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert
+from src.db.session import SessionLocal
+from src.db.models import Track, TrackEmbedding
+from src.ml.pipeline import get_tracks_without_embedding
+
+BENCH_MODEL_VERSION = "bench-delta-scan"
+
+def fetch_not_in(db, limit: int, after_id=None):
+    #the pre-keyset query, kept here as the baseline
+    subquery = select(TrackEmbedding.track_id).where(TrackEmbedding.model_version == BENCH_MODEL_VERSION)
+    return db.execute(select(Track).where(Track.id.not_in(subquery)).limit(limit)).scalars().all()
+
+def fetch_keyset(db, limit: int, after_id=None):
+    return get_tracks_without_embedding(db, limit, after_id=after_id, model_version=BENCH_MODEL_VERSION)
+
+def run_strategy(db, name: str, fetch, batch_size: int) -> dict:
+    latencies = []
+    last_id = None
+
+    try:
+        while True:
+            t0 = time.perf_counter()
+            tracks = fetch(db, batch_size, after_id=last_id)
+            latencies.append((time.perf_counter() - t0) * 1000)
+
+            if not tracks:
+                break
+
+            last_id = tracks[-1].id
+            db.execute(insert(TrackEmbedding).values([{"track_id": t.id, "model_version": BENCH_MODEL_VERSION} for t in tracks]))
+
+    finally:
+        db.rollback() #drops the placeholder rows
+
+    deciles = [round(float(np.mean(chunk)), 2) for chunk in np.array_split(np.array(latencies), 10) if len(chunk)]
+
+    return {
+        "strategy": name,
+        "batch_size": batch_size,
+        "batches": len(latencies),
+        "first_batch_ms": round(latencies[0], 2),
+        "last_batch_ms": round(latencies[-1], 2),
+        "mean_ms_by_decile": deciles,
+        "total_s": round(sum(latencies) / 1000, 2),
+    }
+
+def main(batch_size: int = 200):
+    db = SessionLocal()
+
+    try:
+        for name, fetch in (("keyset_not_exists", fetch_keyset), ("not_in_limit", fetch_not_in)):
+            print(json.dumps(run_strategy(db, name, fetch, batch_size)))
+
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    main(*[int(a) for a in sys.argv[1:2]])
@@ -0,0 +1,54 @@
+"""
+songs/sec of EmbeddingModel.generate over real catalog rows: fixed batch_size=32 (token_budget=0) vs
+token-length bucketing with token-budget batches. both runs embed the same tracks in pipeline-sized calls,
+max_abs_diff checks the bucketed vectors come back in input order.
+
+usage: python -m src.benchmarks.generate_batching [n_tracks] [token_budget]
+prints one JSON line per strategy, diffable between runs.
+"""
+import sys
+import json
+import time
+import numpy as np
+from sqlalchemy import text
+from src.db.session import SessionLocal
+from src.ml.embeddings import embedding_model
+from src.ml.pipeline import BATCH_SIZE
+
+def sample_items(db, n: int):
+    rows = db.execute(text("SELECT title, artist, lyrics FROM tracks ORDER BY random() LIMIT :n"), {"n": n}).all()
+    return [{"title": r.title, "artist": r.artist, "lyrics": r.lyrics} for r in rows]
+
+def run_strategy(name: str, items, token_budget: int):
+    embedding_model.token_budget = token_budget
+    embedding_model.generate(items[:BATCH_SIZE]) #warm-up
+
+    t0 = time.perf_counter()
+    vectors = np.vstack([embedding_model.generate(items[i:i + BATCH_SIZE], batch_size=32) for i in range(0, len(items), BATCH_SIZE)])
+    elapsed = time.perf_counter() - t0
+
+    return vectors, {
+        "strategy": name,
+        "token_budget": token_budget,
+        "tracks": len(items),
+        "elapsed_s": round(elapsed, 2),
+        "songs_per_s": round(len(items) / elapsed, 1),
+    }
+
+def main(n_tracks: int = 2000, token_budget: int = 8192):
+    db = SessionLocal()
+
+    try:
+        items = sample_items(db, n_tracks)
+    finally:
+        db.close()
+
+    baseline, report = run_strategy("fixed_32", items, 0)
+    print(json.dumps(report))
+
+    bucketed, report = run_strategy("token_bucketed", items, token_budget)
+    report["max_abs_diff"] = round(float(np.abs(baseline - bucketed).max()), 6)
+    print(json.dumps(report))
+
+if __name__ == "__main__":
+    main(*[int(a) for a in sys.argv[1:3]])
@@ -0,0 +1,57 @@
+"""
+latency / quality comparison of semantic vs hybrid (full-text + vector, RRF) search.
+queries are "<title> <artist>" strings of sampled tracks, the exact-name lookups vectors alone tend to miss.
+hit_rate_at_k is the share of queries whose source track shows up in the top k.
+
+usage: python -m src.benchmarks.hybrid [n_queries] [k]
+prints one JSON line per mode, diffable between runs.
+"""
+import sys
+import json
+import time
+import numpy as np
+from sqlalchemy import text
+from src.db.session import SessionLocal
+from src.api.services.search import SearchService
+
+def sample_queries(db, n: int):
+    rows = db.execute(text("SELECT id, title, artist FROM tracks ORDER BY random() LIMIT :n"), {"n": n}).all()
+    return [(r.id, f'{r.title} {r.artist}') for r in rows]
+
+def run_mode(service: SearchService, mode: str, queries, k: int) -> dict:
+    latencies = []
+    found = []
+
+    for track_id, query in queries:
+        t0 = time.perf_counter()
+        results = service.search(query, k, mode=mode)
+        latencies.append((time.perf_counter() - t0) * 1000)
+        service.db.rollback()
+
+        found.append(any(r.id == track_id for r in results))
+
+    return {
+        "mode": mode,
+        "k": k,
+        "queries": len(queries),
+        "hit_rate_at_k": round(float(np.mean(found)), 4),
+        "p50_ms": round(float(np.percentile(latencies, 50)), 2),
+        "p95_ms": round(float(np.percentile(latencies, 95)), 2),
+        "mean_ms": round(float(np.mean(latencies)), 2),
+    }
+
+def main(n_queries: int = 100, k: int = 10):
+    db = SessionLocal()
+
+    try:
+        service = SearchService(db, cache=None)
+        queries = sample_queries(db, n_queries)
+
+        for mode in ("semantic", "hybrid"):
+            print(json.dumps(run_mode(service, mode, queries, k)))
+
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    main(*[int(a) for a in sys.argv[1:3]])
@@ -0,0 +1,131 @@
+"""
+HNSW parameter sweep over m x ef_construction: build time, index size, query latency & recall@k per ef_search.
+runs on a scratch copy of the current model version's vectors (unlogged table hnsw_sweep), so the live index is never
+touched. n_queries vectors are held out of the copy & used as queries, exact ground truth comes from a sequential scan
+of the copy before any index exists. build settings (maintenance_work_mem, parallel workers) are the ones of create_index.
+
+usage: python -m src.benchmarks.index_sweep [n_queries] [k]
+env SWEEP_M (8,16,32), SWEEP_EF_CONSTRUCTION (64,128,256), SWEEP_EF_SEARCH (40,100,200)
+SWEEP_INDEX_KIND=halfvec|binary sweeps the compact index two-stage search reads instead (candidates from the compact
+index, RERANK_OVERFETCH x k of them, reranked exactly), recall is still against the full precision ground truth.
+prints one JSON line per (m, ef_construction, ef_search), diffable between runs.
+"""
+import os
+import sys
+import json
+import time
+from typing import List, Dict, Any
+import numpy as np
+from sqlalchemy import text
+from src.db.session import get_engine
+from src.db.create_index import hnsw_index_sql, build_index, drop_index, index_size, QUANTIZED_INDEXES
+from src.api.services.retrieval import _to_pg_vector, _CANDIDATE_ORDER
+from src.ml.embeddings import embedding_model
+
+SWEEP_TABLE = "hnsw_sweep"
+SWEEP_INDEX = "idx_hnsw_sweep"
+
+def _int_list(name: str, default: str) -> List[int]:
+    return [int(v) for v in os.getenv(name, default).split(",")]
+
+_QUERY_SQL = text(f"SELECT track_id FROM {SWEEP_TABLE} ORDER BY embedding <#> CAST(:vec AS vector) LIMIT :k")
+
+#same shape as retrieval's two-stage search, the compact ordering has to match the sweep index expression to use it
+_RERANK_QUERY_SQL = """
+    SELECT c.track_id FROM (
+        SELECT te.track_id, te.embedding FROM {table} te, (SELECT CAST(:vec AS text) AS vec) q
+        ORDER BY {order} LIMIT :n
+    ) c
+    ORDER BY c.embedding <#> CAST(:vec AS vector) LIMIT :k
+"""
+
+def prepare(conn, n_queries: int, model_version: str) -> np.ndarray:
+    """
+    holds out n_queries random vectors, copies the rest into the scratch table. returns the held-out vectors.
+    """
+    rows = conn.execute(text("""
+        SELECT track_id, embedding FROM track_embeddings WHERE model_version = :v ORDER BY random() LIMIT :n
+    """), {"v": model_version, "n": n_queries}).all()
+
+    conn.execute(text(f"DROP TABLE IF EXISTS {SWEEP_TABLE}"))
+    conn.execute(text(f"""
+        CREATE UNLOGGED TABLE {SWEEP_TABLE} AS
+        SELECT track_id, embedding FROM track_embeddings
+        WHERE model_version = :v AND NOT (track_id = ANY(CAST(:held_out AS uuid[])))
+    """), {"v": model_version, "held_out": [str(r.track_id) for r in rows]})
+    conn.execute(text(f"ANALYZE {SWEEP_TABLE}"))
+
+    return np.array([np.asarray(r.embedding, dtype=np.float32) for r in rows])
+
+def search(conn, queries: np.ndarray, k: int, ef_search: int = None, sql=_QUERY_SQL, overfetch: int = 1):
+    ids, latencies = [], []
+
+    for q in queries:
+        t0 = time.perf_counter()
+        with conn.begin():
+            if ef_search is not None:
+                conn.execute(text("SELECT set_config('hnsw.ef_search', :ef, true)"), {"ef": str(ef_search)})
+            ids.append({r.track_id for r in conn.execute(sql, {"vec": _to_pg_vector(q), "k": k, "n": k * overfetch})})
+        latencies.append((time.perf_counter() - t0) * 1000)
+
+    return ids, latencies
+
+def run_sweep(n_queries: int = 200, k: int = 10) -> List[Dict[str, Any]]:
+    m_values = _int_list("SWEEP_M", "8,16,32")
+    ef_construction_values = _int_list("SWEEP_EF_CONSTRUCTION", "64,128,256")
+    ef_search_values = _int_list("SWEEP_EF_SEARCH", "40,100,200")
+    kind = os.getenv("SWEEP_INDEX_KIND") or None
+    overfetch = int(os.getenv("RERANK_OVERFETCH", 4))
+    rows = []
+
+    if kind is not None and kind not in QUANTIZED_INDEXES:
+        raise RuntimeError(f'unknown SWEEP_INDEX_KIND: {kind}')
+
+    sql = _QUERY_SQL if kind is None else text(_RERANK_QUERY_SQL.format(table=SWEEP_TABLE, order=_CANDIDATE_ORDER[kind]))
+
+    with get_engine().connect() as conn:
+        with conn.begin():
+            queries = prepare(conn, n_queries, embedding_model.MODEL_ID)
+
+        truth, _ = search(conn, queries, k) #no index yet: exact sequential scan
+
+        try:
+            for m in m_values:
+                for ef_construction in ef_construction_values:
+                    #no concurrent readers or writers on the scratch table, the plain build is faster
+                    build_s = build_index(hnsw_index_sql(SWEEP_INDEX, SWEEP_TABLE, m, ef_construction, concurrently=False, kind=kind))
+                    size = index_size(SWEEP_INDEX)
+
+                    for ef_search in ef_search_values:
+                        found, latencies = search(conn, queries, k, ef_search, sql, overfetch)
+
+                        rows.append({
+                            "benchmark": "index_sweep",
+                            "kind": kind or "full",
+                            "m": m,
+                            "ef_construction": ef_construction,
+                            "ef_search": ef_search,
+                            "k": k,
+                            "queries": len(queries),
+                            "build_s": round(build_s, 2),
+                            "index_mb": round(size / 2**20, 1),
+                            "recall_at_k": round(float(np.mean([len(f & t) / max(len(t), 1) for f, t in zip(found, truth)])), 4),
+                            "p50_ms": round(float(np.percentile(latencies, 50)), 2),
+                            "p95_ms": round(float(np.percentile(latencies, 95)), 2),
+                            "p99_ms": round(float(np.percentile(latencies, 99)), 2),
+                        })
+                        print(json.dumps(rows[-1]))
+
+                    drop_index(SWEEP_INDEX, concurrently=False)
+
+        finally:
+            with conn.begin():
+                conn.execute(text(f"DROP TABLE IF EXISTS {SWEEP_TABLE}"))
+
+    return rows
+
+def main(n_queries: int = 200, k: int = 10):
+    run_sweep(n_queries, k)
+
+if __name__ == "__main__":
+    main(*[int(a) for a in sys.argv[1:3]])
@@ -0,0 +1,72 @@
+"""
+query-embedding latency & batched throughput of the inference backends: torch, onnx fp32 & onnx int8.
+each backend runs in a fresh process, load_s is the module import (torch/onnxruntime + weights), i.e. its cold-start share.
+onnx variants need an export first: python -m src.ml.onnx_backend --int8
+
+usage: python -m src.benchmarks.inference [n_queries] [batch_size]
+prints one JSON line per backend, diffable between runs.
+"""
+import os
+import sys
+import json
+import time
+import multiprocessing
+import numpy as np
+
+QUERIES = [
+    "songs about driving at night",
+    "heartbreak in the summer",
+    "i miss my hometown",
+    "dancing until the sun comes up",
+    "a letter to my younger self",
+]
+
+def run_backend(label: str, backend: str, quantized: bool, n_queries: int, batch_size: int) -> dict:
+    os.environ["INFERENCE_BACKEND"] = backend
+    os.environ["ONNX_QUANTIZED"] = "true" if quantized else "false"
+    os.environ["QUERY_CACHE_SIZE"] = "0" #measure inference, not the cache
+
+    t0 = time.perf_counter()
+    from src.ml.embeddings import embedding_model as model
+    load_s = time.perf_counter() - t0
+
+    texts = [model._create_contextual_text(title="", artist="", lyrics=QUERIES[i % len(QUERIES)]) for i in range(n_queries)]
+    model._encode(texts[:batch_size], batch_size=batch_size) #warm-up
+
+    latencies = []
+    for text in texts:
+        t0 = time.perf_counter()
+        model._encode([text], batch_size=1)
+        latencies.append((time.perf_counter() - t0) * 1000)
+
+    t0 = time.perf_counter()
+    model._encode(texts, batch_size=batch_size)
+    batched_s = time.perf_counter() - t0
+
+    return {
+        "backend": label,
+        "queries": n_queries,
+        "batch_size": batch_size,
+        "load_s": round(load_s, 2),
+        "single_p50_ms": round(float(np.percentile(latencies, 50)), 2),
+        "single_p95_ms": round(float(np.percentile(latencies, 95)), 2),
+        "single_qps": round(1000 / float(np.mean(latencies)), 1),
+        "batched_qps": round(n_queries / batched_s, 1),
+    }
+
+def run_isolated(label: str, backend: str, quantized: bool, n_queries: int, batch_size: int) -> dict:
+    try:
+        return run_backend(label, backend, quantized, n_queries, batch_size)
+    except (RuntimeError, ImportError) as e:
+        return {"backend": label, "error": str(e)}
+
+def main(n_queries: int = 200, batch_size: int = 32):
+    #spawn, so no backend inherits another one's imports
+    ctx = multiprocessing.get_context("spawn")
+
+    for label, backend, quantized in (("onnx-int8", "onnx", True), ("onnx-fp32", "onnx", False), ("torch", "torch", False)):
+        with ctx.Pool(1) as pool:
+            print(json.dumps(pool.apply(run_isolated, (label, backend, quantized, n_queries, batch_size))))
+
+if __name__ == "__main__":
+    main(*[int(a) for a in sys.argv[1:3]])
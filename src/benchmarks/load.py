@@ -0,0 +1,106 @@
+"""
+concurrent load generator for POST /api/v1/search against a running API (uvicorn src.api.app:app).
+closed loop: `concurrency` clients each send their next request as soon as the previous one returns, for `duration` seconds
+after a short warmup. queries are seeded phrases over the synthetic catalog's vocabulary (src.benchmarks.catalog),
+a share of them repeated so the result cache sees a realistic mix of hits & misses (--unique disables repeats).
+
+usage: python -m src.benchmarks.load [concurrency] [duration_s] [limit] [--unique]
+env BENCH_API_URL (default http://localhost:8000)
+prints one JSON line, diffable between runs.
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+from typing import List, Dict, Any
+import numpy as np
+import httpx
+from src.benchmarks.catalog import WORDS
+
+API_URL = os.getenv("BENCH_API_URL", "http://localhost:8000")
+WARMUP_S = 2.0
+
+def query_stream(seed: int = 0, unique: bool = False, pool_size: int = 200, repeat_share: float = 0.5):
+    """
+    endless generator of search phrases. with repeats on, `repeat_share` of the queries come from a fixed pool of
+    `pool_size` phrases (popular queries), the rest are fresh.
+    """
+    rng = np.random.default_rng(seed)
+    pool = [" ".join(rng.choice(WORDS, size=rng.integers(2, 5))) for _ in range(pool_size)]
+
+    while True:
+        if not unique and rng.random() < repeat_share:
+            yield pool[rng.integers(pool_size)]
+        else:
+            yield " ".join(rng.choice(WORDS, size=rng.integers(2, 6)))
+
+def summarize(latencies_ms: List[float], elapsed_s: float) -> Dict[str, Any]:
+    if not latencies_ms:
+        return {"requests": 0, "qps": 0.0}
+
+    return {
+        "requests": len(latencies_ms),
+        "qps": round(len(latencies_ms) / elapsed_s, 1),
+        "p50_ms": round(float(np.percentile(latencies_ms, 50)), 2),
+        "p95_ms": round(float(np.percentile(latencies_ms, 95)), 2),
+        "p99_ms": round(float(np.percentile(latencies_ms, 99)), 2),
+        "mean_ms": round(float(np.mean(latencies_ms)), 2),
+        "max_ms": round(float(np.max(latencies_ms)), 2),
+    }
+
+async def _client(http: httpx.AsyncClient, queries, limit: int, deadline: float, measure_from: float, results: Dict[str, Any]):
+    while True:
+        t0 = time.perf_counter()
+        if t0 >= deadline:
+            return
+
+        try:
+            response = await http.post("/api/v1/search", json={"query": next(queries), "limit": limit})
+            ok = response.status_code == 200
+            cached = ok and response.json().get("cached", False)
+        except httpx.HTTPError:
+            ok, cached = False, False
+
+        t1 = time.perf_counter()
+        if t0 < measure_from:
+            continue #warmup: model, pools & caches settle first
+
+        if ok:
+            results["latencies"].append((t1 - t0) * 1000)
+            results["cache_hits"] += cached
+        else:
+            results["errors"] += 1
+
+async def run_load(concurrency: int = 16, duration_s: float = 30, limit: int = 10, unique: bool = False, seed: int = 0) -> Dict[str, Any]:
+    queries = query_stream(seed, unique)
+    results = {"latencies": [], "errors": 0, "cache_hits": 0}
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=API_URL, limits=limits, timeout=30) as http:
+        start = time.perf_counter()
+        measure_from = start + WARMUP_S
+        deadline = measure_from + duration_s
+
+        await asyncio.gather(*[_client(http, queries, limit, deadline, measure_from, results) for _ in range(concurrency)])
+
+    latencies = results["latencies"]
+
+    return {
+        "benchmark": "load",
+        "endpoint": "/api/v1/search",
+        "concurrency": concurrency,
+        "duration_s": duration_s,
+        "limit": limit,
+        "unique_queries": unique,
+        **summarize(latencies, duration_s),
+        "errors": results["errors"],
+        "cache_hit_rate": round(results["cache_hits"] / len(latencies), 4) if latencies else 0.0,
+    }
+
+def main(concurrency: int = 16, duration_s: int = 30, limit: int = 10, unique: bool = False):
+    print(json.dumps(asyncio.run(run_load(concurrency, duration_s, limit, unique))))
+
+if __name__ == "__main__":
+    args = [a for a in sys.argv[1:] if not a.startswith("--")]
+    main(*[int(a) for a in args[:3]], unique="--unique" in sys.argv[1:])
@@ -0,0 +1,73 @@
+"""
+end-to-end embedding pipeline throughput (rows/sec): delta scan -> inference -> write -> commit.
+the vectors of the first n_rows tracks (id order) are dropped first, so the pipeline has a fixed, repeatable amount
+of work; the run itself writes them back. encoder_workers=0 runs the sequential run_pipeline, > 0 the staged one.
+destructive for the current model_version's vectors of those tracks until it finishes, run it against a benchmark database.
+
+usage: python -m src.benchmarks.pipeline_throughput [n_rows] [encoder_workers]
+prints one JSON line per pipeline stage (staged) or one for the whole run (sequential), diffable between runs.
+"""
+import sys
+import json
+import time
+from typing import List, Dict, Any
+from sqlalchemy import text
+from src.db.session import SessionLocal
+from src.db.checkpoint import clear_checkpoint
+from src.ml.embeddings import embedding_model
+from src.ml.pipeline import run_pipeline, run_parallel_pipeline
+
+_DROP_SQL = text("""
+    DELETE FROM track_embeddings
+    WHERE model_version = :model_version
+      AND track_id IN (SELECT id FROM tracks ORDER BY id LIMIT :n)
+""")
+
+_COUNT_SQL = text("SELECT count(*) FROM track_embeddings WHERE model_version = :model_version")
+
+def reset(db, n_rows: int) -> int:
+    dropped = db.execute(_DROP_SQL, {"model_version": embedding_model.MODEL_ID, "n": n_rows}).rowcount
+    db.commit()
+    clear_checkpoint(db, embedding_model.MODEL_ID) #a stale checkpoint would skip part of the work
+
+    return dropped
+
+def run_throughput(n_rows: int = 10000, encoder_workers: int = 0) -> List[Dict[str, Any]]:
+    db = SessionLocal()
+
+    try:
+        dropped = reset(db, n_rows)
+        before = db.execute(_COUNT_SQL, {"model_version": embedding_model.MODEL_ID}).scalar()
+        db.rollback()
+
+        t0 = time.perf_counter()
+        if encoder_workers > 0:
+            report = run_parallel_pipeline(encoder_workers=encoder_workers)
+        else:
+            report = None
+            run_pipeline()
+        elapsed = time.perf_counter() - t0
+
+        written = db.execute(_COUNT_SQL, {"model_version": embedding_model.MODEL_ID}).scalar() - before
+
+    finally:
+        db.close()
+
+    common = {"benchmark": "pipeline", "mode": "staged" if encoder_workers > 0 else "sequential",
+              "encoder_workers": encoder_workers, "backend": embedding_model.backend}
+
+    total = {**common, "stage": "total", "rows": written, "dropped": dropped, "elapsed_s": round(elapsed, 2),
+             "rows_per_s": round(written / elapsed, 1) if elapsed else 0.0}
+
+    if report is None:
+        return [total]
+
+    #staged run: per-stage busy throughput shows which stage bounds the total
+    return [{**common, **stage} for stage in report if stage["stage"] != "total"] + [total]
+
+def main(n_rows: int = 10000, encoder_workers: int = 0):
+    for row in run_throughput(n_rows, encoder_workers):
+        print(json.dumps(row))
+
+if __name__ == "__main__":
+    main(*[int(a) for a in sys.argv[1:3]])
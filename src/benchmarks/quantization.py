@@ -0,0 +1,73 @@
+"""
+recall@k / latency comparison of the full precision, halfvec & binary two-stage search modes.
+ground truth is an exact sequential scan (index scans disabled), queries are sampled stored embeddings.
+
+usage: python -m src.benchmarks.quantization [n_queries] [k]
+prints one JSON line per mode, diffable between runs.
+"""
+import sys
+import json
+import time
+import numpy as np
+from sqlalchemy import text
+from src.db.session import SessionLocal
+from src.api.services.retrieval import PgvectorBackend
+from src.ml.embeddings import embedding_model
+
+def sample_queries(db, n: int) -> np.ndarray:
+    #only the serving version: PgvectorBackend searches just its vectors, another model's would have no true neighbours there
+    rows = db.execute(
+        text("SELECT embedding FROM track_embeddings WHERE model_version = :model_version ORDER BY random() LIMIT :n"),
+        {"model_version": embedding_model.MODEL_ID, "n": n}
+    ).all()
+    return np.array([np.asarray(r[0], dtype=np.float32) for r in rows])
+
+def exact_top_k(db, queries: np.ndarray, k: int):
+    backend = PgvectorBackend()
+    truth = []
+
+    for q in queries:
+        db.execute(text("SELECT set_config('enable_indexscan', 'off', true)"))
+        truth.append({hit.id for hit in backend.retrieve(db, q[None, :], [k])[0]})
+        db.rollback() #ends the transaction, so the setting is dropped
+
+    return truth
+
+def run_mode(db, backend: PgvectorBackend, queries: np.ndarray, truth, k: int) -> dict:
+    latencies = []
+    recalls = []
+
+    for q, expected in zip(queries, truth):
+        t0 = time.perf_counter()
+        hits = backend.retrieve(db, q[None, :], [k])[0]
+        latencies.append((time.perf_counter() - t0) * 1000)
+        db.rollback()
+
+        recalls.append(len({hit.id for hit in hits} & expected) / max(len(expected), 1))
+
+    return {
+        "mode": backend.name,
+        "k": k,
+        "queries": len(queries),
+        "recall_at_k": round(float(np.mean(recalls)), 4),
+        "p50_ms": round(float(np.percentile(latencies, 50)), 2),
+        "p95_ms": round(float(np.percentile(latencies, 95)), 2),
+        "mean_ms": round(float(np.mean(latencies)), 2),
+    }
+
+def main(n_queries: int = 100, k: int = 10):
+    db = SessionLocal()
+
+    try:
+        queries = sample_queries(db, n_queries)
+        truth = exact_top_k(db, queries, k)
+
+        for quantization in ("none", "halfvec", "binary"):
+            backend = PgvectorBackend(quantization=quantization)
+            print(json.dumps(run_mode(db, backend, queries, truth, k)))
+
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    main(*[int(a) for a in sys.argv[1:3]])
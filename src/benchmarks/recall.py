@@ -0,0 +1,68 @@
+"""
+HNSW recall@k against exact brute-force results, swept over hnsw.ef_search.
+ground truth is an exact sequential scan (index scans disabled), queries are sampled stored embeddings
+perturbed with a little noise, so a query is not trivially its own nearest neighbour.
+
+usage: python -m src.benchmarks.recall [n_queries] [k]
+prints one JSON line per ef_search value, diffable between runs.
+"""
+import sys
+import json
+import time
+from typing import List, Dict, Any
+import numpy as np
+from src.db.session import SessionLocal
+from src.api.services.retrieval import PgvectorBackend
+from src.benchmarks.quantization import sample_queries, exact_top_k
+
+EF_SEARCH_VALUES = [10, 20, 40, 80, 200, 400]
+
+def perturb(queries: np.ndarray, noise: float = 0.05, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    queries = queries + noise * rng.standard_normal(queries.shape).astype(np.float32) / np.sqrt(queries.shape[1])
+    return queries / np.linalg.norm(queries, axis=1, keepdims=True)
+
+def run_recall(n_queries: int = 200, k: int = 10, ef_values: List[int] = EF_SEARCH_VALUES) -> List[Dict[str, Any]]:
+    db = SessionLocal()
+    backend = PgvectorBackend(quantization="none")
+    rows = []
+
+    try:
+        queries = perturb(sample_queries(db, n_queries))
+        truth = exact_top_k(db, queries, k)
+
+        for ef in ef_values:
+            latencies = []
+            recalls = []
+
+            for q, expected in zip(queries, truth):
+                t0 = time.perf_counter()
+                hits = backend.retrieve(db, q[None, :], [k], None, ef)[0]
+                latencies.append((time.perf_counter() - t0) * 1000)
+                db.rollback()
+
+                recalls.append(len({hit.id for hit in hits} & expected) / max(len(expected), 1))
+
+            rows.append({
+                "benchmark": "recall",
+                "ef_search": ef,
+                "k": k,
+                "queries": len(queries),
+                "recall_at_k": round(float(np.mean(recalls)), 4),
+                "min_recall": round(float(np.min(recalls)), 4),
+                "p50_ms": round(float(np.percentile(latencies, 50)), 2),
+                "p95_ms": round(float(np.percentile(latencies, 95)), 2),
+                "p99_ms": round(float(np.percentile(latencies, 99)), 2),
+            })
+
+    finally:
+        db.close()
+
+    return rows
+
+def main(n_queries: int = 200, k: int = 10):
+    for row in run_recall(n_queries, k):
+        print(json.dumps(row))
+
+if __name__ == "__main__":
+    main(*[int(a) for a in sys.argv[1:3]])
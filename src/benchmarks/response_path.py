@@ -0,0 +1,133 @@
+"""
+search response path before/after the lean projection & one-pass serialization:
+- db: bytes read from postgres & client CPU per query, ORM entity select (Track + distance, lyrics included)
+  versus the column projection the retrieval backend uses. bytes = sum of pg_column_size over the result rows.
+- serialize: CPU per response, validated models + FastAPI's response_model round-trip (dump -> validate -> json)
+  versus model_construct + model_dump_json. needs no database.
+
+usage: python -m src.benchmarks.response_path [n_queries] [k] [--no-db]
+prints one JSON line per (stage, mode), diffable between runs.
+"""
+import sys
+import json
+import time
+from typing import List, Dict, Any
+import numpy as np
+from sqlalchemy import select, func, Float, literal_column
+from src.db.models import Track, TrackEmbedding
+from src.api.schemas import SearchResponse, SearchResult, TrackMetadata
+from src.api.services.retrieval import Hit, _version_clause
+from src.api.services.search import _format_results
+from src.benchmarks.catalog import synthetic_tracks
+
+def _orm_stmt(vector, limit: int, version: str):
+    #the pre-projection query: full Track entities
+    distance_col = TrackEmbedding.embedding.op('<#>')(vector).cast(Float).label('distance')
+
+    return (
+        select(Track, distance_col)
+        .join(TrackEmbedding, Track.id == TrackEmbedding.track_id)
+        .where(_version_clause(version))
+        .order_by(distance_col.asc())
+        .limit(limit)
+    )
+
+def _bytes_read(db, stmt) -> int:
+    rows = stmt.subquery("s")
+    return db.execute(select(func.sum(func.pg_column_size(literal_column("s.*")))).select_from(rows)).scalar() or 0
+
+def _summary(stage: str, mode: str, k: int, cpu_us: List[float], wall_ms: List[float], **extra) -> Dict[str, Any]:
+    return {
+        "benchmark": "response_path",
+        "stage": stage,
+        "mode": mode,
+        "k": k,
+        "requests": len(cpu_us),
+        **extra,
+        "cpu_us": round(float(np.mean(cpu_us)), 1),
+        "p50_ms": round(float(np.percentile(wall_ms, 50)), 3),
+        "p95_ms": round(float(np.percentile(wall_ms, 95)), 3),
+    }
+
+def run_db(n_queries: int = 200, k: int = 10) -> List[Dict[str, Any]]:
+    from src.db.session import SessionLocal
+    from src.ml.embeddings import embedding_model
+    from src.api.services.retrieval import PgvectorBackend, _build_search_stmt
+    from src.benchmarks.quantization import sample_queries
+
+    db = SessionLocal()
+    backend = PgvectorBackend(model_version=embedding_model.MODEL_ID)
+    rows = []
+
+    try:
+        queries = sample_queries(db, n_queries)
+        db.rollback()
+
+        for mode, build, to_hits in (
+            ("orm", lambda q: _orm_stmt(q, k, backend._version),
+             lambda result: [Hit(t.id, t.title, t.artist, t.album, t.release_year, -d, t.preview_url, t.artwork_url) for t, d in result]),
+            ("lean", lambda q: _build_search_stmt(q, k, backend._version),
+             lambda result: backend._single_hits(result)[0]),
+        ):
+            cpu_us, wall_ms, sizes = [], [], []
+
+            for q in queries:
+                stmt = build(q)
+                c0, t0 = time.process_time(), time.perf_counter()
+                to_hits(db.execute(stmt).all())
+                cpu_us.append((time.process_time() - c0) * 1e6)
+                wall_ms.append((time.perf_counter() - t0) * 1000)
+
+                sizes.append(_bytes_read(db, stmt))
+                db.rollback()
+                db.expunge_all() #every query hydrates from scratch, as in a fresh request session
+
+            rows.append(_summary("db", mode, k, cpu_us, wall_ms, bytes_per_query=int(np.mean(sizes))))
+            print(json.dumps(rows[-1]))
+
+    finally:
+        db.close()
+
+    return rows
+
+def _validated(hits: List[Hit]) -> bytes:
+    #the pre-change path: validated models, then FastAPI's response_model dump -> re-validate -> json
+    results = [
+        SearchResult(id=h.id, score=round(h.score, 4), metadata=TrackMetadata(
+            title=h.title, artist=h.artist, album=h.album, release_year=str(h.release_year)))
+        for h in hits
+    ]
+    response = SearchResponse(results=results, latency_ms=1.0, model_version="bench")
+    return json.dumps(SearchResponse.model_validate(response.model_dump()).model_dump(mode="json")).encode()
+
+def _lean(hits: List[Hit]) -> bytes:
+    response = SearchResponse.model_construct(results=_format_results(hits), latency_ms=1.0, model_version="bench", cached=False, next_cursor=None)
+    return response.model_dump_json().encode()
+
+def run_serialization(n_requests: int = 2000, k: int = 10) -> List[Dict[str, Any]]:
+    hits = [Hit(t["id"], t["title"], t["artist"], t["album"], t["release_year"], 0.5) for t in synthetic_tracks(k, seed=0)]
+    rows = []
+
+    for mode, serialize in (("validated", _validated), ("lean", _lean)):
+        cpu_us, wall_ms = [], []
+
+        for _ in range(n_requests):
+            c0, t0 = time.process_time(), time.perf_counter()
+            body = serialize(hits)
+            cpu_us.append((time.process_time() - c0) * 1e6)
+            wall_ms.append((time.perf_counter() - t0) * 1000)
+
+        rows.append(_summary("serialize", mode, k, cpu_us, wall_ms, response_bytes=len(body)))
+        print(json.dumps(rows[-1]))
+
+    return rows
+
+def run_response_path(n_queries: int = 200, k: int = 10, db: bool = True) -> List[Dict[str, Any]]:
+    return run_serialization(n_queries * 10, k) + (run_db(n_queries, k) if db else [])
+
+def main(n_queries: int = 200, k: int = 10, db: bool = True):
+    run_response_path(n_queries, k, db)
+
+if __name__ == "__main__":
+    args = [a for a in sys.argv[1:] if not a.startswith("--")]
+    main(*[int(a) for a in args[:2]], db="--no-db" not in sys.argv)
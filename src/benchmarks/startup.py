@@ -0,0 +1,97 @@
+"""
+startup time: each stage is timed in a fresh interpreter, so nothing is already imported or loaded.
+- import_routes / import_app: importing the API modules (no model, no database since initialization is lazy)
+- model_load: loading the embedding weights (local pre-baked cache when MODEL_CACHE_DIR holds them)
+- first_query: load + the first query embedding
+- live / ready (--server): uvicorn launch until /api/v1/health, then /api/v1/ready, answer 200
+
+usage: python -m src.benchmarks.startup [runs] [--server]
+prints one JSON line per stage (median & max over runs), diffable between runs.
+"""
+import os
+import sys
+import json
+import time
+import subprocess
+from typing import List, Dict, Any, Tuple
+import numpy as np
+import httpx
+
+STARTUP_PORT = int(os.getenv("BENCH_STARTUP_PORT", 8765))
+
+#stage -> (setup, timed statement)
+STAGES = {
+    "import_routes": ("", "import src.api.routes"),
+    "import_app": ("", "import src.api.app"),
+    "model_load": ("from src.ml.embeddings import embedding_model", "embedding_model.load()"),
+    "first_query": ("from src.ml.embeddings import embedding_model", "embedding_model.embed_query('warm up')"),
+}
+
+_TEMPLATE = "import time\n{setup}\nt0 = time.perf_counter()\n{stmt}\nprint(time.perf_counter() - t0)"
+
+def time_stage(setup: str, stmt: str) -> float:
+    out = subprocess.run([sys.executable, "-c", _TEMPLATE.format(setup=setup, stmt=stmt)], capture_output=True, text=True, check=True)
+    return float(out.stdout.strip().splitlines()[-1])
+
+def _wait_for(client: httpx.Client, path: str, t0: float, timeout_s: float) -> float:
+    while time.perf_counter() - t0 < timeout_s:
+        try:
+            if client.get(f'http://127.0.0.1:{STARTUP_PORT}{path}').status_code == 200:
+                return time.perf_counter() - t0
+        except httpx.TransportError:
+            pass
+        time.sleep(0.05)
+
+    raise TimeoutError(f'{path} not ready after {timeout_s}s')
+
+def time_server(timeout_s: float = 300) -> Tuple[float, float]:
+    """
+    (seconds until /health answers, seconds until /ready answers), measured from process launch.
+    """
+    t0 = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "src.api.app:app", "--port", str(STARTUP_PORT), "--log-level", "warning"],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+
+    try:
+        with httpx.Client(timeout=1.0) as client:
+            live = _wait_for(client, "/api/v1/health", t0, timeout_s)
+            ready = _wait_for(client, "/api/v1/ready", t0, timeout_s)
+    finally:
+        server.terminate()
+        server.wait()
+
+    return live, ready
+
+def run_startup(runs: int = 5, server: bool = False) -> List[Dict[str, Any]]:
+    timings: Dict[str, List[float]] = {stage: [] for stage in STAGES}
+
+    for _ in range(runs):
+        for stage, (setup, stmt) in STAGES.items():
+            timings[stage].append(time_stage(setup, stmt))
+
+        if server:
+            live, ready = time_server()
+            timings.setdefault("live", []).append(live)
+            timings.setdefault("ready", []).append(ready)
+
+    rows = []
+    for stage, values in timings.items():
+        rows.append({
+            "benchmark": "startup",
+            "stage": stage,
+            "runs": runs,
+            "elapsed_s": round(float(np.median(values)), 3),
+            "max_s": round(float(np.max(values)), 3),
+        })
+        print(json.dumps(rows[-1]))
+
+    return rows
+
+def main(runs: int = 5, server: bool = False):
+    run_startup(runs, server)
+
+if __name__ == "__main__":
+    args = [a for a in sys.argv[1:] if not a.startswith("--")]
+    main(*[int(a) for a in args[:1]], server="--server" in sys.argv)
@@ -0,0 +1,133 @@
+"""
+runs the benchmark suite & stores one JSON document per run, tagged with the git commit, so two commits can be diffed.
+
+    python -m src.benchmarks.suite run [out.json] [--catalog N] [--vectors] [--skip load,pipeline,...]
+    python -m src.benchmarks.suite compare base.json head.json
+
+run order: catalog (only with --catalog), startup, recall, response, pipeline, load. load needs the API running (BENCH_API_URL).
+compare prints one JSON line per matching result row & metric, with the relative change.
+sizes come from env: BENCH_QUERIES (200), BENCH_K (10), BENCH_PIPELINE_ROWS (10000), BENCH_ENCODER_WORKERS (0),
+BENCH_CONCURRENCY (16), BENCH_DURATION_S (30), BENCH_STARTUP_RUNS (3).
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import platform
+import subprocess
+from typing import List, Dict, Any, Optional
+
+#the fields identifying a result row across runs, everything numeric besides them is a metric
+KEY_FIELDS = ("benchmark", "mode", "stage", "m", "ef_construction", "ef_search", "k", "concurrency", "encoder_workers", "limit")
+
+#latency metrics regress when they grow, throughput/recall ones when they shrink. anything else is reported, never flagged
+HIGHER_IS_BETTER = {"qps", "rows_per_s", "recall_at_k", "min_recall", "cache_hit_rate"}
+LOWER_IS_BETTER = {"p50_ms", "p95_ms", "p99_ms", "mean_ms", "max_ms", "elapsed_s", "build_s", "index_mb", "errors",
+                  "cpu_us", "bytes_per_query", "response_bytes", "max_s"}
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def _env_int(name: str, default: int) -> int:
+    return int(os.getenv(name, default))
+
+def run_suite(catalog: int = 0, vectors: bool = False, skip=()) -> Dict[str, Any]:
+    results: List[Dict[str, Any]] = []
+
+    #imported lazily: each benchmark pulls in the model / db session only when it actually runs
+    if catalog:
+        from src.benchmarks.catalog import load_catalog
+        results.append(load_catalog(catalog, vectors=vectors))
+
+    if "startup" not in skip:
+        from src.benchmarks.startup import run_startup
+        results += run_startup(_env_int("BENCH_STARTUP_RUNS", 3))
+
+    if "recall" not in skip:
+        from src.benchmarks.recall import run_recall
+        results += run_recall(_env_int("BENCH_QUERIES", 200), _env_int("BENCH_K", 10))
+
+    if "response" not in skip:
+        from src.benchmarks.response_path import run_response_path
+        results += run_response_path(_env_int("BENCH_QUERIES", 200), _env_int("BENCH_K", 10))
+
+    if "pipeline" not in skip:
+        from src.benchmarks.pipeline_throughput import run_throughput
+        results += run_throughput(_env_int("BENCH_PIPELINE_ROWS", 10000), _env_int("BENCH_ENCODER_WORKERS", 0))
+
+    if "load" not in skip:
+        from src.benchmarks.load import run_load
+        results.append(asyncio.run(run_load(_env_int("BENCH_CONCURRENCY", 16), _env_int("BENCH_DURATION_S", 30))))
+
+    return {
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "host": {"platform": platform.platform(), "python": platform.python_version(), "cpus": os.cpu_count()},
+        "results": results,
+    }
+
+def row_key(row: Dict[str, Any]) -> tuple:
+    return tuple((f, row[f]) for f in KEY_FIELDS if f in row)
+
+def compare(base: Dict[str, Any], head: Dict[str, Any]) -> List[Dict[str, Any]]:
+    base_rows = {row_key(r): r for r in base["results"]}
+    diffs = []
+
+    for row in head["results"]:
+        old = base_rows.get(row_key(row))
+        if old is None:
+            continue
+
+        for metric, value in row.items():
+            if metric in KEY_FIELDS or isinstance(value, bool) or not isinstance(value, (int, float)):
+                continue
+            if not isinstance(old.get(metric), (int, float)):
+                continue
+
+            change = (value - old[metric]) / old[metric] if old[metric] else None
+            worse = (metric in LOWER_IS_BETTER and value > old[metric]) or (metric in HIGHER_IS_BETTER and value < old[metric])
+
+            diffs.append({
+                **dict(row_key(row)),
+                "metric": metric,
+                "base": old[metric],
+                "head": value,
+                "change": round(change, 4) if change is not None else None,
+                "regression": worse,
+            })
+
+    return diffs
+
+def _option(args: List[str], name: str, default=None):
+    return args[args.index(name) + 1] if name in args and args.index(name) + 1 < len(args) else default
+
+def main(args: List[str]):
+    if args[:1] == ["compare"] and len(args) == 3:
+        with open(args[1]) as f, open(args[2]) as g:
+            for diff in compare(json.load(f), json.load(g)):
+                print(json.dumps(diff))
+        return
+
+    if args[:1] != ["run"]:
+        print(__doc__)
+        sys.exit(1)
+
+    out = args[1] if len(args) > 1 and not args[1].startswith("--") else f'data/benchmarks/{git_commit() or "run"}.json'
+    skip = set(_option(args, "--skip", "").split(",")) - {""}
+
+    document = run_suite(int(_option(args, "--catalog", 0)), "--vectors" in args, skip)
+
+    os.makedirs(os.path.dirname(out) or ".", exist_ok=True)
+    with open(out, "w") as f:
+        json.dump(document, f, indent=2)
+
+    for row in document["results"]:
+        print(json.dumps(row))
+    print(f'wrote {out}')
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
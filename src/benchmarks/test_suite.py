@@ -0,0 +1,37 @@
+from src.benchmarks.catalog import synthetic_tracks, synthetic_vectors
+from src.benchmarks.suite import compare
+
+def test_catalog_is_deterministic():
+    print("starting synthetic catalog test.....")
+
+    tracks = synthetic_tracks(500, seed=7)
+
+    assert tracks == synthetic_tracks(500, seed=7), "same seed should yield the same catalog"
+    assert len({(t["title"], t["artist"]) for t in tracks}) == 500, "(title, artist) must be unique"
+
+    vectors = synthetic_vectors(tracks, seed=7)
+    assert vectors.shape == (500, 384)
+    assert abs(float((vectors ** 2).sum(axis=1).mean()) - 1.0) < 1e-4, "vectors should be unit length"
+
+    print("synthetic catalog passed determinism check!")
+
+def test_compare_flags_regressions():
+    base = {"results": [
+        {"benchmark": "recall", "ef_search": 40, "k": 10, "recall_at_k": 0.95, "p95_ms": 3.0},
+        {"benchmark": "load", "concurrency": 16, "qps": 200.0, "p99_ms": 40.0},
+    ]}
+    head = {"results": [
+        {"benchmark": "recall", "ef_search": 40, "k": 10, "recall_at_k": 0.90, "p95_ms": 2.0},
+        {"benchmark": "load", "concurrency": 32, "qps": 100.0, "p99_ms": 80.0}, #different config, not compared
+    ]}
+
+    diffs = {d["metric"]: d for d in compare(base, head)}
+
+    assert set(diffs) == {"recall_at_k", "p95_ms"}
+    assert diffs["recall_at_k"]["regression"], "lower recall is a regression"
+    assert not diffs["p95_ms"]["regression"], "lower latency is an improvement"
+    assert diffs["p95_ms"]["change"] == -0.3333
+
+if __name__ == "__main__":
+    test_catalog_is_deterministic()
+    test_compare_flags_regressions()
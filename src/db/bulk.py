@@ -0,0 +1,169 @@
+import io
+import os
+import math
+import uuid
+import struct
+from typing import List, Dict, Any, Optional
+import numpy as np
+from sqlalchemy import text
+
+#copy (default): binary COPY into a temp staging table + one INSERT .. SELECT .. ON CONFLICT merge
+#insert: the original multi-row INSERT .. VALUES through SQLAlchemy
+WRITE_MODE = os.getenv("WRITE_MODE", "copy").lower()
+
+#binary COPY framing: signature, flags, header extension length ... tuples ... -1 trailer
+_COPY_HEADER = b"PGCOPY\n\xff\r\n\x00" + struct.pack(">ii", 0, 0)
+_COPY_TRAILER = struct.pack(">h", -1)
+
+_EMBEDDINGS_STAGING_DDL = """
+    CREATE TEMP TABLE IF NOT EXISTS track_embeddings_staging (
+        track_id uuid NOT NULL,
+        embedding vector({dim}),
+        content_hash varchar(64)
+    ) ON COMMIT DELETE ROWS
+"""
+
+_EMBEDDINGS_MERGE_SQL = """
+    INSERT INTO track_embeddings (track_id, embedding, model_version, content_hash)
+    SELECT track_id, embedding, :model_version, content_hash FROM track_embeddings_staging
+    ON CONFLICT (track_id, model_version) {action}
+"""
+
+_EMBEDDINGS_INSERT_SQL = text(_EMBEDDINGS_MERGE_SQL.format(action="DO NOTHING"))
+
+#re-embedding changed tracks overwrites the stale vector
+_EMBEDDINGS_REPLACE_SQL = text(_EMBEDDINGS_MERGE_SQL.format(
+    action="DO UPDATE SET embedding = EXCLUDED.embedding, content_hash = EXCLUDED.content_hash, updated_at = now()"
+))
+
+_TRACKS_STAGING_DDL = """
+    CREATE TEMP TABLE IF NOT EXISTS tracks_staging (
+        id uuid NOT NULL,
+        title varchar NOT NULL,
+        artist varchar NOT NULL,
+        album varchar,
+        genre varchar,
+        release_year integer,
+        lyrics text,
+        popularity_score double precision
+    ) ON COMMIT DELETE ROWS
+"""
+
+_TRACK_COLUMNS = "id, title, artist, album, genre, release_year, lyrics, popularity_score"
+
+#same upsert as DataLoader's INSERT path: only rows whose content differs are touched (& get a new updated_at)
+_TRACKS_MERGE_SQL = text(f"""
+    INSERT INTO tracks ({_TRACK_COLUMNS})
+    SELECT {_TRACK_COLUMNS} FROM tracks_staging
+    ON CONFLICT (title, artist) DO UPDATE SET
+        album = EXCLUDED.album, genre = EXCLUDED.genre, release_year = EXCLUDED.release_year,
+        lyrics = EXCLUDED.lyrics, popularity_score = EXCLUDED.popularity_score, updated_at = now()
+    WHERE (tracks.album, tracks.genre, tracks.release_year, tracks.lyrics, tracks.popularity_score)
+        IS DISTINCT FROM (EXCLUDED.album, EXCLUDED.genre, EXCLUDED.release_year, EXCLUDED.lyrics, EXCLUDED.popularity_score)
+""")
+
+def _embedding_rows(track_ids: List[uuid.UUID], vectors: np.ndarray, content_hashes: Optional[List[str]] = None) -> bytes:
+    """
+    binary COPY tuples (uuid, vector, content_hash) built in one numpy pass, floats go from the array buffer straight to the wire.
+    pgvector's binary input is int16 dim, int16 unused, then dim big-endian float4. hashes are fixed 64-char hex (or NULL).
+    """
+    vectors = np.asarray(vectors, dtype=np.float32)
+    n, dim = vectors.shape
+
+    fields = [
+        ("fields", ">i2"),
+        ("id_len", ">i4"), ("id", "u1", 16),
+        ("vec_len", ">i4"), ("dim", ">i2"), ("unused", ">i2"), ("vec", ">f4", dim),
+        ("hash_len", ">i4"),
+    ]
+    if content_hashes is not None:
+        fields.append(("hash", "S64"))
+
+    rows = np.empty(n, dtype=np.dtype(fields))
+    rows["fields"] = 3
+    rows["id_len"] = 16
+    rows["id"] = np.frombuffer(b"".join(t.bytes for t in track_ids), dtype=np.uint8).reshape(n, 16)
+    rows["vec_len"] = 4 + 4 * dim
+    rows["dim"] = dim
+    rows["unused"] = 0
+    rows["vec"] = vectors
+
+    if content_hashes is not None:
+        rows["hash_len"] = 64
+        rows["hash"] = content_hashes
+    else:
+        rows["hash_len"] = -1 #NULL
+
+    return rows.tobytes()
+
+def _field(value: Optional[bytes]) -> bytes:
+    return struct.pack(">i", -1) if value is None else struct.pack(">i", len(value)) + value
+
+def _missing(value) -> bool:
+    #pandas hands over NaN for empty cells
+    return value is None or (isinstance(value, float) and math.isnan(value))
+
+def _text(value) -> Optional[bytes]:
+    return None if _missing(value) else str(value).encode("utf-8")
+
+def _int4(value) -> Optional[bytes]:
+    return None if _missing(value) else struct.pack(">i", int(value))
+
+def _float8(value) -> Optional[bytes]:
+    return None if _missing(value) else struct.pack(">d", float(value))
+
+def _track_rows(tracks: List[Dict[str, Any]]) -> bytes:
+    buffer = io.BytesIO()
+
+    for t in tracks:
+        buffer.write(struct.pack(">h", 8))
+        for value in (
+            t.get("id", uuid.uuid4()).bytes, #tracks.id has no server default, same python-side uuid4 as the ORM
+            _text(t["title"]), _text(t["artist"]), _text(t.get("album")), _text(t.get("genre")),
+            _int4(t.get("release_year")), _text(t.get("lyrics")), _float8(t.get("popularity_score", 0.0)),
+        ):
+            buffer.write(_field(value))
+
+    return buffer.getvalue()
+
+def _copy_binary(db, staging_ddl: str, staging_table: str, columns: str, payload: bytes) -> None:
+    """
+    runs on the session's own connection, so staging, merge & the caller's commit share one transaction.
+    """
+    cursor = db.connection().connection.cursor()
+
+    try:
+        cursor.execute(staging_ddl)
+        cursor.execute(f"TRUNCATE {staging_table}") #a second batch in the same transaction
+        cursor.copy_expert(f"COPY {staging_table} ({columns}) FROM STDIN WITH (FORMAT binary)", io.BytesIO(_COPY_HEADER + payload + _COPY_TRAILER))
+    finally:
+        cursor.close()
+
+def copy_embeddings(db, track_ids: List[uuid.UUID], vectors: np.ndarray, model_version: str,
+                    content_hashes: Optional[List[str]] = None, replace: bool = False) -> int:
+    """
+    bulk counterpart of the INSERT .. ON CONFLICT in save_embedding_rows, same idempotency (or overwrite with replace=True).
+    returns the number of inserted/replaced rows, the caller commits.
+    """
+    if not track_ids:
+        return 0
+
+    dim = np.asarray(vectors).shape[1]
+    _copy_binary(db, _EMBEDDINGS_STAGING_DDL.format(dim=dim), "track_embeddings_staging", "track_id, embedding, content_hash",
+                 _embedding_rows(track_ids, vectors, content_hashes))
+
+    merge = _EMBEDDINGS_REPLACE_SQL if replace else _EMBEDDINGS_INSERT_SQL
+
+    return db.execute(merge, {"model_version": model_version}).rowcount
+
+def copy_tracks(db, tracks: List[Dict[str, Any]]) -> int:
+    """
+    bulk counterpart of DataLoader's INSERT .. ON CONFLICT (title, artist) DO UPDATE (changed rows only).
+    returns the number of inserted + updated rows, the caller bumps the cache generation when it's > 0 & commits.
+    """
+    if not tracks:
+        return 0
+
+    _copy_binary(db, _TRACKS_STAGING_DDL, "tracks_staging", _TRACK_COLUMNS, _track_rows(tracks))
+
+    return db.execute(_TRACKS_MERGE_SQL).rowcount
@@ -0,0 +1,30 @@
+import uuid
+from typing import Optional
+from sqlalchemy import select, delete, func
+from sqlalchemy.dialects.postgresql import insert
+from src.db.models import PipelineCheckpoint
+
+def load_checkpoint(db, model_version: str) -> Optional[uuid.UUID]:
+    """
+    last track id covered by a committed batch, None when there is no backfill in progress.
+    """
+    return db.execute(
+        select(PipelineCheckpoint.last_track_id).where(PipelineCheckpoint.model_version == model_version)
+    ).scalar()
+
+def save_checkpoint(db, model_version: str, last_track_id: uuid.UUID) -> None:
+    """
+    moves the checkpoint inside the caller's transaction, so it can never get ahead of the embeddings it covers.
+    """
+    stmt = insert(PipelineCheckpoint).values(model_version=model_version, last_track_id=last_track_id)
+
+    stmt = stmt.on_conflict_do_update(
+        index_elements=['model_version'],
+        set_={"last_track_id": stmt.excluded.last_track_id, "updated_at": func.now()}
+    )
+
+    db.execute(stmt)
+
+def clear_checkpoint(db, model_version: str) -> None:
+    db.execute(delete(PipelineCheckpoint).where(PipelineCheckpoint.model_version == model_version))
+    db.commit()
@@ -1,42 +1,280 @@
-from src.db.session import SessionLocal
+from src.db.session import SessionLocal, get_engine
+import os
+import re
+import hashlib
+import sys
 import time
+from typing import Optional
 from sqlalchemy import text
 
-def create_hnsw_index():
+#HNSW build parameters: m = graph degree (recall & size grow with it), ef_construction = build-time beam width.
+#pick them from data: python -m src.benchmarks.index_sweep
+HNSW_M = int(os.getenv("HNSW_M", 16))
+HNSW_EF_CONSTRUCTION = int(os.getenv("HNSW_EF_CONSTRUCTION", 64))
+
+#the build is far faster while the whole graph fits in maintenance_work_mem, parallel workers need pgvector >= 0.6
+INDEX_MAINTENANCE_WORK_MEM = os.getenv("INDEX_MAINTENANCE_WORK_MEM", "1GB")
+INDEX_PARALLEL_WORKERS = int(os.getenv("INDEX_PARALLEL_WORKERS", 2))
+
+HNSW_INDEX_NAME = "idx_track_embeddings_embedding"
+
+def _serving_model_version() -> str:
+    from src.ml.embeddings import EmbeddingModel #imported lazily, only the model_version tag is needed
+    return EmbeddingModel.MODEL_ID
+
+def version_index_name(model_version: str, suffix: str = "") -> str:
+    """
+    one partial HNSW index per model version: idx_track_embeddings_embedding_<version slug>_<hash>[_suffix]
+    """
+    #short readable slug + hash of the full version, distinct versions never share a name within postgres' 63 byte limit
+    slug = re.sub(r"[^a-z0-9]+", "_", model_version.split("/")[-1].lower()).strip("_")[:16]
+    digest = hashlib.sha1(model_version.encode()).hexdigest()[:6]
+
+    return f'{HNSW_INDEX_NAME}_{slug}_{digest}{suffix}'
+
+def _temp_index_name(name: str, tag: str) -> str:
+    #name_tag, unless that overflows the 63 byte limit (e.g. a compact index's _new): then a truncated name + hash of the full one
+    if len(name) + len(tag) + 1 <= 63:
+        return f'{name}_{tag}'
+
+    return f'{name[:50]}_{hashlib.sha1(name.encode()).hexdigest()[:6]}_{tag}'
+
+def version_literal(model_version: str) -> str:
+    """
+    the model_version predicate is inlined as a constant, not bound: the planner only picks a partial index
+    (one HNSW index per version) when it can prove the predicate at plan time, which a server-side prepared
+    statement (asyncpg) parameter doesn't allow. shared by the index predicate & search, so the two can't drift apart.
+    """
+    if not re.fullmatch(r"[\w.\-/]+", model_version):
+        raise ValueError(f'invalid model_version: {model_version!r}')
+
+    return f"'{model_version}'"
+
+def version_predicate(model_version: str) -> str:
+    return f'model_version = {version_literal(model_version)}'
+
+#compact expression indexes for two-stage search (PGVECTOR_QUANTIZATION), no extra column & no dual-write:
+#postgres derives the compact vector from `embedding`, so rows written by the pipeline are covered automatically.
+#kind -> (indexed expression, operator class), the expressions must match retrieval._CANDIDATE_ORDER exactly
+QUANTIZED_INDEXES = {
+    "halfvec": ("embedding::halfvec(384)", "halfvec_ip_ops"),
+    "binary": ("binary_quantize(embedding)::bit(384)", "bit_hamming_ops"),
+}
+
+def hnsw_index_sql(name: str, table: str = "track_embeddings", m: int = HNSW_M, ef_construction: int = HNSW_EF_CONSTRUCTION,
+                   concurrently: bool = True, where: Optional[str] = None, kind: Optional[str] = None) -> str:
+    """
+    method: hnsw, using inner product (the <#> operator search orders by), or one of the QUANTIZED_INDEXES kinds.
+    CONCURRENTLY keeps the table writable during the build (ingestion & the pipeline go on), at the cost of two table scans.
+    with `where`, a partial index: per model version, so each version's graph only holds its own vectors.
+    """
+    if kind is None:
+        column = "embedding vector_ip_ops"
+    elif kind in QUANTIZED_INDEXES:
+        column = "({}) {}".format(*QUANTIZED_INDEXES[kind])
+    else:
+        raise ValueError(f'unknown index kind: {kind!r}')
+
+    return f"""
+        CREATE INDEX {"CONCURRENTLY " if concurrently else ""}IF NOT EXISTS {name}
+        ON {table}
+        USING hnsw ({column})
+        WITH (m={int(m)}, ef_construction={int(ef_construction)}){f" WHERE {where}" if where else ""};
+    """
+
+def maintenance_connection():
+    """
+    autocommit connection with the build settings applied: CREATE/DROP INDEX CONCURRENTLY can't run inside a transaction.
+    """
+    conn = get_engine().connect().execution_options(isolation_level="AUTOCOMMIT")
+
+    conn.execute(text("SELECT set_config('maintenance_work_mem', :mem, false)"), {"mem": INDEX_MAINTENANCE_WORK_MEM})
+    conn.execute(text("SELECT set_config('max_parallel_maintenance_workers', :workers, false)"), {"workers": str(INDEX_PARALLEL_WORKERS)})
+
+    return conn
+
+def build_index(sql: str) -> float:
+    """
+    runs one index DDL statement with the maintenance settings, returns the build time in seconds.
+    """
+    start_time = time.time()
+
+    with maintenance_connection() as conn:
+        conn.execute(text(sql))
+
+    return time.time() - start_time
+
+def drop_index(name: str, concurrently: bool = True) -> None:
+    with maintenance_connection() as conn:
+        conn.execute(text(f'DROP INDEX {"CONCURRENTLY " if concurrently else ""}IF EXISTS {name}'))
+
+def index_size(name: str) -> Optional[int]:
+    with get_engine().connect() as conn:
+        return conn.execute(text("SELECT pg_relation_size(to_regclass(:name))"), {"name": name}).scalar()
+
+def index_is_valid(name: str) -> Optional[bool]:
+    """
+    None when the index doesn't exist, False for the INVALID leftover of a failed concurrent build.
+    """
+    with get_engine().connect() as conn:
+        return conn.execute(text("SELECT indisvalid FROM pg_index WHERE indexrelid = to_regclass(:name)"), {"name": name}).scalar()
+
+def swap_index(new_name: str, name: str) -> None:
+    """
+    atomically puts new_name in place of name: both renames commit together, so queries always see exactly one index
+    under the canonical name. the old index is dropped afterwards, concurrently, outside the swap transaction.
+    """
+    old_name = _temp_index_name(name, "old")
+    drop_index(old_name) #leftover of an interrupted swap
+
+    with get_engine().begin() as conn:
+        #renames only need a brief lock, but must not queue behind a long query (& block everyone queued behind it)
+        conn.execute(text("SET LOCAL lock_timeout = '5s'"))
+        conn.execute(text(f'ALTER INDEX IF EXISTS {name} RENAME TO {old_name}'))
+        conn.execute(text(f'ALTER INDEX {new_name} RENAME TO {name}'))
+
+    drop_index(old_name)
+
+def create_hnsw_index(m: int = HNSW_M, ef_construction: int = HNSW_EF_CONSTRUCTION, model_version: Optional[str] = None,
+                      kind: Optional[str] = None):
+    """
+    partial HNSW index for one model version (the serving model by default). a new model's index can be built
+    while its vectors are backfilled, without touching the graph the live version is served from.
+    kind = halfvec | binary builds the compact index two-stage search reads instead of the full precision one.
+    """
+    model_version = model_version or _serving_model_version()
+    name = version_index_name(model_version, f'_{kind}' if kind else "")
+
+    try:
+        #IF NOT EXISTS would happily keep an INVALID index around
+        if index_is_valid(name) is False:
+            drop_index(name)
+
+        print(f'Building {name} for {model_version} (m={m}, ef_construction={ef_construction}, concurrently).....')
+
+        duration = build_index(hnsw_index_sql(name, m=m, ef_construction=ef_construction, where=version_predicate(model_version), kind=kind))
+
+        print(f'index created succesfully in {duration:.2f} seconds.')
+
+    except Exception as e:
+        print(f'index creation failed {e}')
+
+def rebuild_hnsw_index(m: int = HNSW_M, ef_construction: int = HNSW_EF_CONSTRUCTION, model_version: Optional[str] = None,
+                       kind: Optional[str] = None):
+    """
+    online rebuild with new parameters: build under a new name while the old index keeps serving, then swap.
+    kind = halfvec | binary rebuilds the compact index two-stage search reads.
+    """
+    model_version = model_version or _serving_model_version()
+    name = version_index_name(model_version, f'_{kind}' if kind else "")
+    new_name = _temp_index_name(name, "new")
+
+    try:
+        drop_index(new_name) #leftover of a failed rebuild, possibly INVALID
+
+        print(f'Building {new_name} (m={m}, ef_construction={ef_construction}, concurrently).....')
+        duration = build_index(hnsw_index_sql(new_name, m=m, ef_construction=ef_construction, where=version_predicate(model_version), kind=kind))
+
+        swap_index(new_name, name)
+
+        print(f'index rebuilt & swapped in {duration:.2f} seconds ({index_size(name) / 2**20:.1f} MiB).')
+
+    except Exception as e:
+        print(f'index rebuild failed {e}')
+
+#b-tree indexes for filtered search, also declared on the Track model for fresh databases.
+#existing databases get them from init_db (UPGRADES), `create_index filters` applies them on their own
+FILTER_INDEXES = [
+    "CREATE INDEX IF NOT EXISTS ix_tracks_artist_lower ON tracks (lower(artist));",
+    "CREATE INDEX IF NOT EXISTS ix_tracks_genre_lower ON tracks (lower(genre));",
+    "CREATE INDEX IF NOT EXISTS ix_tracks_release_year ON tracks (release_year);",
+]
+
+def create_filter_indexes():
     db = SessionLocal()
     start_time = time.time()
 
     try:
-        print('Building HNSW on track_embeddings.....')
-
-        """
-        index name: idx_track_embeddings_embedding
-        method: hnsw, using inned product.
-      
-        """
-        sql = text("""
-                    CREATE INDEX IF NOT EXISTS idx_track_embeddings_embedding
-                    ON track_embeddings
-                    USING hnsw (embedding vector_ip_ops)
-                    WITH (m=16, ef_construction=64);
-                   """)
-        #this is DDL (locked) operation
-        db.execute(sql)
+        print('Building filter indexes on tracks.....')
+
+        for sql in FILTER_INDEXES:
+            db.execute(text(sql))
         db.commit()
 
         duration = time.time() - start_time
 
-        print(f'index created succesfully in {duration:.2f} seconds.')
+        print(f'filter indexes created succesfully in {duration:.2f} seconds.')
 
     except Exception as e:
         db.rollback()
-        print(f'index creation failed {e}')
+        print(f'filter index creation failed {e}')
+
+    finally:
+        db.close()
+
+#stored tsvector + GIN index for hybrid search, both also declared on the Track model for fresh databases.
+#existing databases get the column from init_db (UPGRADES), the GIN index is built here, online: `create_index fulltext`
+FULLTEXT_COLUMN_DDL = """
+    ALTER TABLE tracks ADD COLUMN IF NOT EXISTS search_vector tsvector GENERATED ALWAYS AS (
+        setweight(to_tsvector('simple', coalesce(title, '')), 'A') ||
+        setweight(to_tsvector('simple', coalesce(artist, '')), 'B') ||
+        setweight(to_tsvector('simple', coalesce(lyrics, '')), 'D')
+    ) STORED
+"""
+
+FULLTEXT_INDEX_NAME = "ix_tracks_search_vector"
+
+def create_fulltext_index():
+    db = SessionLocal()
+    start_time = time.time()
+
+    try:
+        print('Building full-text column & GIN index on tracks.....')
+
+        #a no-op once init_db added it, otherwise rewrites the table to fill the generated column, run off-peak
+        db.execute(text(FULLTEXT_COLUMN_DDL))
+        db.commit()
+
+        #IF NOT EXISTS would happily keep an INVALID index around
+        if index_is_valid(FULLTEXT_INDEX_NAME) is False:
+            drop_index(FULLTEXT_INDEX_NAME)
+
+        build_index(f'CREATE INDEX CONCURRENTLY IF NOT EXISTS {FULLTEXT_INDEX_NAME} ON tracks USING gin (search_vector)')
+
+        duration = time.time() - start_time
+
+        print(f'full-text index created succesfully in {duration:.2f} seconds.')
+
+    except Exception as e:
+        db.rollback()
+        print(f'full-text index creation failed {e}')
 
     finally:
         db.close()
 
 if __name__ == "__main__":
-    create_hnsw_index()
+    #usage: python -m src.db.create_index [halfvec|binary|filters|fulltext|rebuild [halfvec|binary] [m] [ef_construction]|drop-unversioned]
+    #m & ef_construction default to HNSW_M / HNSW_EF_CONSTRUCTION for every HNSW index, the compact ones included
+    #HNSW indexes are built for the serving model version, INDEX_MODEL_VERSION picks another one (e.g. a candidate's backfill)
+    model_version = os.getenv("INDEX_MODEL_VERSION")
+
+    if len(sys.argv) > 1 and sys.argv[1] == "rebuild":
+        kind = sys.argv[2] if len(sys.argv) > 2 and sys.argv[2] in QUANTIZED_INDEXES else None
+        params = sys.argv[3:5] if kind else sys.argv[2:4]
+        rebuild_hnsw_index(*[int(a) for a in params], model_version=model_version, kind=kind)
+    elif len(sys.argv) > 1 and sys.argv[1] == "drop-unversioned":
+        #the old all-versions index, superseded by the per-version ones. a post-filtered scan of it can return short pages
+        drop_index(HNSW_INDEX_NAME)
+    elif len(sys.argv) > 1 and sys.argv[1] == "filters":
+        create_filter_indexes()
+    elif len(sys.argv) > 1 and sys.argv[1] == "fulltext":
+        create_fulltext_index()
+    elif len(sys.argv) > 1 and sys.argv[1] in QUANTIZED_INDEXES:
+        create_hnsw_index(model_version=model_version, kind=sys.argv[1])
+    elif len(sys.argv) > 1:
+        print(f'unknown command {sys.argv[1]}')
+    else:
+        create_hnsw_index(model_version=model_version)
         
 
 
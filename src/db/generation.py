@@ -0,0 +1,22 @@
+from sqlalchemy import select, func
+from sqlalchemy.dialects.postgresql import insert
+from src.db.models import CacheGeneration
+
+GENERATION_ID = 1
+
+#read side, shared by the sync & async search paths. a missing row means nothing has been written yet (generation 0)
+generation_stmt = select(CacheGeneration.generation).where(CacheGeneration.id == GENERATION_ID)
+
+def bump_generation(db) -> None:
+    """
+    increments the search cache generation inside the caller's transaction,
+    so readers see the new generation exactly when the new embeddings become visible (same commit).
+    """
+    stmt = insert(CacheGeneration).values(id=GENERATION_ID, generation=1)
+
+    stmt = stmt.on_conflict_do_update(
+        index_elements=['id'],
+        set_={"generation": CacheGeneration.generation + 1, "updated_at": func.now()}
+    )
+
+    db.execute(stmt)
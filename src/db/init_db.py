@@ -1,8 +1,25 @@
 from sqlalchemy import text
-from src.db.session import engine, Base
+from src.db.session import get_engine, Base
 from src.db.models import Track, TrackEmbedding
+from src.db.create_index import FILTER_INDEXES, FULLTEXT_COLUMN_DDL
+
+#create_all only creates missing tables, columns & indexes added to existing ones are applied here (idempotent)
+UPGRADES = [
+    "ALTER TABLE track_embeddings ADD COLUMN IF NOT EXISTS content_hash varchar(64)",
+    "CREATE INDEX IF NOT EXISTS ix_tracks_updated_at ON tracks (updated_at) WHERE updated_at IS NOT NULL",
+    "ALTER TABLE tracks ADD COLUMN IF NOT EXISTS preview_url varchar",
+    "ALTER TABLE tracks ADD COLUMN IF NOT EXISTS artwork_url varchar",
+    "ALTER TABLE tracks ADD COLUMN IF NOT EXISTS preview_enriched_at timestamptz",
+    "CREATE INDEX IF NOT EXISTS ix_tracks_preview_pending ON tracks (id) WHERE preview_enriched_at IS NULL",
+    #artist/genre/year b-trees of filtered search, one definition shared with `create_index filters`
+    *FILTER_INDEXES,
+    #hybrid search's stored tsvector (rewrites the table once). its GIN index is a separate online step:
+    #python -m src.db.create_index fulltext
+    FULLTEXT_COLUMN_DDL,
+]
 
 def init_db(): 
+    engine = get_engine()
     print(f'connecting to {engine.url}....')
 
     try:
@@ -14,6 +31,12 @@ def init_db():
         Base.metadata.create_all(bind=engine)
         print("tables created succesfully ✅")
 
+        with engine.connect() as conn:
+            for ddl in UPGRADES:
+                conn.execute(text(ddl))
+            conn.commit()
+            print("schema upgrades applied ✅")
+
     except Exception as e:
         print(f'initialization failed{e} ❌')
 
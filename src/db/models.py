@@ -1,5 +1,7 @@
 import uuid
-from sqlalchemy import Column, String, Float, Integer, Text, String, DateTime, ForeignKey, func, UniqueConstraint
+from sqlalchemy import Column, String, Float, Integer, BigInteger, Text, String, DateTime, ForeignKey, func, UniqueConstraint, Index, Computed
+from sqlalchemy.dialects.postgresql import TSVECTOR
+from sqlalchemy.orm import deferred
 from pgvector.sqlalchemy import Vector
 from sqlalchemy.dialects.postgresql import UUID
 from src.db.session import Base
@@ -24,13 +26,37 @@ class Track(Base):
     lyrics = Column(Text, nullable=True)
     popularity_score = Column(Float, default=0.0)
 
+    #lexical side of hybrid search, maintained by postgres itself. 'simple' config: no stemming, names stay intact.
+    #weights rank title (A) over artist (B) over lyrics (D) matches. deferred: never loaded with the Track row.
+    search_vector = deferred(Column(TSVECTOR, Computed(
+        "setweight(to_tsvector('simple', coalesce(title, '')), 'A') || "
+        "setweight(to_tsvector('simple', coalesce(artist, '')), 'B') || "
+        "setweight(to_tsvector('simple', coalesce(lyrics, '')), 'D')",
+        persisted=True
+    )))
+
+    #audio preview & cover art, resolved from iTunes by the enrichment job (src/ml/enrich_previews.py)
+    #preview_enriched_at is set on every resolved lookup, also when iTunes has no preview (preview_url stays NULL)
+    preview_url = Column(String, nullable=True)
+    artwork_url = Column(String, nullable=True)
+    preview_enriched_at = Column(DateTime(timezone=True), nullable=True)
+
     #for audit
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
 
    #adding contraint, to handle idempotency issues..(duplicate tracks)
+    #b-tree indexes back the pre-filter strategy of filtered search (case-insensitive artist/genre, year ranges)
     __table_args__ = (
         UniqueConstraint('title', 'artist', name="uq_track_title_artist"),
+        Index("ix_tracks_artist_lower", func.lower(artist)),
+        Index("ix_tracks_genre_lower", func.lower(genre)),
+        Index("ix_tracks_release_year", release_year),
+        Index("ix_tracks_search_vector", search_vector, postgresql_using="gin"),
+        #only rows the loader has ever changed, drives the re-embed-changed pipeline mode
+        Index("ix_tracks_updated_at", updated_at, postgresql_where=updated_at.isnot(None)),
+        #the enrichment job's work queue: tracks never looked up, in keyset (id) order
+        Index("ix_tracks_preview_pending", id, postgresql_where=preview_enriched_at.is_(None)),
         )
 
 class TrackEmbedding(Base):
@@ -48,6 +74,9 @@ class TrackEmbedding(Base):
     #model versioning provisions for A/B testing in subsequent stages.
     model_version = Column(String, default="v1_minilm")
 
+    #sha256 of the exact model input (EmbeddingModel._create_contextual_text), a mismatch means the vector is stale
+    content_hash = Column(String(64), nullable=True)
+
 
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
@@ -58,3 +87,24 @@ class TrackEmbedding(Base):
     )
 
 
+class CacheGeneration(Base):
+
+    __tablename__ = "cache_generation"
+
+    #single row counter, bumped whenever the pipeline writes embeddings or the loader inserts/changes tracks.
+    #search result caches key on it, so every cached page goes stale the moment new vectors land.
+    id = Column(Integer, primary_key=True, default=1)
+    generation = Column(BigInteger, nullable=False, default=0)
+
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+class PipelineCheckpoint(Base):
+
+    __tablename__ = "pipeline_checkpoints"
+
+    #keyset position of the embedding backfill per model version, written in the same commit as the vectors.
+    #a crashed pipeline resumes after last_track_id instead of rescanning the catalog from the start.
+    model_version = Column(String, primary_key=True)
+    last_track_id = Column(UUID(as_uuid=True), nullable=False)
+
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
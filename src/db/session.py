@@ -1,29 +1,97 @@
 import os
+import threading
 from dotenv import load_dotenv
 from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
 from sqlalchemy.ext.declarative import declarative_base
 
 load_dotenv()
 
-if not os.getenv("POSTGRES_PORT"):
-    raise ValueError("POSTGRES_PORT is missing from environment variables, check .env file")
+#engines are built on first use (get_engine / get_async_engine), so importing models, CLI tools & tests
+#neither needs database env vars nor opens a pool
 
+def database_url() -> str:
+    # using only fstring to avoid hardcoding credentials, better for prod.
+    if not os.getenv("POSTGRES_PORT"):
+        raise ValueError("POSTGRES_PORT is missing from environment variables, check .env file")
 
+    return f"postgresql://{os.getenv('POSTGRES_USER')}:{os.getenv('POSTGRES_PASSWORD')}@{os.getenv('POSTGRES_HOST')}:{os.getenv('POSTGRES_PORT')}/{os.getenv('POSTGRES_DB')}"
 
-# create connection to db, constructing db url
-# using only fstring to avoid hardcoding credentials, better for prod. 
+_engine = None
+_async_engine = None
+_engine_lock = threading.Lock()
 
-db_url = f"postgresql://{os.getenv('POSTGRES_USER')}:{os.getenv('POSTGRES_PASSWORD')}@{os.getenv('POSTGRES_HOST')}:{os.getenv('POSTGRES_PORT')}/{os.getenv('POSTGRES_DB')}"
+def get_engine():
+    """
+    process-wide sync engine (connection pool), built once on first use.
+    """
+    global _engine
 
-#creating engine - connection pool
+    if _engine is not None:
+        return _engine
 
-engine = create_engine(db_url, pool_size=20, max_overflow=10, pool_pre_ping=True, pool_recycle=1800) #20 concurrent threads #upto 10 bonus threads, in case of traffic spikes. 
+    with _engine_lock:
+        if _engine is None:
+            _engine = create_engine(database_url(), pool_size=20, max_overflow=10, pool_pre_ping=True, pool_recycle=1800) #20 concurrent threads #upto 10 bonus threads, in case of traffic spikes.
+
+    return _engine
+
+class LazySession(Session):
+    #bound to the engine on its first statement, creating a session (or the engine) costs nothing until then
+    def get_bind(self, mapper=None, clause=None, **kw):
+        if self.bind is None:
+            self.bind = get_engine()
+
+        return super().get_bind(mapper, clause=clause, **kw)
 
 #session settings
 #no autocommit, this gives us control over data saves, enabling rollback during connection/request errors. 
 
-SessionLocal = sessionmaker(autocommit=False, autoflush=False,bind=engine)
+SessionLocal = sessionmaker(class_=LazySession, autocommit=False, autoflush=False)
+
+#async engine (asyncpg) with its own pool, only built when the async search path is switched on (ASYNC_SEARCH=true)
+#a single worker can then hold many in-flight searches while waiting on postgres, instead of one per threadpool slot.
+
+ASYNC_SEARCH = os.getenv("ASYNC_SEARCH", "false").lower() == "true"
+
+AsyncSessionLocal = None
+
+def get_async_engine():
+    """
+    process-wide asyncpg engine, None unless ASYNC_SEARCH is on. built once on first use, like get_engine.
+    """
+    global _async_engine, AsyncSessionLocal
+
+    if not ASYNC_SEARCH or _async_engine is not None:
+        return _async_engine
+
+    with _engine_lock:
+        if _async_engine is None:
+            #imported lazily, sqlalchemy's asyncio extension needs greenlet which the sync-only deployments don't install
+            from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+
+            engine = create_async_engine(
+                database_url().replace("postgresql://", "postgresql+asyncpg://", 1),
+                pool_size=int(os.getenv("ASYNC_POOL_SIZE", 50)),
+                max_overflow=int(os.getenv("ASYNC_POOL_MAX_OVERFLOW", 10)),
+                pool_pre_ping=True,
+                pool_recycle=1800
+            )
+
+            #no asyncpg vector codec registered on purpose: pgvector's VECTOR type already binds as text '[..]'
+            AsyncSessionLocal = async_sessionmaker(engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+            _async_engine = engine
+
+    return _async_engine
+
+def __getattr__(name):
+    #`from src.db.session import engine` keeps working, the engine is built when the name is first imported
+    if name == "engine":
+        return get_engine()
+    if name == "async_engine":
+        return get_async_engine()
+
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
 
 #ORM manager
 
@@ -38,4 +106,13 @@ def get_db():
     finally: 
         db.close()
 
+async def get_async_db():
+    get_async_engine()
+
+    async with AsyncSessionLocal() as db:
+        yield db
 
+async def dispose_async_engine():
+    #shutdown hook, never builds the engine just to close it
+    if _async_engine is not None:
+        await _async_engine.dispose()
@@ -0,0 +1,85 @@
+import io
+import uuid
+import struct
+import numpy as np
+import pandas as pd
+from src.db.bulk import _embedding_rows, _track_rows, _COPY_HEADER, _COPY_TRAILER
+
+def _read_fields(buffer: io.BytesIO):
+    """
+    one binary COPY tuple: int16 field count, then per field an int32 length (-1 = NULL) & the payload.
+    """
+    (n_fields,) = struct.unpack(">h", buffer.read(2))
+    fields = []
+
+    for _ in range(n_fields):
+        (length,) = struct.unpack(">i", buffer.read(4))
+        fields.append(None if length == -1 else buffer.read(length))
+
+    return fields
+
+def _decode_vector(payload: bytes) -> np.ndarray:
+    #pgvector binary input: int16 dim, int16 unused, dim big-endian float4
+    dim, unused = struct.unpack(">hh", payload[:4])
+    assert unused == 0 and len(payload) == 4 + 4 * dim
+    return np.frombuffer(payload[4:], dtype=">f4")
+
+def test_embedding_rows_decode():
+    print("starting binary copy encoding test.....")
+
+    ids = [uuid.uuid4() for _ in range(3)]
+    vectors = np.random.default_rng(0).standard_normal((3, 5)).astype(np.float32)
+    hashes = [f'{i:064x}' for i in range(3)]
+
+    buffer = io.BytesIO(_embedding_rows(ids, vectors, hashes))
+    for track_id, vector, content_hash in zip(ids, vectors, hashes):
+        fields = _read_fields(buffer)
+
+        assert len(fields) == 3
+        assert uuid.UUID(bytes=fields[0]) == track_id
+        assert np.array_equal(_decode_vector(fields[1]), vector)
+        assert fields[2] == content_hash.encode()
+
+    assert buffer.read() == b"", "no trailing bytes between tuples"
+
+    #no hashes: the third field is NULL, not an empty string
+    buffer = io.BytesIO(_embedding_rows(ids, vectors))
+    rows = [_read_fields(buffer) for _ in ids]
+    assert all(fields[2] is None for fields in rows)
+    assert buffer.read() == b""
+
+    print("binary copy encoding passed!")
+
+def test_track_rows_turn_pandas_nan_into_null():
+    #pd.read_csv hands over NaN for empty cells, in text, int & float columns alike
+    chunk = pd.read_csv(io.StringIO(
+        "title,artist,album,genre,release_year,lyrics,popularity_score\n"
+        "Shape of You,Ed Sheeran,Divide,Pop,2017,la,0.95\n"
+        "Blinding Lights,The Weeknd,,,,,\n"
+    ))
+    tracks = chunk.to_dict(orient="records")
+    assert isinstance(tracks[1]["album"], float) and isinstance(tracks[1]["release_year"], float)
+
+    buffer = io.BytesIO(_track_rows(tracks))
+    full, sparse = _read_fields(buffer), _read_fields(buffer)
+    assert buffer.read() == b""
+
+    assert len(full) == len(sparse) == 8
+    uuid.UUID(bytes=full[0])
+    assert full[1:5] == [b"Shape of You", b"Ed Sheeran", b"Divide", b"Pop"]
+    assert struct.unpack(">i", full[5]) == (2017,)
+    assert full[6] == b"la"
+    assert struct.unpack(">d", full[7]) == (0.95,)
+
+    assert sparse[1:3] == [b"Blinding Lights", b"The Weeknd"]
+    assert sparse[3:] == [None] * 5, f'NaN should be NULL, got {sparse[3:]}'
+
+def test_copy_framing():
+    #signature, int32 flags, int32 header extension length ... int16 -1 trailer
+    assert _COPY_HEADER == b"PGCOPY\n\xff\r\n\x00" + b"\x00" * 8
+    assert struct.unpack(">h", _COPY_TRAILER) == (-1,)
+
+if __name__ == "__main__":
+    test_embedding_rows_decode()
+    test_track_rows_turn_pandas_nan_into_null()
+    test_copy_framing()
@@ -1,7 +1,14 @@
 import pandas as pd
+import numpy as np
 import os 
 import sys
-from src.ingestion.loader import ingest_batch
+import csv
+import time
+import queue
+import threading
+from typing import Tuple
+from src.db.session import SessionLocal
+from src.ingestion.loader import ingest_batch, DataLoader
 
 CSV_PATH = "data/raw/spotify_millsongdata.csv"
 
@@ -57,7 +64,203 @@ def process_and_ingest(file_path: str, chunk_size: int = 1000):
 
     print(f'Succesfully ingested {total_ingested} tracks.')
 
+TRACK_COLUMNS = ['title', 'artist', 'album', 'genre', 'release_year','lyrics','popularity_score']
+
+def validate_chunk(chunk: pd.DataFrame) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    column-wise counterpart of the per-row checks in DataLoader.load_tracks, plus the defaults of process_and_ingest.
+    returns (valid rows ready for loading, rejected rows with a `reject_reason` column).
+    """
+    chunk = chunk.rename(columns=COLUMN_MAPPING)
+
+    defaults = {"album": "Unknown-album", "genre": "unknown-genre", "release_year": None, "popularity_score": 0.5, "lyrics": None}
+    for column, default in defaults.items():
+        if column not in chunk.columns:
+            chunk[column] = default
+
+    for column in ("title", "artist"):
+        if column not in chunk.columns:
+            chunk[column] = None
+        chunk[column] = chunk[column].astype("string").str.strip()
+
+    missing_title = chunk["title"].isna() | (chunk["title"] == "")
+    missing_artist = chunk["artist"].isna() | (chunk["artist"] == "")
+    bad = missing_title | missing_artist
+
+    rejected = chunk[bad].copy()
+    rejected["reject_reason"] = np.where(missing_title[bad], "missing title", "missing artist")
+
+    valid = chunk.loc[~bad, TRACK_COLUMNS].copy()
+    valid["release_year"] = pd.to_numeric(valid["release_year"], errors="coerce").astype("Int64")
+    valid["popularity_score"] = pd.to_numeric(valid["popularity_score"], errors="coerce").fillna(0.0)
+
+    #NaN/NA -> None, so both write paths see SQL NULLs
+    valid = valid.astype(object).where(valid.notna(), None)
+
+    return valid, rejected
+
+class RejectWriter:
+
+    """
+    bad rows go to a CSV (track columns + reject_reason) instead of stdout. shared by the validate & load stages.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.count = 0
+        self._lock = threading.Lock()
+        self._header_written = False
+
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        open(path, "w").close()
+
+    def write(self, rows: pd.DataFrame):
+        if rows.empty:
+            return
+
+        with self._lock:
+            rows.reindex(columns=TRACK_COLUMNS + ["reject_reason"]).to_csv(self.path, mode="a", header=not self._header_written, index=False, quoting=csv.QUOTE_NONNUMERIC)
+            self._header_written = True
+            self.count += len(rows)
+
+def _put(q: queue.Queue, item, failed: threading.Event):
+    #blocks while the next stage is behind (backpressure), gives up once a stage has failed
+    while not failed.is_set():
+        try:
+            q.put(item, timeout=0.5)
+            return
+        except queue.Full:
+            continue
+
+def parallel_ingest(file_path: str, chunk_size: int = 10000, workers: int = 4, queue_size: int = 4,
+                    reject_path: str = "data/rejects/tracks_rejected.csv") -> dict:
+    """
+    streaming variant of process_and_ingest: parse -> vectorized validate -> N loader threads (own session each),
+    overlapping through bounded queues, so CSV parsing never waits on a commit & memory stays at ~queue_size chunks.
+    returns & prints a summary with rows/sec.
+    """
+    if not os.path.exists(file_path):
+        print(f'{file_path} not found')
+        sys.exit(1)
+
+    parsed: queue.Queue = queue.Queue(maxsize=queue_size)
+    validated: queue.Queue = queue.Queue(maxsize=queue_size)
+    failed = threading.Event()
+    rejects = RejectWriter(reject_path)
+
+    counts = {"read": 0, "valid": 0, "loaded": 0}
+    counts_lock = threading.Lock()
+
+    def count(key: str, n: int):
+        with counts_lock:
+            counts[key] += n
+
+    def parse():
+        try:
+            for chunk in pd.read_csv(file_path, chunksize=chunk_size, quotechar='"', dtype_backend="numpy_nullable"):
+                count("read", len(chunk))
+                _put(parsed, chunk, failed)
+        finally:
+            _put(parsed, None, failed)
+
+    def validate():
+        try:
+            while not failed.is_set():
+                try:
+                    chunk = parsed.get(timeout=0.5)
+                except queue.Empty:
+                    continue
+
+                if chunk is None:
+                    break
+
+                valid, rejected = validate_chunk(chunk)
+                rejects.write(rejected)
+                count("valid", len(valid))
+                _put(validated, valid, failed)
+        finally:
+            for _ in range(workers):
+                _put(validated, None, failed)
+
+    def load():
+        db = SessionLocal()
+        loader = DataLoader(db)
+
+        try:
+            while not failed.is_set():
+                try:
+                    frame = validated.get(timeout=0.5)
+                except queue.Empty:
+                    continue
+
+                if frame is None:
+                    break
+
+                try:
+                    count("loaded", loader.load_valid_tracks(frame.to_dict(orient="records")))
+                except Exception as e:
+                    #the chunk is not lost silently, it lands in the reject file with the error
+                    rejected = frame.copy()
+                    rejected["reject_reason"] = f'load failed: {e}'.splitlines()[0]
+                    rejects.write(rejected)
+        finally:
+            db.close()
+
+    def guarded(fn):
+        def run():
+            try:
+                fn()
+            except Exception as e:
+                print(f'ingestion stage failed {e}')
+                failed.set()
+        return run
+
+    print(f'starting parallel ingestion: {workers} loader threads, chunks of {chunk_size}..')
+    t0 = time.time()
+
+    threads = [threading.Thread(target=guarded(parse), daemon=True), threading.Thread(target=guarded(validate), daemon=True)]
+    threads += [threading.Thread(target=guarded(load), daemon=True) for _ in range(workers)]
+
+    for t in threads:
+        t.start()
+
+    while any(t.is_alive() for t in threads):
+        for t in threads:
+            t.join(timeout=5)
+
+        elapsed = time.time() - t0
+        print(f'read {counts["read"]} rows, inserted {counts["loaded"]}. (speed : {counts["read"] / (elapsed + 0.0001): .1f} rows/sec)')
+
+    if failed.is_set():
+        raise RuntimeError("ingestion aborted, see stage errors above")
+
+    elapsed = time.time() - t0
+    summary = {
+        **counts,
+        "rejected": rejects.count,
+        "elapsed_s": round(elapsed, 2),
+        "rows_per_s": round(counts["read"] / (elapsed + 0.0001), 1),
+        "reject_file": reject_path,
+    }
+
+    print(f'Succesfully ingested {counts["loaded"]} tracks. {summary}')
+
+    return summary
+
 if __name__ == "__main__":
-    process_and_ingest(CSV_PATH)
+    #INGEST_WORKERS=0 keeps the original sequential chunk loop
+    workers = int(os.getenv("INGEST_WORKERS", 4))
+    path = sys.argv[1] if len(sys.argv) > 1 else CSV_PATH
+
+    if workers > 0:
+        parallel_ingest(
+            path,
+            chunk_size=int(os.getenv("INGEST_CHUNK_SIZE", 10000)),
+            workers=workers,
+            reject_path=os.getenv("INGEST_REJECT_PATH", "data/rejects/tracks_rejected.csv"),
+        )
+    else:
+        process_and_ingest(path)
 
 
@@ -1,8 +1,11 @@
 from typing import List, Dict, Any
+from sqlalchemy import tuple_, func
 from src.db.session import SessionLocal
 from sqlalchemy.orm import Session
 from src.db.models import Track
 from sqlalchemy.dialects.postgresql import insert
+from src.db.bulk import WRITE_MODE, copy_tracks
+from src.db.generation import bump_generation
 
 class DataLoader():
     def __init__(self, db: Session):
@@ -39,23 +42,57 @@ class DataLoader():
             return 0
         
         try:
-            # self.db.bulk_save_objects(tracks_to_insert)
-            # self.db.commit()
-            #stmt - upsert stmt, either update or insert (if record doesn't exist)
-            stmt = insert(Track).values(tracks_to_insert)
-
-            stmt = stmt.on_conflict_do_nothing(
-                index_elements=['title', 'artist']
-            )
-            result = self.db.execute(stmt)
-            self.db.commit()
-            print(f'Succesfully committed {result.rowcount} tracks')
-            return result.rowcount  
+            rowcount = self.load_valid_tracks(tracks_to_insert)
+            print(f'Succesfully committed {rowcount} tracks')
+            return rowcount  
         
         except Exception as e:
             self.db.rollback()
             print(f'Batch insert failed: {e}')
             return 0
+
+    def load_valid_tracks(self, tracks_to_insert: List[Dict[str, Any]]) -> int:
+        """
+        write half of load_tracks for rows that are already validated (the parallel CSV ingestion validates whole DataFrames).
+        raises on failure, the caller decides what happens to the batch.
+        """
+        if not tracks_to_insert:
+            return 0
+
+        #DO UPDATE can't touch the same row twice in one statement: last occurrence wins,
+        #& a fixed (title, artist) order keeps concurrent loaders from deadlocking on each other's rows
+        tracks_to_insert = sorted({(t["title"], t["artist"]): t for t in tracks_to_insert}.values(), key=lambda t: (str(t["title"]), str(t["artist"])))
+
+        try:
+            # self.db.bulk_save_objects(tracks_to_insert)
+            # self.db.commit()
+            #binary COPY into a staging table + ON CONFLICT merge, no per-value statement compilation (WRITE_MODE=copy)
+            if WRITE_MODE == "copy":
+                rowcount = copy_tracks(self.db, tracks_to_insert)
+            else:
+                #stmt - upsert stmt, either update or insert (if record doesn't exist)
+                #only rows whose content actually changed are updated, their new updated_at flags them for re-embedding
+                stmt = insert(Track).values(tracks_to_insert)
+
+                content = ['album', 'genre', 'release_year', 'lyrics', 'popularity_score']
+
+                stmt = stmt.on_conflict_do_update(
+                    index_elements=['title', 'artist'],
+                    set_={**{c: stmt.excluded[c] for c in content}, "updated_at": func.now()},
+                    where=tuple_(*[Track.__table__.c[c] for c in content]).is_distinct_from(tuple_(*[stmt.excluded[c] for c in content]))
+                )
+                rowcount = self.db.execute(stmt).rowcount
+
+            #cached search pages carry track metadata, invalidated in the same commit as the inserted/changed rows
+            if rowcount:
+                bump_generation(self.db)
+
+            self.db.commit()
+            return rowcount
+
+        except Exception:
+            self.db.rollback()
+            raise
         
 
 def ingest_batch(data: List[Dict[str, Any]]):
@@ -1,4 +1,12 @@
-from src.ingestion.loader import ingest_batch
+import uuid
+import pandas as pd
+from sqlalchemy import select, delete
+from src.db.session import SessionLocal
+from src.db.models import Track
+from src.db.generation import generation_stmt
+from src.ingestion import loader
+from src.ingestion.loader import ingest_batch, DataLoader
+from src.ingestion.ingest_csv import validate_chunk
 
 def run_manual_test():
     dummy_data = [
@@ -34,6 +42,80 @@ def run_manual_test():
     print("dummy data ingested succesfully!")
 
 
+def test_validate_chunk_reject_reasons():
+    print("starting chunk validation test.....")
+
+    #raw spotify column names, blank & whitespace-only names, a non-numeric year
+    chunk = pd.DataFrame({
+        "song": ["Shape of You", None, "   ", "Blinding Lights", "Hello"],
+        "artist": ["Ed Sheeran", "Queen", "Queen", "  ", None],
+        "text": ["The club isn't the best place...", "Is this the real life?", None, None, None],
+    })
+    chunk["release_year"] = ["2017", "1975", "1975", "2020", "oops"]
+
+    valid, rejected = validate_chunk(chunk)
+
+    assert list(rejected["reject_reason"]) == ["missing title", "missing title", "missing artist", "missing artist"]
+    assert len(valid) == 1
+
+    row = valid.iloc[0]
+    assert row["title"] == "Shape of You" and row["artist"] == "Ed Sheeran"
+    assert row["album"] == "Unknown-album" and row["genre"] == "unknown-genre" and row["popularity_score"] == 0.5
+    assert row["release_year"] == 2017
+
+    #a title-less row without an artist is reported for its title, bad numbers become NULL rather than a reject
+    valid, rejected = validate_chunk(pd.DataFrame({"song": [None, "Hello"], "artist": [None, "Adele"], "release_year": ["1990", "oops"]}))
+    assert list(rejected["reject_reason"]) == ["missing title"]
+    assert valid.iloc[0]["release_year"] is None and valid.iloc[0]["lyrics"] is None
+
+    print("chunk validation passed!")
+
+
+def _generation(db) -> int:
+    return db.execute(generation_stmt).scalar() or 0
+
+def test_upsert_only_touches_changed_rows():
+    print("starting upsert test.....")
+
+    db = SessionLocal()
+    write_mode = loader.WRITE_MODE
+    titles = []
+
+    try:
+        #both write paths: binary COPY + merge & the INSERT .. ON CONFLICT
+        for mode in ("copy", "insert"):
+            loader.WRITE_MODE = mode
+            titles.append(f'upsert test {uuid.uuid4()}')
+            track = {"title": titles[-1], "artist": "Test Artist", "album": None, "genre": "Pop", "release_year": 2001, "lyrics": "la la", "popularity_score": 0.5}
+            updated_at = select(Track.updated_at).where(Track.title == titles[-1])
+
+            generation = _generation(db)
+            assert DataLoader(db).load_valid_tracks([dict(track)]) == 1
+            assert _generation(db) == generation + 1, "a new track invalidates cached pages"
+
+            #identical content (NULL album included, IS DISTINCT FROM treats NULL = NULL): no update, no new updated_at, no bump
+            before = db.execute(updated_at).scalar()
+            assert DataLoader(db).load_valid_tracks([dict(track)]) == 0, f'{mode}: unchanged row was rewritten'
+            assert db.execute(updated_at).scalar() == before
+            assert _generation(db) == generation + 1
+
+            assert DataLoader(db).load_valid_tracks([{**track, "popularity_score": 0.9}]) == 1
+            after = db.execute(updated_at).scalar()
+            assert after is not None and after != before, f'{mode}: changed row kept its updated_at'
+            assert _generation(db) == generation + 2
+
+    finally:
+        loader.WRITE_MODE = write_mode
+        db.rollback()
+        db.execute(delete(Track).where(Track.title.in_(titles)))
+        db.commit()
+        db.close()
+
+    print("upsert passed!")
+
+
 if __name__ == "__main__": 
+    test_validate_chunk_reject_reasons()
+    test_upsert_only_touches_changed_rows()
     run_manual_test()
 
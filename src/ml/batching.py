@@ -0,0 +1,91 @@
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, List, Tuple
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+class QueryBatcher:
+
+    """
+    dynamic micro-batching front-end for query embedding.
+    concurrent callers submit single texts, a background worker collects whatever arrives within max_wait_ms
+    (or up to max_batch_size) & runs ONE encode call for all of them, then fans the vectors back to the waiting callers.
+    N tiny forward passes serialized on a lock become one batched pass, which is where CPU hosts get their throughput.
+    """
+
+    def __init__(self, encode_fn: Callable[[List[str]], np.ndarray], max_batch_size: int = 32, max_wait_ms: float = 5.0):
+        self.encode_fn = encode_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait_ms = max_wait_ms
+
+        self._queue: "queue.Queue[Tuple[str, Future]]" = queue.Queue()
+        self._worker = None
+        self._worker_lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_batch_size > 1 and self.max_wait_ms > 0
+
+    def submit(self, text: str) -> np.ndarray:
+        """
+        blocks until the vector for `text` is ready. falls back to a direct encode call when batching is disabled.
+        """
+        if not self.enabled:
+            return self.encode_fn([text])[0]
+
+        self._ensure_worker()
+
+        future: Future = Future()
+        self._queue.put((text, future))
+
+        return future.result()
+
+    def _ensure_worker(self):
+        #started lazily, so importing the model module doesn't spawn threads
+        if self._worker is not None and self._worker.is_alive():
+            return
+
+        with self._worker_lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name="query-batcher", daemon=True)
+                self._worker.start()
+
+    def _collect_batch(self) -> List[Tuple[str, Future]]:
+        batch = [self._queue.get()] #block until there is at least one query
+
+        #the window opens on the first arrival, so an idle server adds at most max_wait_ms to p50
+        deadline = time.monotonic() + self.max_wait_ms / 1000
+
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect_batch()
+            texts = [text for text, _ in batch]
+
+            try:
+                vectors = self.encode_fn(texts)
+
+            except Exception as e:
+                logger.error(f'batched query encoding failed for {len(texts)} queries: {e}')
+
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+
+            for i, (_, future) in enumerate(batch):
+                future.set_result(vectors[i])
@@ -0,0 +1,91 @@
+import os
+import time
+import threading
+from collections import OrderedDict
+from typing import Any, Hashable, Dict
+
+
+class LRUCache:
+
+    """
+    small thread-safe LRU cache with optional TTL, used in front of expensive calls (eg: query embedding).
+    max_size bounds memory, ttl_seconds <= 0 disables expiry. hit/miss counters are kept for observability.
+    """
+
+    _MISSING = object()
+
+    def __init__(self, max_size: int = 1024, ttl_seconds: float = 0):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict() # key -> (expires_at, value)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_size > 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        if not self.enabled:
+            return default
+
+        with self._lock:
+            entry = self._data.get(key, self._MISSING)
+
+            if entry is self._MISSING:
+                self.misses += 1
+                return default
+
+            expires_at, value = entry
+
+            if expires_at is not None and expires_at <= time.monotonic():
+                #stale entry, drop it & treat as a miss
+                del self._data[key]
+                self.misses += 1
+                return default
+
+            self._data.move_to_end(key) #mark as most recently used
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        if not self.enabled:
+            return
+
+        expires_at = time.monotonic() + self.ttl_seconds if self.ttl_seconds > 0 else None
+
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False) #evict least recently used
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "max_size": self.max_size,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+        }
+
+
+def cache_from_env(prefix: str, default_size: int, default_ttl: float) -> LRUCache:
+    """
+    builds an LRUCache sized from env vars: {prefix}_SIZE & {prefix}_TTL (seconds). size 0 disables the cache.
+    """
+    size = int(os.getenv(f'{prefix}_SIZE', default_size))
+    ttl = float(os.getenv(f'{prefix}_TTL', default_ttl))
+
+    return LRUCache(max_size=size, ttl_seconds=ttl)
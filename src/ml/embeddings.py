@@ -1,13 +1,28 @@
+import os
+import re
+import time
+import hashlib
 import logging
 import threading
 from typing import List, Dict, Any, Optional
 import numpy as np
-import torch
-from sentence_transformers import SentenceTransformer
+from src.ml.cache import cache_from_env
+from src.ml.batching import QueryBatcher
+from src.monitoring.metrics import EMBED_LOCK_WAIT_SECONDS, EMBED_INFERENCE_SECONDS
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+#local weights cache, filled at image build time by `python -m src.ml.embeddings download`
+MODEL_CACHE_DIR = os.getenv("MODEL_CACHE_DIR", "data/models")
+MODEL_OFFLINE = os.getenv("MODEL_OFFLINE", "false").lower() == "true"
+
+#allocation failures as torch (cuda & cpu) and ONNX Runtime word them
+_OUT_OF_MEMORY_MESSAGES = ("out of memory", "can't allocate memory", "failed to allocate memory")
+
+def _is_out_of_memory(e: BaseException) -> bool:
+    return isinstance(e, MemoryError) or any(m in str(e).lower() for m in _OUT_OF_MEMORY_MESSAGES)
+
 class EmbeddingModel:
 
     """
@@ -16,40 +31,133 @@ class EmbeddingModel:
 
     #config, pinned to version, to restrict drifts & index breaking post huggingface updates. 
     #MODEL_ID = "sentence-transformers/all-MiniLM-L6-v2"
-    MODEL_ID = "all-MiniLM-L6-v2"
+    #also the model_version tag of the vectors it writes & searches. EMBEDDING_MODEL_ID switches it for a new model's backfill
+    MODEL_ID = os.getenv("EMBEDDING_MODEL_ID", "all-MiniLM-L6-v2")
     MODEL_REVISION = None # "fa97f6e7cb1a59073dff9e6b13e27730ea7d508f"
     EXPECTED_DIM = 384
     MAX_SEQ_LENGTH = 256 #limit specific to model
+    MAX_BATCH_ITEMS = 256 #cap for token-budget batches of very short texts
 
 
 
 
-    def __init__(self):
+    def __init__(self, backend: Optional[str] = None, model_id: Optional[str] = None):
         self._lock= threading.Lock() #to prevent race condition, during high cuccurency 
-        self.device = self._get_device() # _get_device() returns hardware name, expecting either cuda, mps or cpu.
 
-        logger.info(f'Loading Embedding Model on {self.device}')
+        #a second instance can serve another model next to the default one (shadow evaluation of a candidate version)
+        if model_id:
+            self.MODEL_ID = model_id
 
-        try:
-            self.model = SentenceTransformer(self.MODEL_ID, device = self.device)
-            self.model.max_seq_length = self.MAX_SEQ_LENGTH
+        #popular queries repeat constantly, caching their vectors skips inference (& the lock) entirely
+        #configurable via QUERY_CACHE_SIZE (0 disables) & QUERY_CACHE_TTL (seconds, 0 = no expiry)
+        self.query_cache = cache_from_env("QUERY_CACHE", default_size=2048, default_ttl=3600)
 
-            actual_dim = self.model.get_sentence_embedding_dimension()
+        #concurrent search queries are coalesced into one encode call instead of N single-item passes
+        #QUERY_BATCH_MAX_WAIT_MS bounds the extra latency a query can pay waiting for company (0 disables batching)
+        self.query_batcher = QueryBatcher(
+            encode_fn=self._encode,
+            max_batch_size=int(os.getenv("QUERY_BATCH_MAX_SIZE", 32)),
+            max_wait_ms=float(os.getenv("QUERY_BATCH_MAX_WAIT_MS", 5))
+        )
+        #generate() packs length-sorted texts into batches of at most EMBED_TOKEN_BUDGET padded tokens (0 = fixed batch_size)
+        #halved for the rest of a generate() call when one of its batches runs out of memory
+        self.token_budget = int(os.getenv("EMBED_TOKEN_BUDGET", 8192))
 
-            if actual_dim != self.EXPECTED_DIM:
-                raise ValueError(f'!Model Dimensions mismatch. Expected {self.EXPECTED_DIM} got {actual_dim}')
-            
-            logger.info(f"Succesfully loaded embedding model: {self.MODEL_ID}")
+        #torch (default) | onnx. onnx runs the exported graph on ONNX Runtime, CPU only, torch is never imported
+        #ONNX_QUANTIZED=true picks the dynamically int8-quantized export, see src/ml/onnx_backend.py
+        self.backend = (backend or os.getenv("INFERENCE_BACKEND", "torch")).lower()
+
+        if self.backend not in ("torch", "onnx"):
+            raise RuntimeError(f'unknown INFERENCE_BACKEND: {self.backend}')
+
+        #weights are loaded on first use (or by load() during API warm-up), importing this module stays cheap:
+        #CLI tools, tests & the pipeline's parent process never pay for torch unless they actually encode
+        self.device: Optional[str] = None
+        self._model = None
+        self._load_lock = threading.Lock()
+
+    @property
+    def model(self):
+        if self._model is None:
+            self.load()
+
+        return self._model
+
+    @property
+    def loaded(self) -> bool:
+        return self._model is not None
+
+    def load(self):
+        """
+        loads the weights once (thread-safe), a no-op afterwards. returns the SentenceTransformer / OnnxEncoder.
+        """
+        with self._load_lock:
+            if self._model is not None:
+                return self._model
+
+            self.device = "cpu" if self.backend == "onnx" else self._get_device() # _get_device() returns hardware name, expecting either cuda, mps or cpu.
+
+            logger.info(f'Loading Embedding Model on {self.device} ({self.backend})')
+
+            try:
+                model = self._load_onnx() if self.backend == "onnx" else self._load_torch()
+
+                actual_dim = model.get_sentence_embedding_dimension()
+
+                if actual_dim != self.EXPECTED_DIM:
+                    raise ValueError(f'!Model Dimensions mismatch. Expected {self.EXPECTED_DIM} got {actual_dim}')
+
+                logger.info(f"Succesfully loaded embedding model: {self.MODEL_ID}")
+
+            except Exception as e:
+                logger.error(f'failed to load embedding model{e}')
+                raise  #should change to raise from raise e
 
-        except Exception as e:
-            logger.error(f'failed to load embedding model{e}')
-            raise  #should change to raise from raise e
+            self._model = model
+            return model
+
+    def local_weights_dir(self) -> str:
+        """
+        where `python -m src.ml.embeddings download` bakes this model's weights (MODEL_CACHE_DIR/<model id>).
+        """
+        return os.path.join(MODEL_CACHE_DIR, self.MODEL_ID.replace("/", "__"))
+
+    def _load_torch(self):
+        #pre-baked weights load straight from disk, no hub round-trip. MODEL_OFFLINE=true makes them mandatory,
+        #so a container never blocks its start on a download
+        local = self.local_weights_dir()
+        baked = os.path.isfile(os.path.join(local, "modules.json"))
+
+        if MODEL_OFFLINE:
+            if not baked:
+                raise RuntimeError(f'MODEL_OFFLINE is set but {local} has no weights, run `python -m src.ml.embeddings download`')
+
+            os.environ.setdefault("HF_HUB_OFFLINE", "1")
+            os.environ.setdefault("TRANSFORMERS_OFFLINE", "1")
+
+        from sentence_transformers import SentenceTransformer
+
+        model = SentenceTransformer(local if baked else self.MODEL_ID, device = self.device, revision=None if baked else self.MODEL_REVISION)
+        model.max_seq_length = self.MAX_SEQ_LENGTH
+
+        return model
+
+    def _load_onnx(self):
+        from src.ml.onnx_backend import OnnxEncoder
+
+        return OnnxEncoder(
+            model_dir=os.getenv("ONNX_MODEL_DIR", "data/onnx"),
+            quantized=os.getenv("ONNX_QUANTIZED", "false").lower() == "true",
+            max_seq_length=self.MAX_SEQ_LENGTH,
+            intra_op_threads=int(os.getenv("ONNX_INTRA_OP_THREADS", 0))
+        )
         
     def _get_device(self)->str:
         """
         determines the best available hardware to run embedding model . PRIORITY: NVIDIA Cuda > MPS (Apple Silicon) > CPU
 
         """
+        import torch
 
         if torch.cuda.is_available(): 
             return "cuda"
@@ -70,10 +178,18 @@ class EmbeddingModel:
         
         return f'Title: {title} | Artist: {artist} | Lyrics: {clean_lyrics}'
 
+    @staticmethod
+    def content_hash(contextual_text: str) -> str:
+        """
+        fingerprint of the model input, stored next to each vector. any edit that changes the text changes the hash.
+        """
+        return hashlib.sha256(contextual_text.encode("utf-8")).hexdigest()
+
     def generate(self, items: List[Dict[str, Any]], batch_size: int = 32)-> np.ndarray:
         """
         batch_size default is 32, however, stating it explicitly as model may alter batch_size during traffic spikes, hard set defautl
         will help protect MPS/CPU memory from cache thrashing, OOM. Also prevent latency  & throughput drops.
+        with a token budget (EMBED_TOKEN_BUDGET, default) batches are sized by tokens instead, see _encode_bucketed.
         """
 
         #creating structered string
@@ -86,9 +202,77 @@ class EmbeddingModel:
                 )
                 for item in items
         ]
+
+        if self.token_budget > 0:
+            return self._encode_bucketed(text_batch)
+
+        return self._encode(text_batch, batch_size=batch_size)
+
+    def _token_lengths(self, text_batch: List[str]) -> np.ndarray:
+        """
+        real token counts (special tokens included, capped at MAX_SEQ_LENGTH), from the backend's fast tokenizer.
+        """
+        if self.backend == "onnx":
+            return self.model.token_lengths(text_batch)
+
+        encoded = self.model.tokenizer(text_batch, add_special_tokens=True, truncation=True, max_length=self.MAX_SEQ_LENGTH)
+        return np.array([len(ids) for ids in encoded["input_ids"]])
+
+    def _encode_bucketed(self, text_batch: List[str]) -> np.ndarray:
+        """
+        length-bucketed encoding: texts are sorted by token count, so each batch pads to similar lengths instead of
+        every title padding up to the longest lyric, & batches are filled up to token_budget padded tokens
+        (many short texts or few long ones per forward pass). results come back in input order.
+        an out-of-memory batch is retried at half the budget, the lowered budget only lasts for this call.
+        """
+        if not text_batch:
+            return np.empty((0, self.EXPECTED_DIM), dtype=np.float32)
+
+        lengths = self._token_lengths(text_batch)
+        order = np.argsort(lengths, kind="stable")
+
+        output = np.empty((len(text_batch), self.EXPECTED_DIM), dtype=np.float32)
+        budget = self.token_budget
+        start = 0
+
+        while start < len(order):
+            #ascending order: the current item is the longest so far, so it sets the padded width of the batch
+            end = start + 1
+            while end < len(order) and end - start < self.MAX_BATCH_ITEMS and (end - start + 1) * lengths[order[end]] <= budget:
+                end += 1
+
+            batch_idx = order[start:end]
+
+            try:
+                output[batch_idx] = self._encode([text_batch[i] for i in batch_idx], batch_size=len(batch_idx))
+            except Exception as e: #ONNX Runtime's errors aren't RuntimeErrors
+                if not _is_out_of_memory(e) or end - start == 1 or budget <= self.MAX_SEQ_LENGTH:
+                    raise
+
+                #adapt to the memory actually available, the same batch is retried at half the budget.
+                #local to this call: one oversized request doesn't shrink the batches of every later one
+                budget = max(self.MAX_SEQ_LENGTH, budget // 2)
+                logger.warning(f'batch of {end - start} texts ran out of memory, token budget lowered to {budget} for this call')
+
+                if self.device == "cuda":
+                    import torch
+                    torch.cuda.empty_cache()
+                continue
+
+            start = end
+
+        return output
+
+    def _encode(self, text_batch: List[str], batch_size: int = 32) -> np.ndarray:
+        """
+        single entry point into model.encode, shared by generate() & the query batcher.
+        self.model is a SentenceTransformer or an OnnxEncoder, both expose the same encode().
+        """
         #ensuring isolation, no concurrent encoding
         #normalized since we are using dot product over cosine similarity (faster in postgres)
+        t0 = time.perf_counter()
         with self._lock:
+            t1 = time.perf_counter()
             embeddings=self.model.encode(
                 text_batch, 
                 batch_size=batch_size, 
@@ -96,22 +280,73 @@ class EmbeddingModel:
                 show_progress_bar = False,
                 convert_to_numpy= True
             )
+            EMBED_INFERENCE_SECONDS.observe(time.perf_counter() - t1)
+        EMBED_LOCK_WAIT_SECONDS.observe(t1 - t0)
         return embeddings #I will consider changing this to .astype(np.float32) for extra precaution as postgress will reject 64 bit
     
+    def _query_cache_key(self, query: str) -> tuple:
+        """
+        normalized query text + pinned model identity. MiniLM's tokenizer is uncased & splits on whitespace,
+        so lower-casing & collapsing whitespace maps to the same vector while raising the hit rate.
+        """
+        normalized = re.sub(r"\s+", " ", query).strip().lower()
+
+        return (normalized, self.MODEL_ID, self.MODEL_REVISION)
+
     def embed_query(self, query: str) -> np.ndarray:
         """
         this is a helper function for the search microservice. Isoloting embedding for api service layer & ML layer (generate function)
         """
-        batch_input = [{'title':"", 'artist':"", 'lyrics': query}] #title & artist can be unknown in the search query, the user can choose not to mention.
+        key = self._query_cache_key(query)
 
-        return self.generate(batch_input)[0]
-    
-embedding_model = EmbeddingModel()
-        
+        cached = self.query_cache.get(key)
+        if cached is not None:
+            return cached
 
+        #title & artist can be unknown in the search query, the user can choose not to mention.
+        text = self._create_contextual_text(title="", artist="", lyrics=query)
 
+        vector = self.query_batcher.submit(text)
+        vector.setflags(write=False) #shared between callers via the cache, guard against in-place edits
 
-    
+        self.query_cache.set(key, vector)
+
+        return vector
+
+
+    def embed_queries(self, queries: List[str]) -> np.ndarray:
+        """
+        bulk counterpart of embed_query for batch search: cached vectors are reused & all misses are encoded in ONE call.
+        returns an (n, dim) array in input order.
+        """
+        keys = [self._query_cache_key(q) for q in queries]
+        vectors: List[Optional[np.ndarray]] = [self.query_cache.get(k) for k in keys]
+
+        missing = [i for i, v in enumerate(vectors) if v is None]
+
+        if missing:
+            texts = [self._create_contextual_text(title="", artist="", lyrics=queries[i]) for i in missing]
+            encoded = self._encode(texts, batch_size=32)
+
+            for j, i in enumerate(missing):
+                vector = encoded[j]
+                vector.setflags(write=False)
+                self.query_cache.set(keys[i], vector)
+                vectors[i] = vector
 
+        return np.vstack(vectors)
     
+embedding_model = EmbeddingModel()
+
+if __name__ == "__main__":
+    import sys
+
+    #python -m src.ml.embeddings download -> bakes the pinned weights into MODEL_CACHE_DIR (e.g. in the image build)
+    if sys.argv[1:2] != ["download"]:
+        print("usage: python -m src.ml.embeddings download")
+        sys.exit(1)
+
+    from sentence_transformers import SentenceTransformer
 
+    SentenceTransformer(EmbeddingModel.MODEL_ID, device="cpu", revision=EmbeddingModel.MODEL_REVISION).save(embedding_model.local_weights_dir())
+    print(f'saved {EmbeddingModel.MODEL_ID} to {embedding_model.local_weights_dir()}')
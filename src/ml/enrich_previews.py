@@ -0,0 +1,234 @@
+import os
+import re
+import time
+import random
+import asyncio
+import logging
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+import httpx
+from sqlalchemy import select, update, bindparam
+from src.db.session import SessionLocal
+from src.db.models import Track
+from src.db.generation import bump_generation
+from src.api.services.itunes import ITUNES_BASE_URL, ITUNES_MAX_LIMIT
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 100 # tracks per commit
+
+#iTunes search allows roughly 20 calls/min per IP & answers 403/429 beyond that
+RATE_PER_MIN = float(os.getenv("ENRICH_RATE_PER_MIN", 20))
+CONCURRENCY = int(os.getenv("ENRICH_CONCURRENCY", 4))
+MAX_RETRIES = int(os.getenv("ENRICH_MAX_RETRIES", 5))
+
+RETRYABLE_STATUS = {403, 429, 500, 502, 503, 504}
+MAX_BACKOFF_S = 300.0
+
+class LookupFailed(Exception):
+    pass
+
+class RateLimiter:
+
+    """
+    token bucket shared by all lookup tasks: `rate_per_min` calls per minute on average, bursts of at most `burst`.
+    a Retry-After from upstream pauses the whole bucket, not only the task that got it.
+    """
+
+    def __init__(self, rate_per_min: float, burst: int = 1):
+        self.interval = 60.0 / rate_per_min
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def pause(self, seconds: float):
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+        self.tokens = 0.0
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+
+                if now < self.paused_until:
+                    await asyncio.sleep(self.paused_until - now)
+                    self.updated = time.monotonic()
+                    continue
+
+                self.tokens = min(self.burst, self.tokens + (now - self.updated) / self.interval)
+                self.updated = now
+
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+
+                await asyncio.sleep((1 - self.tokens) * self.interval)
+
+#version suffixes iTunes appends to a title: "(Live)", "[Remastered]", " - 2011 Remaster"
+_VERSION_SUFFIX = re.compile(r"\s*(\([^()]*\)|\[[^\[\]]*\]|\s-\s.*)\s*$")
+
+def _normalize(s: Optional[str]) -> str:
+    return re.sub(r"[^\w]+", " ", (s or "").lower()).strip()
+
+def _base_title(s: Optional[str]) -> str:
+    s = s or ""
+    while _VERSION_SUFFIX.search(s):
+        s = _VERSION_SUFFIX.sub("", s)
+
+    return _normalize(s)
+
+def best_match(results: List[Dict[str, Any]], title: str, artist: str) -> Optional[Dict[str, Any]]:
+    """
+    the iTunes result for (title, artist): same artist & title first, then the same title with a version suffix.
+    None otherwise, another song of the artist is as wrong as another artist's, the proxy fallback is better.
+    """
+    title, artist = _normalize(title), _normalize(artist)
+    by_artist = [r for r in results if r.get("previewUrl") and _normalize(r.get("artistName")) == artist]
+
+    for r in by_artist:
+        if _normalize(r.get("trackName")) == title:
+            return r
+
+    for r in by_artist:
+        if _base_title(r.get("trackName")) == title:
+            return r
+
+    return None
+
+def _retry_after(response: httpx.Response) -> Optional[float]:
+    try:
+        return float(response.headers["Retry-After"])
+    except (KeyError, ValueError):
+        return None
+
+async def lookup(client: httpx.AsyncClient, limiter: RateLimiter, title: str, artist: str, base_url: str = ITUNES_BASE_URL,
+                 max_retries: int = MAX_RETRIES, backoff_s: float = 2.0) -> Tuple[Optional[str], Optional[str]]:
+    """
+    (preview_url, artwork_url) of a track, (None, None) if iTunes has no match.
+    throttling (403/429), 5xx & network errors are retried with exponential backoff + jitter, honouring Retry-After.
+    raises LookupFailed once retries are exhausted.
+    """
+    params = {"term": f'{artist} {title}', "media": "music", "entity": "song", "limit": ITUNES_MAX_LIMIT}
+
+    for attempt in range(max_retries + 1):
+        await limiter.acquire()
+        delay = min(MAX_BACKOFF_S, backoff_s * 2 ** attempt) * (0.5 + random.random())
+
+        try:
+            response = await client.get(f'{base_url.rstrip("/")}/search', params=params, timeout=10.0)
+
+        except httpx.HTTPError as e:
+            logger.warning(f'itunes lookup failed ({e!r}), attempt {attempt + 1}')
+
+        else:
+            if response.status_code == 200:
+                match = best_match(response.json().get("results", []), title, artist)
+                return (match["previewUrl"], match.get("artworkUrl100")) if match else (None, None)
+
+            if response.status_code not in RETRYABLE_STATUS:
+                raise LookupFailed(f'itunes answered {response.status_code}')
+
+            retry_after = _retry_after(response)
+            if retry_after is not None:
+                delay = max(delay, retry_after)
+                limiter.pause(retry_after)
+
+            logger.warning(f'itunes answered {response.status_code}, attempt {attempt + 1}, retrying in {delay:.1f}s')
+
+        if attempt < max_retries:
+            await asyncio.sleep(delay)
+
+    raise LookupFailed(f'gave up after {max_retries + 1} attempts')
+
+def get_tracks_without_preview(db, limit: int = BATCH_SIZE, after_id=None):
+    """
+    keyset scan of tracks never looked up, served by the partial index ix_tracks_preview_pending.
+    """
+    query = select(Track.id, Track.title, Track.artist).where(Track.preview_enriched_at.is_(None))
+
+    if after_id is not None:
+        query = query.where(Track.id > after_id)
+
+    return db.execute(query.order_by(Track.id).limit(limit)).all()
+
+_tracks = Track.__table__
+
+#Core UPDATE, updated_at set to itself: its onupdate would make every enriched track a re-embed candidate
+_store_previews_stmt = (
+    update(_tracks)
+    .where(_tracks.c.id == bindparam("track_id"))
+    .values(preview_url=bindparam("preview_url"), artwork_url=bindparam("artwork_url"),
+            preview_enriched_at=bindparam("preview_enriched_at"), updated_at=_tracks.c.updated_at)
+)
+
+def store_previews(db, rows: List[Dict[str, Any]]):
+    """
+    one executemany UPDATE by primary key (rows carry track_id, preview_url, artwork_url, preview_enriched_at).
+    """
+    if not rows:
+        return
+
+    db.execute(_store_previews_stmt, rows)
+    db.commit()
+
+async def run_enrichment(max_tracks: Optional[int] = None, batch_size: int = BATCH_SIZE, rate_per_min: float = RATE_PER_MIN,
+                         concurrency: int = CONCURRENCY, base_url: str = ITUNES_BASE_URL) -> Dict[str, int]:
+
+    """
+    resolves & stores preview/artwork URLs for every track without them, at most rate_per_min iTunes calls per minute.
+    tracks iTunes has no match for are marked enriched with NULL URLs (clients fall back to /proxy/itunes),
+    tracks whose lookup kept failing stay pending & are retried by the next run.
+    cached search pages carry the preview fields, the cache generation is bumped once at the end of the run.
+    """
+
+    db = SessionLocal()
+    limiter = RateLimiter(rate_per_min, burst=concurrency)
+    slots = asyncio.Semaphore(concurrency)
+    stats = {"found": 0, "not_found": 0, "failed": 0}
+    last_id = None
+
+    async def resolve(track):
+        async with slots:
+            try:
+                preview_url, artwork_url = await lookup(client, limiter, track.title, track.artist, base_url)
+            except LookupFailed as e:
+                logger.warning(f'no preview for track {track.id}: {e}')
+                stats["failed"] += 1
+                return None
+
+        stats["found" if preview_url else "not_found"] += 1
+        return {"track_id": track.id, "preview_url": preview_url, "artwork_url": artwork_url, "preview_enriched_at": datetime.now(timezone.utc)}
+
+    try:
+        async with httpx.AsyncClient() as client:
+            while max_tracks is None or sum(stats.values()) < max_tracks:
+                n = batch_size if max_tracks is None else min(batch_size, max_tracks - sum(stats.values()))
+                tracks = get_tracks_without_preview(db, n, after_id=last_id)
+                db.rollback() #no snapshot held open while waiting on the rate limit
+
+                if not tracks:
+                    break
+
+                last_id = tracks[-1].id
+                rows = await asyncio.gather(*[resolve(track) for track in tracks])
+                store_previews(db, [row for row in rows if row is not None])
+
+                print(f'enriched {sum(stats.values())} tracks: {stats}')
+
+        #one invalidation per run, not per batch: cached pages would otherwise be thrown away every few seconds
+        if stats["found"]:
+            bump_generation(db)
+            db.commit()
+
+    finally:
+        db.close()
+
+    return stats
+
+if __name__ == "__main__":
+    import sys
+
+    #python -m src.ml.enrich_previews [max_tracks]
+    asyncio.run(run_enrichment(int(sys.argv[1]) if len(sys.argv) > 1 else None))
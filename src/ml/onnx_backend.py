@@ -0,0 +1,140 @@
+import os
+import time
+import logging
+from typing import List
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+MODEL_FILE = "model.onnx"
+INT8_MODEL_FILE = "model.int8.onnx"
+TOKENIZER_FILE = "tokenizer.json"
+
+class OnnxEncoder:
+
+    """
+    CPU inference for the sentence-transformer through ONNX Runtime, no torch import at serving time.
+    reproduces the all-MiniLM-L6-v2 pipeline: wordpiece tokenizer -> transformer -> mean pooling -> L2 normalize.
+    encode() mirrors SentenceTransformer.encode, so EmbeddingModel can swap one for the other.
+    """
+
+    def __init__(self, model_dir: str, quantized: bool = False, max_seq_length: int = 256, intra_op_threads: int = 0):
+        #optional dependencies, only needed when INFERENCE_BACKEND=onnx
+        try:
+            import onnxruntime as ort
+            from tokenizers import Tokenizer
+        except ImportError as e:
+            raise RuntimeError("INFERENCE_BACKEND=onnx requires the onnxruntime & tokenizers packages") from e
+
+        model_path = os.path.join(model_dir, INT8_MODEL_FILE if quantized else MODEL_FILE)
+        if not os.path.exists(model_path):
+            raise RuntimeError(f'{model_path} not found, export it first: python -m src.ml.onnx_backend{" --int8" if quantized else ""}')
+
+        self.tokenizer = Tokenizer.from_file(os.path.join(model_dir, TOKENIZER_FILE))
+        self.tokenizer.enable_truncation(max_length=max_seq_length)
+        self.tokenizer.enable_padding(pad_id=self.tokenizer.token_to_id("[PAD]") or 0, pad_token="[PAD]")
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if intra_op_threads:
+            options.intra_op_num_threads = intra_op_threads
+
+        self.session = ort.InferenceSession(model_path, sess_options=options, providers=["CPUExecutionProvider"])
+        self.input_names = {i.name for i in self.session.get_inputs()}
+        self.dim = self.session.get_outputs()[0].shape[-1]
+
+        logger.info(f'loaded onnx model {model_path}')
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.dim
+
+    def token_lengths(self, sentences: List[str]) -> np.ndarray:
+        #attention mask sums, padding (to the longest in the call) is not counted
+        return np.array([sum(e.attention_mask) for e in self.tokenizer.encode_batch(sentences)])
+
+    def _encode_batch(self, texts: List[str], normalize: bool) -> np.ndarray:
+        encodings = self.tokenizer.encode_batch(texts)
+
+        input_ids = np.array([e.ids for e in encodings], dtype=np.int64)
+        attention_mask = np.array([e.attention_mask for e in encodings], dtype=np.int64)
+
+        feeds = {"input_ids": input_ids, "attention_mask": attention_mask}
+        if "token_type_ids" in self.input_names:
+            feeds["token_type_ids"] = np.zeros_like(input_ids)
+
+        token_embeddings = self.session.run(None, feeds)[0] #(batch, seq, dim)
+
+        #mean pooling over real tokens only, padding must not dilute the sentence vector
+        mask = attention_mask[:, :, None].astype(np.float32)
+        pooled = (token_embeddings * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+
+        if normalize:
+            pooled /= np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+
+        return pooled.astype(np.float32)
+
+    def encode(self, sentences: List[str], batch_size: int = 32, normalize_embeddings: bool = True,
+               show_progress_bar: bool = False, convert_to_numpy: bool = True) -> np.ndarray:
+
+        if not sentences:
+            return np.empty((0, self.dim), dtype=np.float32)
+
+        return np.vstack([
+            self._encode_batch(sentences[i:i + batch_size], normalize_embeddings)
+            for i in range(0, len(sentences), batch_size)
+        ])
+
+def export_onnx(model_id: str, out_dir: str, quantize: bool = False, opset: int = 14) -> str:
+    """
+    one-off export of the huggingface transformer (torch needed here only) + its fast tokenizer into out_dir.
+    with quantize=True the fp32 graph is additionally dynamically quantized to int8 weights (model.int8.onnx).
+    """
+    import torch
+    from transformers import AutoModel, AutoTokenizer
+
+    os.makedirs(out_dir, exist_ok=True)
+    hf_id = model_id if "/" in model_id else f'sentence-transformers/{model_id}'
+
+    tokenizer = AutoTokenizer.from_pretrained(hf_id)
+    model = AutoModel.from_pretrained(hf_id).eval()
+
+    tokenizer.save_pretrained(out_dir) #writes tokenizer.json, read by OnnxEncoder without transformers
+
+    dummy = tokenizer(["export sample"], return_tensors="pt")
+    input_names = ["input_ids", "attention_mask", "token_type_ids"]
+    dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names}
+    dynamic_axes["last_hidden_state"] = {0: "batch", 1: "sequence"}
+
+    fp32_path = os.path.join(out_dir, MODEL_FILE)
+
+    with torch.no_grad():
+        torch.onnx.export(
+            model,
+            (dummy["input_ids"], dummy["attention_mask"], dummy["token_type_ids"]),
+            fp32_path,
+            input_names=input_names,
+            output_names=["last_hidden_state"],
+            dynamic_axes=dynamic_axes,
+            opset_version=opset,
+        )
+
+    if not quantize:
+        return fp32_path
+
+    from onnxruntime.quantization import quantize_dynamic, QuantType
+
+    int8_path = os.path.join(out_dir, INT8_MODEL_FILE)
+    quantize_dynamic(fp32_path, int8_path, weight_type=QuantType.QInt8)
+
+    return int8_path
+
+if __name__ == "__main__":
+    import sys
+
+    model_id = os.getenv("ONNX_EXPORT_MODEL_ID", "all-MiniLM-L6-v2")
+    out_dir = os.getenv("ONNX_MODEL_DIR", "data/onnx")
+    start_time = time.time()
+
+    print(f'exporting {model_id} to {out_dir}.....')
+    path = export_onnx(model_id, out_dir, quantize="--int8" in sys.argv[1:])
+    print(f'wrote {path} in {time.time() - start_time:.2f} seconds.')
@@ -1,51 +1,165 @@
+import os
 import time
-from typing import List
-from sqlalchemy.sql import select
+import queue
+import threading
+import multiprocessing
+from typing import List, Dict, Optional, Tuple
+from sqlalchemy.sql import select, exists, update, func
 from sqlalchemy.dialects.postgresql import insert
 from src.db.session import SessionLocal
 from src.ml.embeddings import embedding_model
 from src.db.models import Track, TrackEmbedding
+from src.db.generation import bump_generation
+from src.db.bulk import WRITE_MODE, copy_embeddings
+from src.monitoring.metrics import PIPELINE_METRICS, PIPELINE_METRICS_FILE, record_pipeline_batch, write_textfile
+from src.db.checkpoint import load_checkpoint, save_checkpoint, clear_checkpoint
 
 BATCH_SIZE = 200 # number of rows
 
-def get_tracks_without_embedding(db, limit: int = BATCH_SIZE):
-    subquery = select(TrackEmbedding.track_id).where(
-        TrackEmbedding.model_version == embedding_model.MODEL_ID
+def get_tracks_without_embedding(db, limit: int = BATCH_SIZE, after_id=None, model_version: Optional[str] = None, up_to_id=None):
+    """
+    delta scan: the next `limit` tracks (in id order, after `after_id`, at most `up_to_id`) without an embedding for model_version.
+    NOT EXISTS is planned as an anti-join probing the (track_id, model_version) unique index, & the keyset
+    predicate starts each batch where the previous one ended instead of re-walking already embedded rows,
+    so per-batch cost stays flat over the whole catalog. only the columns _create_contextual_text needs are
+    projected, rows expose .id / .title / .artist / .lyrics.
+    """
+    embedded = exists().where(
+        TrackEmbedding.track_id == Track.id,
+        TrackEmbedding.model_version == (model_version or embedding_model.MODEL_ID)
     )
 
-    query = select(Track).where(Track.id.not_in(subquery)).limit(limit)
-    result = db.execute(query)
+    query = select(Track.id, Track.title, Track.artist, Track.lyrics).where(~embedded)
+
+    if after_id is not None:
+        query = query.where(Track.id > after_id)
+
+    if up_to_id is not None:
+        query = query.where(Track.id <= up_to_id)
+
+    result = db.execute(query.order_by(Track.id).limit(limit))
     
-    return result.scalars().all() # returns list of sql alchemy orm objects
+    return result.all()
+
+def scan_batches(db, batch_size: int = BATCH_SIZE, model_version: Optional[str] = None):
+    """
+    yields delta-scan batches, resuming after the persisted checkpoint.
+    a resumed scan wraps around once, tracks inserted behind the checkpoint since the crash are picked up too.
+    the second pass stops at the checkpoint: batches of the first pass may still be in flight (not committed yet),
+    scanning past it would yield them again as "without embedding" & encode them twice.
+    """
+    model_version = model_version or embedding_model.MODEL_ID
 
-def save_embeddings(db, tracks: List[Track], vectors)-> int:
+    start = load_checkpoint(db, model_version)
+    last_id, up_to_id = start, None
 
+    if start is not None:
+        print(f'resuming {model_version} backfill after track {start}')
+
+    while True:
+        tracks = get_tracks_without_embedding(db, batch_size, after_id=last_id, model_version=model_version, up_to_id=up_to_id)
+        db.rollback() #ends the read transaction, so a long backfill holds no snapshot open
+
+        if tracks:
+            last_id = tracks[-1].id
+            yield tracks
+            continue
+
+        if start is None or up_to_id is not None:
+            return
+
+        last_id, up_to_id = None, start
+
+def get_tracks_with_stale_embedding(db, limit: int = BATCH_SIZE, after_id=None, model_version: Optional[str] = None):
     """
-    UPSERTS the generated vectors into the Embeddings table. 
+    candidates for re-embedding: tracks the loader changed after their vector was written (keyset paged like the delta scan).
+    the loader only bumps tracks.updated_at when content differs, so this is proportional to what changed.
+    rows also carry the stored content_hash, a change that doesn't alter the model input (e.g. popularity) is no reason to re-embed.
     """
-    embeddings_data=[]
+    query = (
+        select(Track.id, Track.title, Track.artist, Track.lyrics, TrackEmbedding.content_hash)
+        .join(TrackEmbedding, (TrackEmbedding.track_id == Track.id) & (TrackEmbedding.model_version == (model_version or embedding_model.MODEL_ID)))
+        .where(Track.updated_at.isnot(None), Track.updated_at > func.coalesce(TrackEmbedding.updated_at, TrackEmbedding.created_at))
+    )
 
-    for i, track in enumerate(tracks):
-        embeddings_data.append({
-            "track_id": track.id,
-            "embedding": vectors[i].tolist(),
-            "model_version": embedding_model.MODEL_ID
+    if after_id is not None:
+        query = query.where(Track.id > after_id)
 
-        })
+    return db.execute(query.order_by(Track.id).limit(limit)).all()
 
-    if not embeddings_data:
+def touch_embeddings(db, track_ids: List) -> None:
+    """
+    marks vectors whose model input did not change as current, so the next changed-scan skips them.
+    """
+    db.execute(
+        update(TrackEmbedding)
+        .where(TrackEmbedding.track_id.in_(track_ids), TrackEmbedding.model_version == embedding_model.MODEL_ID)
+        .values(updated_at=func.now())
+    )
+
+def track_content_hashes(tracks) -> List[str]:
+    return [
+        embedding_model.content_hash(embedding_model._create_contextual_text(title=t.title, artist=t.artist, lyrics=t.lyrics))
+        for t in tracks
+    ]
+
+def save_embeddings(db, tracks: List[Track], vectors, checkpoint=None, replace: bool = False)-> int:
+
+    """
+    UPSERTS the generated vectors into the Embeddings table. 
+    """
+    return save_embedding_rows(db, [track.id for track in tracks], vectors, checkpoint, track_content_hashes(tracks), replace)
+
+def save_embedding_rows(db, track_ids: List, vectors, checkpoint=None, content_hashes: Optional[List[str]] = None,
+                        replace: bool = False)-> int:
+
+    """
+    save_embeddings() keyed on bare track ids, used by the staged pipeline's writer (no ORM objects cross processes).
+    `checkpoint` (a track id) is persisted in the same commit, see scan_batches.
+    replace=True overwrites existing vectors (re-embedding changed tracks), otherwise existing ones are kept.
+    WRITE_MODE=copy (default) streams the vectors with binary COPY, see src/db/bulk.py.
+    """
+    if not len(track_ids):
         return 0
 
-    stmt = insert(TrackEmbedding).values(embeddings_data)
+    if WRITE_MODE == "copy":
+        rowcount = copy_embeddings(db, track_ids, vectors, embedding_model.MODEL_ID, content_hashes, replace)
+    else:
+        embeddings_data=[]
 
-    stmt = stmt.on_conflict_do_nothing(
-        index_elements=['track_id', 'model_version']
-    )
+        for i, track_id in enumerate(track_ids):
+            embeddings_data.append({
+                "track_id": track_id,
+                "embedding": vectors[i].tolist(),
+                "model_version": embedding_model.MODEL_ID,
+                "content_hash": content_hashes[i] if content_hashes is not None else None
+
+            })
+
+        stmt = insert(TrackEmbedding).values(embeddings_data)
+
+        if replace:
+            stmt = stmt.on_conflict_do_update(
+                index_elements=['track_id', 'model_version'],
+                set_={"embedding": stmt.excluded.embedding, "content_hash": stmt.excluded.content_hash, "updated_at": func.now()}
+            )
+        else:
+            stmt = stmt.on_conflict_do_nothing(
+                index_elements=['track_id', 'model_version']
+            )
+
+        rowcount = db.execute(stmt).rowcount
+
+    #invalidates cached search results, committed together with the new rows
+    if rowcount:
+        bump_generation(db)
+
+    if checkpoint is not None:
+        save_checkpoint(db, embedding_model.MODEL_ID, checkpoint)
 
-    result = db.execute(stmt)
     db.commit()
 
-    return result.rowcount
+    return rowcount
 
 def run_pipeline():
 
@@ -53,15 +167,10 @@ def run_pipeline():
 
     total_processed =0
 
-    while True:
-        db= SessionLocal()
-        try:
-            #Fetch batch of tracks
-            tracks = get_tracks_without_embedding(db, BATCH_SIZE)
-
-            if not tracks:
-                print("All tracks have been processed, no missing embeddings")
-                break
+    db= SessionLocal()
+    try:
+        #Fetch batches of tracks, resumes from the checkpoint of a crashed run
+        for tracks in scan_batches(db, BATCH_SIZE):
             
             items = [
                
@@ -83,24 +192,368 @@ def run_pipeline():
             t0 = time.time() #start time
             vectors = embedding_model.generate(items, batch_size=32)
             duration = time.time() - t0 
+            record_pipeline_batch("encode", len(tracks), duration)
         
-            #save embeddings to db
-            saved_count = save_embeddings(db, tracks, vectors)
+            #save embeddings to db, together with the checkpoint
+            t1 = time.time()
+            saved_count = save_embeddings(db, tracks, vectors, checkpoint=tracks[-1].id)
+            record_pipeline_batch("write", len(tracks), time.time() - t1)
+            export_pipeline_metrics()
+
             total_processed +=saved_count
             rate = len(tracks)/(duration+0.0001) # adding 0.0001 to avoid division by 0
         
             print(f'Saved {saved_count} vectors. (speed : {rate: .1f} song/sec)  | total saved : {total_processed}')
+
+        clear_checkpoint(db, embedding_model.MODEL_ID)
+        export_pipeline_metrics(force=True)
+        print("All tracks have been processed, no missing embeddings")
         
-        except Exception as e:
-            print(f'pipeline failed {e}')
-            db.rollback()
-            break
+    except Exception as e:
+        print(f'pipeline failed {e}')
+        db.rollback()
     
-        finally:  
-            db.close()
+    finally:  
+        db.close()
+
+def refresh_changed_batch(db, rows) -> Tuple[int, int]:
+    """
+    one batch of get_tracks_with_stale_embedding rows: re-embeds those whose content_hash differs, only touches the rest.
+    returns (re-embedded, unchanged), commits.
+    """
+    hashes = track_content_hashes(rows)
+
+    stale = [(r, h) for r, h in zip(rows, hashes) if r.content_hash != h]
+    unchanged = [r.id for r, h in zip(rows, hashes) if r.content_hash == h]
+
+    if unchanged:
+        touch_embeddings(db, unchanged)
+
+    if not stale:
+        db.commit()
+        return 0, len(unchanged)
+
+    items = [{"title": r.title, "artist": r.artist, "lyrics": r.lyrics} for r, _ in stale]
+    vectors = embedding_model.generate(items, batch_size=32)
+
+    return save_embedding_rows(db, [r.id for r, _ in stale], vectors, None, [h for _, h in stale], replace=True), len(unchanged)
+
+def run_changed_pipeline():
+
+    """
+    nightly refresh: re-embeds only tracks whose contextual text no longer matches the stored content_hash.
+    existing vectors are overwritten in place (same track_id & model_version), cost follows the size of the change.
+    """
+
+    print("starting re-embedding of changed tracks..")
+
+    total_replaced = 0
+    total_unchanged = 0
+    last_id = None
+
+    db= SessionLocal()
+    try:
+        while True:
+            rows = get_tracks_with_stale_embedding(db, BATCH_SIZE, after_id=last_id)
+
+            if not rows:
+                break
+
+            last_id = rows[-1].id
+            replaced, unchanged = refresh_changed_batch(db, rows)
+            total_replaced += replaced
+            total_unchanged += unchanged
+
+            print(f'Re-embedded {replaced} changed tracks. ({unchanged} unchanged) | total re-embedded : {total_replaced}')
+
+        print(f'Changed tracks processed: {total_replaced} re-embedded, {total_unchanged} unchanged.')
+
+    except Exception as e:
+        print(f'pipeline failed {e}')
+        db.rollback()
+
+    finally:
+        db.close()
         
+_last_metrics_export = 0.0
+
+def export_pipeline_metrics(force: bool = False):
+    """
+    rewrites the pipeline's prometheus textfile (re-exported by the API's /api/v1/metrics), at most once a second.
+    """
+    global _last_metrics_export
+
+    if not force and time.time() - _last_metrics_export < 1.0:
+        return
+
+    try:
+        write_textfile(PIPELINE_METRICS_FILE, PIPELINE_METRICS)
+        _last_metrics_export = time.time()
+    except OSError as e:
+        print(f'could not write pipeline metrics: {e}')
+
+class StageStats:
+
+    """
+    rows & busy seconds of one pipeline stage. busy time excludes waiting on queues,
+    so rows/busy_s is what the stage could sustain alone & the lowest one is the bottleneck.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.rows = 0
+        self.busy_s = 0.0
+
+    def add(self, rows: int, seconds: float):
+        self.rows += rows
+        self.busy_s += seconds
+        record_pipeline_batch(self.name, rows, seconds)
+
+    def report(self) -> Dict[str, float]:
+        return {
+            "stage": self.name,
+            "rows": self.rows,
+            "busy_s": round(self.busy_s, 2),
+            "rows_per_s": round(self.rows / self.busy_s, 1) if self.busy_s else 0.0
+        }
+
+def _put(q, item, failed: threading.Event):
+    #bounded queues block when downstream is slow (backpressure), but a failed stage must not leave us stuck
+    while not failed.is_set():
+        try:
+            q.put(item, timeout=0.5)
+            return
+        except queue.Full:
+            continue
+
+def _get(q, failed: threading.Event):
+    while not failed.is_set():
+        try:
+            return q.get(timeout=0.5)
+        except queue.Empty:
+            continue
+
+    raise RuntimeError("pipeline aborted")
+
+def _reader(batches: queue.Queue, batch_size: int, stats: StageStats, failed: threading.Event):
+    db = SessionLocal()
+    scan = scan_batches(db, batch_size)
+    seq = 0
+
+    try:
+        while True:
+            t0 = time.perf_counter()
+            tracks = next(scan, None)
+            stats.add(len(tracks or []), time.perf_counter() - t0)
+
+            if not tracks:
+                break
+
+            _put(batches, (seq, tracks), failed)
+            seq += 1
+
+    finally:
+        _put(batches, None, failed)
+        db.close()
+
+def _prepare(batches: queue.Queue, texts, n_encoders: int, stats: StageStats, failed: threading.Event):
+    try:
+        while True:
+            batch = _get(batches, failed)
+
+            if batch is None:
+                break
+
+            seq, rows = batch
+
+            t0 = time.perf_counter()
+            batch_texts = [embedding_model._create_contextual_text(title=r.title, artist=r.artist, lyrics=r.lyrics) for r in rows]
+            payload = (
+                seq,
+                [r.id for r in rows],
+                [embedding_model.content_hash(t) for t in batch_texts],
+                batch_texts
+            )
+            stats.add(len(rows), time.perf_counter() - t0)
+
+            _put(texts, payload, failed)
+
+    finally:
+        for _ in range(n_encoders):
+            _put(texts, None, failed)
+
+def _encoder_worker(texts, vectors, threads: int):
+    """
+    encode stage, one process per worker so inference uses every core instead of one GIL-bound loop.
+    each process loads its own model, the thread count is split between workers to avoid oversubscription.
+    """
+    os.environ["OMP_NUM_THREADS"] = str(threads)
+    os.environ["ONNX_INTRA_OP_THREADS"] = str(threads)
+
+    #built here, after the thread env is set (the onnx session reads it when loading), never the module-level
+    #singleton: whatever importing this module pulled in during unpickling, this process encodes with its own model
+    from src.ml.embeddings import EmbeddingModel
+
+    model = EmbeddingModel()
+    model.load()
+
+    if model.backend == "torch":
+        import torch
+        torch.set_num_threads(threads)
+
+    stats = StageStats("encode")
+
+    while True:
+        payload = texts.get()
+
+        if payload is None:
+            break
+
+        seq, track_ids, hashes, batch = payload
+
+        t0 = time.perf_counter()
+        encoded = (model._encode_bucketed(batch) if model.token_budget > 0 else model._encode(batch, batch_size=32)).astype("float32")
+        encode_s = time.perf_counter() - t0
+        stats.add(len(batch), encode_s)
+
+        vectors.put((seq, track_ids, hashes, encoded, encode_s))
+
+    vectors.put(("done", None, None, stats.report(), 0.0))
+
+def run_parallel_pipeline(encoder_workers: Optional[int] = None, queue_size: int = 4, batch_size: int = BATCH_SIZE) -> List[Dict[str, float]]:
+
+    """
+    staged producer/consumer variant of run_pipeline for backfills:
+    reader (checkpointed delta scan) -> prep (contextual text) -> N encoder processes -> writer (insert + commit)
+    fetching, inference & writes overlap, bounded queues keep memory flat when one stage is slower than the others.
+    returns a throughput report per stage.
+    """
+
+    encoder_workers = encoder_workers or max(1, (os.cpu_count() or 2) - 1) #one core left for reader/prep/writer
+    threads = max(1, (os.cpu_count() or 1) // encoder_workers)
+
+    ctx = multiprocessing.get_context("spawn") #fork & torch/CUDA state don't mix
+    texts = ctx.Queue(maxsize=queue_size * encoder_workers)
+    vectors = ctx.Queue(maxsize=queue_size * encoder_workers)
+    batches = queue.Queue(maxsize=queue_size)
+
+    failed = threading.Event()
+    read_stats, prep_stats, write_stats = StageStats("read"), StageStats("prep"), StageStats("write")
+
+    def guarded(fn, *args):
+        try:
+            fn(*args)
+        except Exception as e:
+            print(f'pipeline stage failed {e}')
+            failed.set()
+
+    workers = [ctx.Process(target=_encoder_worker, args=(texts, vectors, threads), daemon=True) for _ in range(encoder_workers)]
+    for w in workers:
+        w.start()
+
+    stages = [
+        threading.Thread(target=guarded, args=(_reader, batches, batch_size, read_stats, failed), daemon=True),
+        threading.Thread(target=guarded, args=(_prepare, batches, texts, encoder_workers, prep_stats, failed), daemon=True),
+    ]
+    for t in stages:
+        t.start()
+
+    print(f'starting staged embedding pipeline: {encoder_workers} encoder processes x {threads} threads..')
+
+    encode_reports = []
+    batch_ends = {} #seq -> last track id, batches finish out of order across encoder processes
+    next_seq = 0
+    db = SessionLocal()
+    t_start = time.time()
+
+    try:
+        #writer runs on this thread, it is the only stage touching track_embeddings
+        while len(encode_reports) < encoder_workers:
+            try:
+                seq, track_ids, hashes, payload, encode_s = vectors.get(timeout=1)
+            except queue.Empty:
+                if failed.is_set() or any(w.exitcode not in (None, 0) for w in workers):
+                    raise RuntimeError("an upstream stage died, aborting")
+                continue
+
+            if seq == "done":
+                encode_reports.append(payload)
+                continue
+
+            #encoder processes have their own metric registries, their per-batch time rides along with the vectors
+            record_pipeline_batch("encode", len(track_ids), encode_s)
+
+            #the checkpoint only advances over a gap-free prefix of batches, a crash never skips an unwritten one
+            batch_ends[seq] = track_ids[-1]
+            checkpoint = None
+            while next_seq in batch_ends:
+                checkpoint = batch_ends.pop(next_seq)
+                next_seq += 1
+
+            t0 = time.perf_counter()
+            saved_count = save_embedding_rows(db, track_ids, payload, checkpoint, hashes)
+            write_stats.add(len(track_ids), time.perf_counter() - t0)
+
+            elapsed = time.time() - t_start
+            print(f'Saved {saved_count} vectors. (speed : {write_stats.rows / (elapsed + 0.0001): .1f} song/sec)  | total saved : {write_stats.rows}')
+            export_pipeline_metrics()
+
+        if failed.is_set():
+            raise RuntimeError("an upstream stage failed, aborting")
+
+        clear_checkpoint(db, embedding_model.MODEL_ID)
+
+    except Exception as e:
+        print(f'pipeline failed {e}')
+        db.rollback()
+        failed.set()
+        raise
+
+    finally:
+        db.close()
+        for w in workers:
+            w.join(timeout=5)
+            if w.is_alive():
+                w.terminate()
+
+    #encode throughput is the sum over processes, busy time the mean (they run side by side)
+    encode = {
+        "stage": "encode",
+        "rows": sum(r["rows"] for r in encode_reports),
+        "busy_s": round(sum(r["busy_s"] for r in encode_reports) / len(encode_reports), 2),
+        "rows_per_s": round(sum(r["rows_per_s"] for r in encode_reports), 1),
+        "workers": encoder_workers
+    }
+
+    report = [read_stats.report(), prep_stats.report(), encode, write_stats.report()]
+    report.append({"stage": "total", "rows": write_stats.rows, "busy_s": round(time.time() - t_start, 2),
+                   "rows_per_s": round(write_stats.rows / (time.time() - t_start + 0.0001), 1)})
+
+    export_pipeline_metrics(force=True)
+
+    for stage in report:
+        print(stage)
+
+    return report
+
 if __name__ == "__main__":
-    run_pipeline()
+    import sys
+
+    #python -m src.ml.pipeline changed -> re-embed tracks whose content changed since their vector was written
+    if sys.argv[1:2] == ["changed"]:
+        run_changed_pipeline()
+        sys.exit(0)
+
+    #PIPELINE_ENCODER_WORKERS=0 keeps the original sequential loop
+    workers = int(os.getenv("PIPELINE_ENCODER_WORKERS", os.cpu_count() or 1))
+
+    if workers > 0:
+        run_parallel_pipeline(
+            encoder_workers=workers,
+            queue_size=int(os.getenv("PIPELINE_QUEUE_SIZE", 4)),
+        )
+    else:
+        run_pipeline()
 
 
 
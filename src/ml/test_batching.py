@@ -0,0 +1,58 @@
+import threading
+import numpy as np
+from src.ml.batching import QueryBatcher
+
+def test_concurrent_queries_share_encode_calls():
+    print("starting micro-batching test.....")
+
+    calls = []
+
+    def fake_encode(texts):
+        calls.append(len(texts))
+        return np.array([[float(len(t))] for t in texts])
+
+    batcher = QueryBatcher(fake_encode, max_batch_size=16, max_wait_ms=50)
+
+    queries = [f'q{"x" * i}' for i in range(8)]
+    results = {}
+
+    def worker(q):
+        results[q] = batcher.submit(q)
+
+    threads = [threading.Thread(target=worker, args=(q,)) for q in queries]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    #every caller gets its own vector back, in fewer encode calls than queries
+    for q in queries:
+        assert results[q][0] == len(q), f'wrong vector routed to {q}'
+
+    assert sum(calls) == len(queries)
+    assert len(calls) < len(queries), f'expected batching, got call sizes {calls}'
+
+    print(f'8 queries served by {len(calls)} encode calls')
+
+def test_disabled_batcher_encodes_directly():
+    batcher = QueryBatcher(lambda texts: np.ones((len(texts), 2)), max_batch_size=32, max_wait_ms=0)
+
+    assert batcher.submit("hello").shape == (2,)
+    assert batcher._worker is None, "no worker thread when batching is disabled"
+
+def test_encode_errors_reach_callers():
+    def broken_encode(texts):
+        raise RuntimeError("model exploded")
+
+    batcher = QueryBatcher(broken_encode, max_batch_size=4, max_wait_ms=1)
+
+    try:
+        batcher.submit("hello")
+        assert False, "expected the encode error to propagate"
+    except RuntimeError:
+        pass
+
+if __name__ == "__main__":
+    test_concurrent_queries_share_encode_calls()
+    test_disabled_batcher_encodes_directly()
+    test_encode_errors_reach_callers()
@@ -0,0 +1,42 @@
+import time
+from src.ml.cache import LRUCache
+
+def test_lru_eviction_and_counters():
+    print("starting lru cache test.....")
+
+    cache = LRUCache(max_size=2)
+
+    cache.set("a", 1)
+    cache.set("b", 2)
+
+    assert cache.get("a") == 1 #"a" is now most recently used
+    cache.set("c", 3) #should evict "b"
+
+    assert cache.get("b") is None, "least recently used key should be evicted"
+    assert cache.get("c") == 3
+    assert len(cache) == 2
+
+    stats = cache.stats()
+    assert stats["hits"] == 2 and stats["misses"] == 1, f'unexpected counters {stats}'
+
+    print("lru cache passed eviction check!")
+
+def test_ttl_expiry():
+    cache = LRUCache(max_size=10, ttl_seconds=0.05)
+    cache.set("q", "vector")
+
+    assert cache.get("q") == "vector"
+    time.sleep(0.06)
+    assert cache.get("q") is None, "entry should expire after ttl"
+
+def test_disabled_cache():
+    cache = LRUCache(max_size=0)
+    cache.set("q", "vector")
+
+    assert cache.get("q") is None
+    assert len(cache) == 0
+
+if __name__ == "__main__":
+    test_lru_eviction_and_counters()
+    test_ttl_expiry()
+    test_disabled_cache()
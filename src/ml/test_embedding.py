@@ -1,5 +1,5 @@
 import numpy as np
-from src.ml.embeddings import embedding_model
+from src.ml.embeddings import EmbeddingModel, embedding_model
 
 def test_generation():
     print("starting embedding test.....")
@@ -40,7 +40,87 @@ def test_generation():
 
     print("embedding model has passed sanity check!")
 
+class OrtFail(Exception):
+    #ONNX Runtime's pybind errors don't derive from RuntimeError
+    pass
+
+class FakeEncoder:
+    """
+    onnx-shaped stand-in: one token per word, row i of the output carries the text's position in the input.
+    `oom_above` padded tokens per batch raise `oom` instead.
+    """
+
+    def __init__(self, texts, oom_above=None, oom=None):
+        self.index = {t: i for i, t in enumerate(texts)}
+        self.oom_above, self.oom = oom_above, oom
+        self.batches = []
+
+    def token_lengths(self, texts):
+        return np.array([len(t.split()) for t in texts])
+
+    def encode(self, texts, **kwargs):
+        lengths = self.token_lengths(texts)
+        if self.oom_above is not None and len(texts) * lengths.max() > self.oom_above:
+            raise self.oom
+
+        self.batches.append(lengths)
+        out = np.zeros((len(texts), EmbeddingModel.EXPECTED_DIM), dtype=np.float32)
+        out[:, 0] = [self.index[t] for t in texts]
+        return out
+
+def _fake_model(texts, token_budget, **fake):
+    model = EmbeddingModel(backend="onnx")
+    model.token_budget = token_budget
+    model._model = FakeEncoder(texts, **fake)
+    return model
+
+def _texts(n=60, seed=0):
+    lengths = np.random.default_rng(seed).integers(1, 64, size=n)
+    return [" ".join(["w"] * int(k)) + f' #{i}' for i, k in enumerate(lengths)]
+
+def test_bucketed_encoding_restores_input_order():
+    print("starting bucketed encoding test.....")
+
+    texts = _texts()
+    model = _fake_model(texts, token_budget=512)
+
+    vectors = model._encode_bucketed(texts)
+
+    assert np.array_equal(vectors[:, 0], np.arange(len(texts))), "vectors scattered back to the wrong rows"
+    assert len(model.model.batches) > 1
+
+    #sorted by length across batches, each batch within the padded-token budget
+    flat = np.concatenate(model.model.batches)
+    assert np.all(np.diff(flat) >= 0)
+    assert all(len(b) * b.max() <= 512 for b in model.model.batches)
+
+    print("bucketed encoding passed!")
+
+def test_out_of_memory_halves_budget_for_the_call_only():
+    texts = _texts()
+
+    for oom in (RuntimeError("DefaultCPUAllocator: can't allocate memory: you tried to allocate 1073741824 bytes"),
+                OrtFail("Failed to allocate memory for requested buffer of size 1073741824"),
+                RuntimeError("CUDA out of memory. Tried to allocate 2.00 GiB")):
+        model = _fake_model(texts, token_budget=1024, oom_above=300, oom=oom)
+
+        vectors = model._encode_bucketed(texts)
+
+        assert np.array_equal(vectors[:, 0], np.arange(len(texts)))
+        assert all(len(b) * b.max() <= 300 for b in model.model.batches)
+        assert model.token_budget == 1024, "shared budget should survive the call"
+
+    #anything else is not retried
+    model = _fake_model(texts, token_budget=1024, oom_above=300, oom=OrtFail("Invalid input name: input_ids"))
+    try:
+        model._encode_bucketed(texts)
+        assert False, "non-memory errors should propagate"
+    except OrtFail:
+        pass
+
 if __name__ == "__main__":
     test_generation()
+    test_bucketed_encoding_restores_input_order()
+    test_out_of_memory_halves_budget_for_the_call_only()
 
 
@@ -0,0 +1,93 @@
+import json
+import asyncio
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import httpx
+from sqlalchemy import update
+from sqlalchemy.dialects import postgresql
+from src.db.models import Track
+from src.ml.enrich_previews import RateLimiter, best_match, lookup, LookupFailed, _store_previews_stmt
+
+SONG = {"trackName": "Purple Rain", "artistName": "Prince", "previewUrl": "https://audio.example/purple.m4a", "artworkUrl100": "https://art.example/purple.jpg"}
+
+class ThrottlingItunes(BaseHTTPRequestHandler):
+    """
+    answers the first `throttled` requests with 429 + Retry-After: 0, then one matching song.
+    """
+    throttled = 0
+    calls = 0
+
+    def do_GET(self):
+        ThrottlingItunes.calls += 1
+
+        if ThrottlingItunes.calls <= ThrottlingItunes.throttled:
+            self.send_response(429)
+            self.send_header("Retry-After", "0")
+            self.end_headers()
+            return
+
+        body = json.dumps({"resultCount": 1, "results": [SONG]}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+def _lookup(throttled: int, max_retries: int):
+    ThrottlingItunes.throttled, ThrottlingItunes.calls = throttled, 0
+    server = ThreadingHTTPServer(("127.0.0.1", 0), ThrottlingItunes)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    async def run():
+        async with httpx.AsyncClient() as client:
+            return await lookup(client, RateLimiter(6000, burst=10), "Purple Rain", "Prince",
+                                base_url=f'http://127.0.0.1:{server.server_port}', max_retries=max_retries, backoff_s=0.01)
+
+    try:
+        return asyncio.run(run())
+    finally:
+        server.shutdown()
+
+def test_best_match_prefers_title_and_artist():
+    print("starting preview matching test.....")
+
+    live = {**SONG, "trackName": "Purple Rain (Live)", "previewUrl": "https://audio.example/live.m4a"}
+    remaster = {**SONG, "trackName": "Purple Rain - 2015 Remaster", "previewUrl": "https://audio.example/remaster.m4a"}
+    other = {**SONG, "artistName": "Someone Else", "previewUrl": "https://audio.example/cover.m4a"}
+    another_song = {**SONG, "trackName": "When Doves Cry", "previewUrl": "https://audio.example/doves.m4a"}
+    longer_title = {**SONG, "trackName": "Purple Rainbow", "previewUrl": "https://audio.example/rainbow.m4a"}
+
+    assert best_match([other, live, SONG], "purple rain", "PRINCE") is SONG
+    assert best_match([other, another_song, live], "Purple Rain", "Prince") is live, "a version suffix is the same song"
+    assert best_match([remaster], "Purple Rain", "Prince") is remaster
+    assert best_match([other], "Purple Rain", "Prince") is None, "never another artist's preview"
+    assert best_match([another_song, longer_title], "Purple Rain", "Prince") is None, "nor another song of the artist"
+
+    print("preview matching passed!")
+
+def test_store_previews_keeps_updated_at():
+    #updated_at drives the re-embed-changed scan, a preview is no content change
+    sql = str(_store_previews_stmt.compile(dialect=postgresql.dialect()))
+    assert "updated_at=tracks.updated_at" in sql, sql
+    assert "now()" not in sql, sql
+
+    #what an ORM bulk update would have rendered
+    assert "updated_at=now()" in str(update(Track).compile(dialect=postgresql.dialect(), column_keys=["id", "preview_url"]))
+
+def test_lookup_retries_throttled_requests():
+    assert _lookup(throttled=2, max_retries=3) == (SONG["previewUrl"], SONG["artworkUrl100"])
+    assert ThrottlingItunes.calls == 3
+
+    try:
+        _lookup(throttled=5, max_retries=1)
+        assert False, "should give up after max_retries"
+    except LookupFailed:
+        assert ThrottlingItunes.calls == 2
+
+if __name__ == "__main__":
+    test_best_match_prefers_title_and_artist()
+    test_store_previews_keeps_updated_at()
+    test_lookup_retries_throttled_requests()
@@ -0,0 +1,42 @@
+import tempfile
+import numpy as np
+from src.ml.embeddings import EmbeddingModel
+from src.ml.onnx_backend import OnnxEncoder, export_onnx
+
+#minimum per-text cosine similarity against the pytorch vectors
+FP32_THRESHOLD = 0.999
+INT8_THRESHOLD = 0.98
+
+def test_onnx_parity():
+    print("starting onnx parity test.....")
+
+    torch_model = EmbeddingModel(backend="torch")
+
+    texts = [
+        torch_model._create_contextual_text(title="Test Song", artist="Test Artist", lyrics="This is happy song about coding"),
+        torch_model._create_contextual_text(title="Sad Song", artist="Blue Artist", lyrics="This is sad song about debugging " * 60),
+        torch_model._create_contextual_text(title="", artist="", lyrics="songs about driving at night"),
+    ]
+
+    expected = torch_model._encode(texts, batch_size=2)
+
+    with tempfile.TemporaryDirectory() as model_dir:
+        export_onnx(EmbeddingModel.MODEL_ID, model_dir, quantize=True) #writes the fp32 & int8 graphs
+
+        for quantized, threshold in ((False, FP32_THRESHOLD), (True, INT8_THRESHOLD)):
+            encoder = OnnxEncoder(model_dir, quantized=quantized, max_seq_length=EmbeddingModel.MAX_SEQ_LENGTH)
+            vectors = encoder.encode(texts, batch_size=2) #mixed lengths in one batch, exercises padding
+
+            assert vectors.shape == expected.shape
+            assert vectors.dtype == np.float32
+
+            #both sides are L2-normalized, so the row-wise dot product is the cosine similarity
+            similarity = (vectors * expected).sum(axis=1)
+            print(f'{"int8" if quantized else "fp32"} cosine vs torch: min {similarity.min():.5f}')
+
+            assert similarity.min() >= threshold, f'onnx {"int8" if quantized else "fp32"} drifted from torch: {similarity}'
+
+    print("onnx backend has passed parity check!")
+
+if __name__ == "__main__":
+    test_onnx_parity()
@@ -1,5 +1,12 @@
+import uuid
+import numpy as np
+from sqlalchemy import select, delete
 from src.db.session import SessionLocal
-from src.ml.pipeline import get_tracks_without_embedding, save_embeddings
+from src.ml import pipeline
+from src.db.models import Track
+from src.ingestion.loader import DataLoader
+from src.ml.pipeline import (get_tracks_without_embedding, save_embeddings, save_embedding_rows, get_tracks_with_stale_embedding,
+                             track_content_hashes, refresh_changed_batch)
 from src.ml.embeddings import embedding_model
 
 def test_pipeline_integration():
@@ -53,8 +60,75 @@ def test_pipeline_integration():
     finally: 
         db.close()
 
+def _stale_row(db, track_id):
+    #keyset scan starting right before track_id, the first row is the track itself if it's stale
+    rows = get_tracks_with_stale_embedding(db, limit=1, after_id=uuid.UUID(int=track_id.int - 1))
+    return rows[0] if rows and rows[0].id == track_id else None
+
+def test_changed_scan_skips_unchanged_content_hash():
+    print("starting content hash skip test.....")
+
+    db = SessionLocal()
+    track = {"title": f'hash skip test {uuid.uuid4()}', "artist": "Test Artist", "lyrics": "la la", "popularity_score": 0.5}
+
+    try:
+        DataLoader(db).load_valid_tracks([dict(track)])
+        row = db.execute(select(Track.id, Track.title, Track.artist, Track.lyrics).where(Track.title == track["title"])).one()
+        save_embedding_rows(db, [row.id], np.ones((1, embedding_model.EXPECTED_DIM), dtype=np.float32), None, track_content_hashes([row]))
+        assert _stale_row(db, row.id) is None, "a fresh vector is not stale"
+
+        #popularity is not part of the model input: the track is a candidate, but only touched, never re-embedded
+        DataLoader(db).load_valid_tracks([{**track, "popularity_score": 0.9}])
+        stale = _stale_row(db, row.id)
+        assert stale is not None, "updated track should be a re-embed candidate"
+        assert refresh_changed_batch(db, [stale]) == (0, 1)
+        assert _stale_row(db, row.id) is None, "touched vector should drop out of the changed scan"
+
+        #lyrics are: the stored hash no longer matches
+        DataLoader(db).load_valid_tracks([{**track, "lyrics": "la la la"}])
+        stale = _stale_row(db, row.id)
+        assert stale is not None and stale.content_hash != track_content_hashes([stale])[0]
+
+    finally:
+        db.rollback()
+        db.execute(delete(Track).where(Track.title == track["title"])) #cascades to the embedding
+        db.commit()
+        db.close()
+
+    print("content hash skip passed!")
+
+class FakeScanDB:
+    def rollback(self):
+        pass
+
+def test_resumed_scan_stops_at_the_checkpoint():
+    print("starting resumed scan test.....")
+
+    ids = [uuid.UUID(int=i) for i in range(1, 11)]
+    embedded = set(ids[:2]) #committed before the crash, the checkpoint sits at ids[4] (ids[2:5] were in the lost batch)
+
+    def fake_scan(db, limit, after_id=None, model_version=None, up_to_id=None):
+        rows = [t for t in ids if t not in embedded and (after_id is None or t > after_id) and (up_to_id is None or t <= up_to_id)]
+        return [type("Row", (), {"id": t}) for t in rows[:limit]]
+
+    original = (pipeline.get_tracks_without_embedding, pipeline.load_checkpoint)
+    pipeline.get_tracks_without_embedding, pipeline.load_checkpoint = fake_scan, lambda db, version: ids[4]
+
+    try:
+        #nothing yielded gets committed, like batches still in flight in the parallel pipeline
+        yielded = [t.id for batch in pipeline.scan_batches(FakeScanDB(), batch_size=2, model_version="test") for t in batch]
+    finally:
+        pipeline.get_tracks_without_embedding, pipeline.load_checkpoint = original
+
+    #ahead of the checkpoint, then the range behind it, each track exactly once
+    assert yielded == ids[5:] + ids[2:5], yielded
+
+    print("resumed scan passed!")
+
 if __name__ == "__main__":
     test_pipeline_integration()
+    test_changed_scan_skips_unchanged_content_hash()
+    test_resumed_scan_stops_at_the_checkpoint()
 
 
 
@@ -0,0 +1,106 @@
+import os
+import uuid
+import tempfile
+import numpy as np
+from src.ml.vector_index import NumpyVectorIndex, write_index, swap_index
+from src.api.services.retrieval import NumpyBackend
+from src.api.services.search import _page_window, _slice_page
+
+def test_numpy_index_matches_brute_force():
+    print("starting numpy index test.....")
+
+    rng = np.random.default_rng(7)
+    vectors = rng.standard_normal((500, 384)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    track_ids = [uuid.uuid4() for _ in range(500)]
+
+    queries = rng.standard_normal((3, 384)).astype(np.float32)
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+
+    with tempfile.TemporaryDirectory() as index_dir:
+        write_index(index_dir, track_ids, vectors, model_version="test")
+        index = NumpyVectorIndex(index_dir)
+
+        results = index.top_k(queries, limits=[10, 5, 1])
+
+    assert [len(r) for r in results] == [10, 5, 1]
+
+    #exact search: ids & order must equal a full sort of the dot products
+    for q, hits in zip(queries, results):
+        expected = np.argsort(-(vectors @ q))[:len(hits)]
+        assert [h[0] for h in hits] == [track_ids[j] for j in expected], "numpy index disagrees with brute force"
+        assert hits[0][1] >= hits[-1][1]
+
+    print("numpy index passed exact recall check!")
+
+def test_limit_larger_than_catalog():
+    vectors = np.eye(3, 384, dtype=np.float32)
+    track_ids = [uuid.UUID(int=i) for i in range(3)] #trailing null bytes must survive the round-trip
+
+    with tempfile.TemporaryDirectory() as index_dir:
+        write_index(index_dir, track_ids, vectors, model_version="test")
+        hits = NumpyVectorIndex(index_dir).top_k(vectors[:1], limits=[10])[0]
+
+    assert len(hits) == 3
+    assert hits[0][0] == track_ids[0]
+
+def test_top_k_subset_only_scores_given_tracks():
+    rng = np.random.default_rng(3)
+    vectors = rng.standard_normal((100, 384)).astype(np.float32)
+    track_ids = [uuid.uuid4() for _ in range(100)]
+    subset = track_ids[10:30] + [uuid.uuid4()] #unknown ids are ignored
+
+    with tempfile.TemporaryDirectory() as index_dir:
+        write_index(index_dir, track_ids, vectors, model_version="test")
+        hits = NumpyVectorIndex(index_dir).top_k_subset(vectors[0], subset, limit=5)
+
+    expected = 10 + np.argsort(-(vectors[10:30] @ vectors[0]))[:5]
+    assert [h[0] for h in hits] == [track_ids[j] for j in expected]
+
+def test_empty_index_serves_an_empty_first_page():
+    with tempfile.TemporaryDirectory() as index_dir:
+        write_index(index_dir, [], np.empty((0, 384), dtype=np.float32), model_version="test")
+        backend = NumpyBackend(NumpyVectorIndex(index_dir))
+
+    assert backend.max_depth == 0
+
+    window = _page_window(0, 10, backend.max_depth)
+    results = backend.retrieve(None, np.ones((1, 384), dtype=np.float32), [window])[0]
+
+    assert _slice_page(results, 0, 10, window, backend.max_depth) == ([], None)
+
+    try:
+        _page_window(10, 10, backend.max_depth)
+        assert False, "offsets past an empty index should still be rejected"
+    except ValueError:
+        pass
+
+def test_swap_never_leaves_the_index_missing():
+    vectors = np.eye(3, 384, dtype=np.float32)
+    track_ids = [uuid.UUID(int=i) for i in range(3)]
+
+    with tempfile.TemporaryDirectory() as root:
+        index_dir = os.path.join(root, "index")
+        write_index(index_dir, track_ids, vectors, model_version="legacy") #plain directory, pre-symlink layout
+        loaded = NumpyVectorIndex(index_dir)
+
+        for version in ("a", "b", "c"):
+            version_dir = f'{index_dir}.v{version}'
+            write_index(version_dir, track_ids, vectors, model_version=version)
+            swap_index(index_dir, version_dir)
+
+            assert os.path.islink(index_dir)
+            assert NumpyVectorIndex(index_dir).model_version == version
+
+        #current & previous version kept, older ones (the moved-aside legacy one included) removed
+        assert sorted(os.listdir(root)) == ["index", "index.vb", "index.vc"]
+
+        #a reader that loaded before the swaps still serves from its mapping
+        assert loaded.top_k(vectors[:1], limits=[1])[0][0][0] == track_ids[0]
+
+if __name__ == "__main__":
+    test_numpy_index_matches_brute_force()
+    test_limit_larger_than_catalog()
+    test_top_k_subset_only_scores_given_tracks()
+    test_empty_index_serves_an_empty_first_page()
+    test_swap_never_leaves_the_index_missing()
@@ -0,0 +1,210 @@
+import os
+import json
+import time
+import shutil
+import logging
+import uuid
+from typing import List, Tuple, Dict
+import numpy as np
+from sqlalchemy import select, func
+from src.db.models import TrackEmbedding
+
+logger = logging.getLogger(__name__)
+
+MATRIX_FILE = "embeddings.f32"
+IDS_FILE = "track_ids.npy"
+META_FILE = "meta.json"
+
+class NumpyVectorIndex:
+
+    """
+    exact in-process vector index: all track_embeddings of one model_version in a contiguous float32 memory-mapped matrix.
+    vectors are L2-normalized, so top-k by inner product == top-k by cosine similarity, one GEMM + argpartition per batch.
+    at ~57K tracks x 384 dims that is ~88MB, shared between workers through the OS page cache.
+    """
+
+    def __init__(self, index_dir: str):
+        #resolved once: an export swapping index_dir mid-load can't mix files of two versions
+        index_dir = os.path.realpath(index_dir)
+
+        with open(os.path.join(index_dir, META_FILE)) as f:
+            self.meta = json.load(f)
+
+        self.model_version = self.meta["model_version"]
+        self.count = self.meta["count"]
+        self.dim = self.meta["dim"]
+
+        self.track_ids = np.load(os.path.join(index_dir, IDS_FILE)) #(n, 16) uuid bytes
+        if self.count:
+            self.matrix = np.memmap(os.path.join(index_dir, MATRIX_FILE), dtype=np.float32, mode="r", shape=(self.count, self.dim))
+        else:
+            self.matrix = np.empty((0, self.dim), dtype=np.float32) #mmap can't map an empty region
+
+        self._positions = None #track_id -> row, built on first filtered search
+
+        logger.info(f'loaded numpy index: {self.count} vectors ({self.model_version}) from {index_dir}')
+
+    @property
+    def positions(self) -> Dict[uuid.UUID, int]:
+        if self._positions is None:
+            self._positions = {uuid.UUID(bytes=row.tobytes()): i for i, row in enumerate(self.track_ids)}
+
+        return self._positions
+
+    def top_k(self, queries: np.ndarray, limits: List[int]) -> List[List[Tuple[uuid.UUID, float]]]:
+        """
+        exact top-k for a batch of query vectors (n, dim), one matmul for the whole batch.
+        returns per query a list of (track_id, similarity) sorted best first.
+        """
+        if self.count == 0:
+            return [[] for _ in limits] #nothing to score, & dim may be unknown for an empty export
+
+        queries = np.asarray(queries, dtype=np.float32).reshape(-1, self.dim)
+
+        scores = queries @ self.matrix.T #(n_queries, n_tracks)
+
+        results = []
+
+        for i, limit in enumerate(limits):
+            k = min(limit, self.count)
+            row = scores[i]
+
+            #argpartition is O(n) to find the k best, only those k get sorted
+            candidates = np.argpartition(-row, k - 1)[:k]
+            order = candidates[np.argsort(-row[candidates])]
+
+            results.append([(uuid.UUID(bytes=self.track_ids[j].tobytes()), float(row[j])) for j in order])
+
+        return results
+
+    def top_k_subset(self, query: np.ndarray, track_ids: List[uuid.UUID], limit: int) -> List[Tuple[uuid.UUID, float]]:
+        """
+        exact top-k restricted to the given tracks (pre-filtered search), only those rows are scored.
+        ids without a vector in this index are ignored.
+        """
+        rows = np.array([self.positions[t] for t in track_ids if t in self.positions], dtype=np.int64)
+
+        if len(rows) == 0:
+            return []
+
+        scores = self.matrix[rows] @ np.asarray(query, dtype=np.float32).reshape(self.dim)
+        k = min(limit, len(rows))
+
+        candidates = np.argpartition(-scores, k - 1)[:k]
+        order = candidates[np.argsort(-scores[candidates])]
+
+        return [(uuid.UUID(bytes=self.track_ids[rows[j]].tobytes()), float(scores[j])) for j in order]
+
+def _uuid_matrix(track_ids: List[uuid.UUID]) -> np.ndarray:
+    #raw uint8 rather than "S16", numpy strips trailing null bytes from fixed-width byte strings
+    return np.frombuffer(b"".join(t.bytes for t in track_ids), dtype=np.uint8).reshape(-1, 16)
+
+def write_index(index_dir: str, track_ids: List[uuid.UUID], vectors: np.ndarray, model_version: str) -> None:
+    """
+    writes the on-disk layout read by NumpyVectorIndex (used by tests & small exports, export_index streams instead).
+    """
+    os.makedirs(index_dir, exist_ok=True)
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+
+    vectors.tofile(os.path.join(index_dir, MATRIX_FILE))
+    np.save(os.path.join(index_dir, IDS_FILE), _uuid_matrix(track_ids))
+
+    with open(os.path.join(index_dir, META_FILE), "w") as f:
+        json.dump({"model_version": model_version, "count": len(track_ids), "dim": vectors.shape[1] if len(vectors) else 0}, f)
+
+def _versions(index_dir: str) -> List[str]:
+    parent, name = os.path.split(os.path.abspath(index_dir))
+    return sorted(os.path.join(parent, d) for d in os.listdir(parent) if d.startswith(f'{name}.v'))
+
+def swap_index(index_dir: str, version_dir: str) -> None:
+    """
+    points index_dir (a symlink) at version_dir with one atomic rename, so there is never a moment without an index.
+    the previous version stays for readers still loading it, older ones are removed.
+    """
+    if os.path.isdir(index_dir) and not os.path.islink(index_dir):
+        #plain directory from an older export, moved aside once (the rename below can't replace a directory)
+        os.replace(index_dir, f'{index_dir}.v0')
+
+    link = f'{index_dir}.link'
+    if os.path.lexists(link):
+        os.remove(link)
+
+    os.symlink(os.path.basename(version_dir), link)
+    os.replace(link, index_dir)
+
+    for old in _versions(index_dir)[:-2]:
+        if os.path.realpath(old) != os.path.realpath(index_dir):
+            shutil.rmtree(old, ignore_errors=True)
+
+def _export_to(db, tmp_dir: str, model_version: str, dim: int, chunk_size: int, count: int) -> int:
+    #streams at most `count` vectors into tmp_dir, returns how many were written
+    matrix = np.memmap(os.path.join(tmp_dir, MATRIX_FILE), dtype=np.float32, mode="w+", shape=(max(count, 1), dim))
+    ids = np.empty((count, 16), dtype=np.uint8)
+
+    stmt = (
+        select(TrackEmbedding.track_id, TrackEmbedding.embedding)
+        .where(TrackEmbedding.model_version == model_version)
+        .order_by(TrackEmbedding.id)
+        .execution_options(yield_per=chunk_size)
+    )
+
+    n = 0
+    for track_id, embedding in db.execute(stmt):
+        if n >= count:
+            break #rows written after the count, picked up by the next export
+        matrix[n] = embedding
+        ids[n] = np.frombuffer(track_id.bytes, dtype=np.uint8)
+        n += 1
+
+    matrix.flush()
+    del matrix
+
+    if n < count:
+        #rows deleted mid-export, shrink the file to what was actually written
+        with open(os.path.join(tmp_dir, MATRIX_FILE), "r+b") as f:
+            f.truncate(n * dim * 4)
+
+    np.save(os.path.join(tmp_dir, IDS_FILE), ids[:n])
+
+    with open(os.path.join(tmp_dir, META_FILE), "w") as f:
+        json.dump({"model_version": model_version, "count": n, "dim": dim}, f)
+
+    return n
+
+def export_index(db, index_dir: str, model_version: str, dim: int = 384, chunk_size: int = 5000) -> int:
+    """
+    streams every embedding of `model_version` out of postgres into a fresh versioned directory, then swaps it in
+    (see swap_index). readers holding the old mapping keep working, new workers pick up the new files.
+    """
+    count = db.execute(
+        select(func.count()).select_from(TrackEmbedding).where(TrackEmbedding.model_version == model_version)
+    ).scalar()
+
+    tmp_dir = f'{index_dir}.v{time.time_ns()}'
+    os.makedirs(tmp_dir)
+
+    try:
+        n = _export_to(db, tmp_dir, model_version, dim, chunk_size, count)
+    except BaseException:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+
+    swap_index(index_dir, tmp_dir)
+
+    return n
+
+if __name__ == "__main__":
+    from src.db.session import SessionLocal
+    from src.ml.embeddings import EmbeddingModel
+
+    out_dir = os.getenv("NUMPY_INDEX_DIR", "data/index")
+    db = SessionLocal()
+    start_time = time.time()
+
+    try:
+        print(f'exporting {EmbeddingModel.MODEL_ID} embeddings to {out_dir}.....')
+        exported = export_index(db, out_dir, model_version=EmbeddingModel.MODEL_ID, dim=EmbeddingModel.EXPECTED_DIM)
+        print(f'exported {exported} vectors in {time.time() - start_time:.2f} seconds.')
+
+    finally:
+        db.close()
@@ -0,0 +1,195 @@
+import os
+import time
+import bisect
+import threading
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Sequence, Tuple
+
+#METRICS_ENABLED=false turns every observe/inc into a no-op
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+
+#latency buckets in seconds, 0.5ms .. 10s
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+def _format_labels(labelnames: Sequence[str], values: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{k}="{v}"' for k, v in zip(labelnames, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+class _Metric:
+
+    """
+    minimal prometheus-style metric: one series per label-value tuple, a lock per metric.
+    an observation is a dict lookup + a few additions, cheap enough to leave on in production.
+    """
+
+    kind = "untyped"
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self._series: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+
+    def _header(self) -> List[str]:
+        return [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} {self.kind}']
+
+class Counter(_Metric):
+
+    kind = "counter"
+
+    def inc(self, *labels: str, amount: float = 1.0):
+        if not METRICS_ENABLED:
+            return
+
+        with self._lock:
+            self._series[labels] = self._series.get(labels, 0.0) + amount
+
+    def value(self, *labels: str) -> float:
+        with self._lock:
+            return self._series.get(labels, 0.0)
+
+    def render(self) -> List[str]:
+        with self._lock:
+            series = dict(self._series)
+
+        return self._header() + [f'{self.name}{_format_labels(self.labelnames, k)} {v}' for k, v in sorted(series.items())]
+
+class Gauge(_Metric):
+
+    kind = "gauge"
+
+    def set(self, value: float, *labels: str):
+        if not METRICS_ENABLED:
+            return
+
+        with self._lock:
+            self._series[labels] = value
+
+    def render(self) -> List[str]:
+        with self._lock:
+            series = dict(self._series)
+
+        return self._header() + [f'{self.name}{_format_labels(self.labelnames, k)} {v}' for k, v in sorted(series.items())]
+
+class Histogram(_Metric):
+
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value: float, *labels: str):
+        if not METRICS_ENABLED:
+            return
+
+        i = bisect.bisect_left(self.buckets, value) #first bucket with value <= bound, len(buckets) = +Inf only
+
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+
+            series[0][i] += 1
+            series[1] += value
+            series[2] += 1
+
+    @contextmanager
+    def time(self, *labels: str):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - t0, *labels)
+
+    def render(self) -> List[str]:
+        with self._lock:
+            series = {k: (list(v[0]), v[1], v[2]) for k, v in self._series.items()}
+
+        lines = self._header()
+
+        for labels, (counts, total, count) in sorted(series.items()):
+            cumulative = 0
+            for bound, n in zip(self.buckets + (float("inf"),), counts):
+                cumulative += n
+                le = 'le="+Inf"' if bound == float("inf") else f'le="{bound}"'
+                lines.append(f'{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {cumulative}')
+
+            lines.append(f'{self.name}_sum{_format_labels(self.labelnames, labels)} {total}')
+            lines.append(f'{self.name}_count{_format_labels(self.labelnames, labels)} {count}')
+
+        return lines
+
+def render(metrics: Sequence[_Metric]) -> str:
+    """
+    prometheus text exposition format (version 0.0.4)
+    """
+    return "\n".join(line for metric in metrics for line in metric.render()) + "\n"
+
+def write_textfile(path: str, metrics: Sequence[_Metric]) -> None:
+    """
+    batch jobs (the embedding pipeline) don't serve http, they drop their metrics into a file the API re-exports.
+    tmp file + rename, so a scrape never reads a half-written file.
+    """
+    if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, "w") as f:
+        f.write(render(metrics))
+    os.replace(tmp_path, path)
+
+def read_textfile(path: Optional[str]) -> str:
+    if not path or not os.path.exists(path):
+        return ""
+
+    with open(path) as f:
+        return f.read()
+
+#api / search
+SEARCH_STAGE_SECONDS = Histogram(
+    "search_stage_seconds", "search latency per stage (embed, db_checkout, ann, serialize)", ["stage"]
+)
+SEARCH_REQUEST_SECONDS = Histogram(
+    "search_request_seconds", "search handler wall time", ["endpoint"]
+)
+SEARCH_CACHE_HITS = Counter("search_result_cache_hits_total", "search pages served from the result cache")
+
+#embedding model, shared by search & pipeline
+EMBED_LOCK_WAIT_SECONDS = Histogram("embedding_lock_wait_seconds", "time spent waiting for the model lock")
+EMBED_INFERENCE_SECONDS = Histogram("embedding_inference_seconds", "model.encode time per call (lock held)")
+
+#shadow evaluation of a candidate model version, see src/api/services/shadow.py
+SHADOW_OVERLAP = Histogram(
+    "shadow_overlap_ratio", "share of the live top-k also returned by the candidate version", ["version"],
+    buckets=(0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9, 1.0)
+)
+SHADOW_SECONDS = Histogram("shadow_search_seconds", "candidate version search time (embed + ann)", ["version"])
+SHADOW_DROPPED = Counter("shadow_dropped_total", "shadow queries skipped because the shadow queue was full", ["version"])
+
+#iTunes preview proxy: outcome = hit | negative_hit | coalesced | upstream
+ITUNES_LOOKUPS = Counter("itunes_lookups_total", "iTunes proxy lookups by how they were served", ["outcome"])
+
+API_METRICS = [SEARCH_STAGE_SECONDS, SEARCH_REQUEST_SECONDS, SEARCH_CACHE_HITS, EMBED_LOCK_WAIT_SECONDS, EMBED_INFERENCE_SECONDS,
+               SHADOW_OVERLAP, SHADOW_SECONDS, SHADOW_DROPPED, ITUNES_LOOKUPS]
+
+#embedding pipeline, exported through PIPELINE_METRICS_FILE
+PIPELINE_BATCHES = Counter("pipeline_batches_total", "batches completed per pipeline stage", ["stage"])
+PIPELINE_ROWS = Counter("pipeline_rows_total", "rows completed per pipeline stage", ["stage"])
+PIPELINE_BUSY_SECONDS = Counter("pipeline_busy_seconds_total", "time each pipeline stage spent working (queue waits excluded)", ["stage"])
+PIPELINE_ROWS_PER_SECOND = Gauge("pipeline_rows_per_second", "rows / busy second per stage, as of the last batch", ["stage"])
+
+PIPELINE_METRICS = [PIPELINE_BATCHES, PIPELINE_ROWS, PIPELINE_BUSY_SECONDS, PIPELINE_ROWS_PER_SECOND]
+PIPELINE_METRICS_FILE = os.getenv("PIPELINE_METRICS_FILE", "data/metrics/pipeline.prom")
+
+def record_pipeline_batch(stage: str, rows: int, seconds: float):
+    PIPELINE_BATCHES.inc(stage)
+    PIPELINE_ROWS.inc(stage, amount=rows)
+    PIPELINE_BUSY_SECONDS.inc(stage, amount=seconds)
+
+    busy = PIPELINE_BUSY_SECONDS.value(stage)
+    if busy:
+        PIPELINE_ROWS_PER_SECOND.set(round(PIPELINE_ROWS.value(stage) / busy, 1), stage)